@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+音频解码缓冲 - 整个流程只解码一次
+将输入音频解码为原始 PCM 文件并以 NumPy 内存映射方式访问，
+转录、剪辑、变声各阶段都直接使用数组视图，不再重复解码
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+# FunASR 输入格式
+ASR_SAMPLE_RATE = 16000
+
+def probe_audio_stream(audio_file):
+    """读取首个音频流的采样率和声道数（只读文件头，不解码）"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=sample_rate,channels',
+        '-of', 'json',
+        audio_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get('streams', [])
+    if not streams:
+        raise ValueError(f"未找到音频流: {audio_file}")
+    return int(streams[0]['sample_rate']), int(streams[0]['channels'])
+
+class DecodedAudio:
+    """
+    解码后的音频缓冲
+
+    Attributes:
+        pcm: 原始采样率 float32 数组，形状 (frames, channels)，用于剪辑和变声
+        asr: 16kHz 单声道 float32 数组，用于转录
+        sample_rate: pcm 的采样率
+        channels: pcm 的声道数
+    """
+
+    def __init__(self, source, work_dir, sample_rate, channels):
+        self.source = str(source)
+        self.work_dir = Path(work_dir)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.pcm_path = self.work_dir / 'pcm.f32'
+        self.asr_path = self.work_dir / 'asr.f32'
+        self.pcm = _memmap(self.pcm_path).reshape(-1, channels)
+        self.asr = _memmap(self.asr_path)
+
+    @classmethod
+    def decode(cls, audio_file, work_dir=None):
+        """
+        用一次 ffmpeg 调用同时输出原始采样率 PCM 和 16kHz 单声道 PCM
+
+        Args:
+            audio_file: 输入音频文件
+            work_dir: PCM 文件存放目录（默认：新建临时目录，close() 时删除）
+        """
+        sample_rate, channels = probe_audio_stream(audio_file)
+        work_dir = Path(work_dir or tempfile.mkdtemp(prefix='audiocut_pcm_'))
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error', '-i', audio_file,
+            # 输出 1: 原始采样率/声道，用于剪辑和变声
+            '-map', '0:a:0', '-f', 'f32le',
+            '-ar', str(sample_rate), '-ac', str(channels),
+            str(work_dir / 'pcm.f32'),
+            # 输出 2: 16kHz 单声道，用于转录
+            '-map', '0:a:0', '-f', 'f32le',
+            '-ar', str(ASR_SAMPLE_RATE), '-ac', '1',
+            str(work_dir / 'asr.f32'),
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+        except subprocess.CalledProcessError as e:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            print(f"❌ 音频解码失败:")
+            print(e.stderr.decode(errors='replace'))
+            raise
+
+        return cls(audio_file, work_dir, sample_rate, channels)
+
+    @property
+    def frames(self):
+        return self.pcm.shape[0]
+
+    @property
+    def duration(self):
+        """音频时长（秒），以实际解码的采样数为准"""
+        return self.frames / self.sample_rate
+
+    def ffmpeg_input_args(self):
+        """将 PCM 文件作为 ffmpeg 输入的参数（无需再次解码源文件）"""
+        return [
+            '-f', 'f32le',
+            '-ar', str(self.sample_rate),
+            '-ac', str(self.channels),
+            '-i', str(self.pcm_path),
+        ]
+
+    def close(self):
+        """释放内存映射并删除临时 PCM 文件"""
+        self.pcm = None
+        self.asr = None
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PcmEncoder:
+    """
+    通过一个 ffmpeg 进程的 stdin 管道编码 PCM
+
+    用法:
+        with PcmEncoder(output, sample_rate, channels) as encoder:
+            encoder.write(block)  # block: (frames, channels) float32
+        成功与否见 encoder.ok
+    """
+
+    def __init__(self, output_audio, sample_rate, channels, metadata_source=None, extra_args=None):
+        self.output_audio = str(output_audio)
+        self.ok = False
+        self.frames_written = 0
+        # stderr 写入临时文件，避免管道写满导致死锁
+        self._stderr = tempfile.TemporaryFile()
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        ]
+        if metadata_source:
+            # 源文件只用于复制元数据（不解码）
+            cmd += ['-i', str(metadata_source), '-map', '0:a', '-map_metadata', '1']
+        cmd += list(extra_args or []) + [self.output_audio]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def write(self, block):
+        """写入一块 PCM（不复制连续的 float32 数组）"""
+        data = np.ascontiguousarray(block, dtype=np.float32)
+        self._proc.stdin.write(memoryview(data).cast('B'))
+        self.frames_written += data.shape[0] if data.ndim else 0
+
+    def close(self):
+        """结束输入并等待编码完成"""
+        if self._proc is None:
+            return self.ok
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._proc.wait()
+        self._proc = None
+        self.ok = returncode == 0
+        if not self.ok:
+            self._stderr.seek(0)
+            print(f"❌ FFmpeg 编码失败:")
+            print(self._stderr.read().decode(errors='replace'))
+        self._stderr.close()
+        return self.ok
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None and self._proc is not None:
+            self._proc.kill()
+        self.close()
+
+def _memmap(path):
+    """只读映射 float32 PCM 文件（空文件返回空数组）"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode='r')
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("用法: python audio_buffer.py <音频文件>")
+        sys.exit(1)
+
+    with DecodedAudio.decode(sys.argv[1]) as audio:
+        print(f"采样率: {audio.sample_rate} Hz")
+        print(f"声道数: {audio.channels}")
+        print(f"时长: {audio.duration:.2f}秒")
+        print(f"转录缓冲: {len(audio.asr)} 采样 @ {ASR_SAMPLE_RATE} Hz")
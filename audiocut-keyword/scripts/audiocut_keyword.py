@@ -6,29 +6,514 @@
 
 import os
 import sys
+import glob
 import json
+import time
+import queue
 import argparse
+import threading
+import importlib.util
 from pathlib import Path
 
 # 导入子模块
 sys.path.insert(0, str(Path(__file__).parent))
-from transcribe_audio import transcribe_with_funasr
-from detect_keywords import load_keywords, find_keyword_positions, generate_delete_plan
-from cut_audio import cut_audio
+from transcribe_audio import transcribe_with_funasr, create_transcribe_pool, DEFAULT_BATCH_SIZE
+from detect_keywords import find_keyword_positions, generate_delete_plan
+from keyword_matcher import load_keyword_matcher
+from cut_audio import cut_audio, compute_keep_segments, render_keep_segments, iter_crossfaded_blocks
+from audio_buffer import DecodedAudio, PcmEncoder
+from transcript_cache import TranscriptCache, DEFAULT_MAX_MB
+from transcript_format import TRANSCRIPT_SUFFIX
+from stream_censor import censor_stream, DEFAULT_WINDOW, DEFAULT_IDLE_TIMEOUT
+
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg', '.opus', '.wma'}
+
+# 批量模式下已经是本工具输出的文件（不再重复处理）
+OUTPUT_MARKERS = ('_filtered', '_voice_changed')
+
+# 批量流水线各阶段之间的队列长度（每项是一份解码后的 PCM 临时文件）
+BATCH_QUEUE_SIZE = 2
+
+# 解码线程等待队列空位时检查停止信号的间隔（秒）
+POLL_INTERVAL = 0.2
+
+def save_delete_plan(delete_plan_file, delete_segments, total_duration, matches):
+    """保存删除计划"""
+    with open(delete_plan_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'delete_segments': delete_segments,
+            'total_duration': total_duration,
+            'matches': matches
+        }, f, ensure_ascii=False, indent=2)
+
+# 已导入的 voice-changer 模块（进程内只导入一次，保留其预设缓存和 RVC 常驻进程）
+_voice_changer = None
+_voice_changer_loaded = False
+_voice_changer_lock = threading.Lock()
+
+def load_voice_changer():
+    """
+    导入 voice-changer skill 的进程内接口（change_voice_blocks / change_voice_array）
+
+    模块只导入一次并在进程内复用，批量模式下各文件共享同一份效果链缓存和 RVC 工作进程
+
+    Returns:
+        voice_change 模块，未安装或版本过旧时返回 None
+    """
+    global _voice_changer, _voice_changer_loaded
+    with _voice_changer_lock:
+        if not _voice_changer_loaded:
+            _voice_changer = _import_voice_changer()
+            _voice_changer_loaded = True
+        return _voice_changer
+
+def _import_voice_changer():
+    """按候选路径导入 voice_change.py"""
+    candidates = [
+        Path.home() / '.claude' / 'skills' / 'voice-changer' / 'scripts' / 'voice_change.py',
+        Path(__file__).resolve().parents[2] / 'voice-changer' / 'scripts' / 'voice_change.py',
+    ]
+    for script in candidates:
+        if not script.exists():
+            continue
+        spec = importlib.util.spec_from_file_location('voice_change', script)
+        module = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(module)
+        except Exception as e:
+            print(f"⚠️  无法导入 voice-changer: {e}")
+            continue
+        if hasattr(module, 'change_voice_array'):
+            return module
+    return None
+
+def change_voice(output_audio, voice, audio=None, keep_segments=None):
+    """
+    变声处理
+
+    提供已解码的 audio 和保留片段时，直接在剪辑后的 PCM 上进程内变声并编码一次，
+    不再重新解码有损的过滤结果：可流式处理的方法把交叉淡化块逐块经 change_voice_blocks()
+    送入编码器，不生成整段剪辑结果；其他方法（RVC）拼接整段后交给 change_voice_array()。
+    voice-changer 不支持进程内调用时回退到子进程
+
+    Returns:
+        变声后的文件路径，失败或未安装时返回 None
+    """
+    voice_output = output_audio.parent / f"{output_audio.stem}_voice_changed{output_audio.suffix}"
+
+    voice_changer = load_voice_changer() if audio is not None else None
+    if voice_changer is not None:
+        if change_voice_in_process(voice_changer, voice_output, voice, audio, keep_segments):
+            print(f"✅ 变声完成: {voice_output}")
+            return voice_output
+        print(f"⚠️  进程内变声失败，改用 voice-changer 脚本")
+
+    voice_changer_script = Path.home() / '.claude' / 'skills' / 'voice-changer' / 'scripts' / 'voice_change.py'
+
+    if not voice_changer_script.exists():
+        print(f"⚠️  警告: voice-changer skill 未安装，跳过变声处理")
+        return None
+
+    import subprocess
+
+    cmd = [
+        'python3', str(voice_changer_script),
+        str(output_audio),
+        '-v', voice,
+        '-o', str(voice_output)
+    ]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+
+    if result.returncode == 0:
+        print(f"✅ 变声完成: {voice_output}")
+        return voice_output
+
+    print(f"⚠️  变声失败，使用原始过滤后的音频")
+    print(f"   错误: {result.stderr}")
+    return None
+
+def change_voice_in_process(voice_changer, voice_output, voice, audio, keep_segments):
+    """进程内变声并编码到 voice_output，返回是否成功"""
+    sample_rate = audio.sample_rate
+    config = voice_changer.load_config()
+    _, method, _, _ = voice_changer.resolve_voice(config, voice)
+
+    if method in getattr(voice_changer, 'STREAMING_METHODS', ()):
+        blocks = iter_crossfaded_blocks(audio.pcm, sample_rate, keep_segments)
+        try:
+            with PcmEncoder(voice_output, sample_rate, audio.channels, metadata_source=audio.source) as encoder:
+                for block in voice_changer.change_voice_blocks(blocks, sample_rate, voice, config):
+                    encoder.write(block)
+        except Exception as e:
+            print(f"❌ 流式变声失败: {e}")
+            return False
+        return encoder.ok
+
+    pcm = render_keep_segments(audio.pcm, sample_rate, keep_segments)
+    changed = voice_changer.change_voice_array(pcm, sample_rate, voice, config)
+    del pcm
+    if changed is None:
+        return False
+    with PcmEncoder(voice_output, sample_rate, changed.shape[1], metadata_source=audio.source) as encoder:
+        encoder.write(changed)
+    return encoder.ok
+
+def collect_batch_inputs(pattern):
+    """
+    展开 --batch 参数为输入文件列表
+
+    Args:
+        pattern: 目录（处理其中的音频文件）或 glob 模式（如 'lectures/*.mp3'）
+    """
+    path = Path(pattern).expanduser()
+    if path.is_dir():
+        candidates = [p for p in path.iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS]
+    else:
+        candidates = [Path(p) for p in glob.glob(str(path), recursive=True)]
+
+    return sorted(
+        p for p in candidates
+        if p.is_file() and not any(marker in p.stem for marker in OUTPUT_MARKERS)
+    )
+
+def batch_output_dirs(inputs, output_dir):
+    """
+    每个输入文件的输出目录
+
+    指定输出目录时保留输入文件相对于公共父目录的子目录结构，
+    避免递归 glob 下不同子目录中同名的文件互相覆盖；未指定时输出到输入文件所在目录
+    """
+    if output_dir is None:
+        return [p.parent for p in inputs]
+    base = Path(os.path.commonpath([str(p.parent.resolve()) for p in inputs]))
+    return [output_dir / p.parent.resolve().relative_to(base) for p in inputs]
+
+def find_output_collisions(inputs, out_dirs):
+    """
+    找出输出文件名会冲突的输入（同一输出目录下主文件名相同，如 a.mp3 与 a.wav）
+
+    Returns:
+        [[冲突的输入, ...], ...]
+    """
+    groups = {}
+    for input_audio, out_dir in zip(inputs, out_dirs):
+        groups.setdefault((str(out_dir), input_audio.stem), []).append(input_audio)
+    return [group for group in groups.values() if len(group) > 1]
+
+def run_batch(args, keywords_file, cache):
+    """
+    批量处理多个文件，模型只加载一次
+
+    三个阶段流水线并行，阶段之间用有界队列连接：
+        解码线程 → 转录（主线程，持有模型）→ 识别/剪辑线程
+    文件 N 剪辑时文件 N+1 正在转录、文件 N+2 正在解码
+
+    Returns:
+        每个文件的统计信息列表
+    """
+    inputs = collect_batch_inputs(args.batch)
+    if not inputs:
+        print(f"❌ 错误: 未找到音频文件 {args.batch}")
+        sys.exit(1)
+
+    output_dir = Path(args.output) if args.output else None
+    out_dirs = batch_output_dirs(inputs, output_dir)
+    collisions = find_output_collisions(inputs, out_dirs)
+    if collisions:
+        print(f"❌ 错误: 以下输入文件的输出文件名相同，会互相覆盖:")
+        for group in collisions:
+            print(f"   {', '.join(str(p) for p in group)}")
+        sys.exit(1)
+    for out_dir in set(out_dirs):
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print("🎵 音频关键字过滤工具（批量模式）")
+    print("=" * 60)
+    print(f"输入: {args.batch}（{len(inputs)} 个文件）")
+    print(f"输出目录: {f'{output_dir}（保留子目录结构）' if output_dir else '与输入文件相同'}")
+    print(f"关键字配置: {keywords_file}")
+    print("=" * 60)
+
+    keywords = load_keyword_matcher(str(keywords_file))
+    print(f"📋 加载了 {len(keywords.keywords)} 个关键字")
+
+    stats = [
+        {'file': str(p), 'duration': 0.0, 'decode': 0.0, 'asr': 0.0, 'cut': 0.0,
+         'matches': 0, 'deleted': 0.0, 'status': '未处理'}
+        for p in inputs
+    ]
+    decoded = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+    transcribed = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+    # 转录循环提前退出（异常或中断）时通知解码线程停止
+    stop = threading.Event()
+
+    def put_decoded(item):
+        """放入解码队列；已要求停止时放弃并返回 False"""
+        while not stop.is_set():
+            try:
+                decoded.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode_stage():
+        try:
+            for i, input_audio in enumerate(inputs):
+                if stop.is_set():
+                    break
+                started = time.perf_counter()
+                try:
+                    audio = DecodedAudio.decode(str(input_audio))
+                except Exception as e:
+                    stats[i]['status'] = f'解码失败: {e}'
+                    continue
+                stats[i]['decode'] = time.perf_counter() - started
+                stats[i]['duration'] = audio.duration
+                if not put_decoded((i, input_audio, audio)):
+                    audio.close()
+                    break
+        finally:
+            put_decoded(None)
+
+    def cut_stage():
+        while True:
+            item = transcribed.get()
+            if item is None:
+                break
+            i, input_audio, audio, transcript_data = item
+            started = time.perf_counter()
+            try:
+                stats[i]['status'] = filter_one(input_audio, audio, transcript_data, keywords, args,
+                                                out_dirs[i], stats[i])
+            except Exception as e:
+                stats[i]['status'] = f'剪辑失败: {e}'
+            finally:
+                audio.close()
+                stats[i]['cut'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    # 工作线程设为 daemon，主线程异常退出时不会被阻塞在队列上
+    decoder = threading.Thread(target=decode_stage, name='decode', daemon=True)
+    cutter = threading.Thread(target=cut_stage, name='cut', daemon=True)
+    decoder.start()
+    cutter.start()
+
+    executor = create_transcribe_pool(args.workers) if args.workers > 1 else None
+    try:
+        while True:
+            item = decoded.get()
+            if item is None:
+                break
+            i, input_audio, audio = item
+            print(f"\n📝 [{i + 1}/{len(inputs)}] 转录: {input_audio.name}")
+            asr_started = time.perf_counter()
+            try:
+                transcript_data = transcribe_with_funasr(
+                    str(input_audio),
+                    str(transcript_path(input_audio, args, out_dirs[i])) if args.keep_transcript else None,
+                    batch_size=args.batch_size,
+                    audio=audio,
+                    workers=args.workers,
+                    cache=cache,
+                    executor=executor,
+                    segmentation=args.segmentation
+                )
+            except Exception as e:
+                stats[i]['status'] = f'转录失败: {e}'
+                audio.close()
+                continue
+            except BaseException:
+                audio.close()
+                raise
+            finally:
+                stats[i]['asr'] = time.perf_counter() - asr_started
+            transcribed.put((i, input_audio, audio, transcript_data))
+    finally:
+        # 停止解码线程，关闭已解码但未转录的文件，删除其临时 PCM 目录
+        stop.set()
+        decoder.join()
+        while True:
+            try:
+                item = decoded.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].close()
+        transcribed.put(None)
+        cutter.join()
+        if executor is not None:
+            executor.shutdown()
+
+    print_batch_summary(stats, time.perf_counter() - started)
+    return stats
+
+def filter_one(input_audio, audio, transcript_data, keywords, args, output_dir, stat):
+    """批量模式下单个文件的识别 + 剪辑（+ 变声），返回状态描述"""
+    out_dir = output_dir or input_audio.parent
+    output_audio = out_dir / f"{input_audio.stem}_filtered{input_audio.suffix}"
+
+    matches = find_keyword_positions(
+        transcript_data,
+        keywords,
+        mode=args.match_mode,
+        max_distance=args.max_distance
+    )
+    stat['matches'] = len(matches)
+    if not matches:
+        return '无关键字'
+
+    delete_segments = generate_delete_plan(
+        matches,
+        buffer_before=args.buffer_before,
+        buffer_after=args.buffer_after
+    )
+    stat['deleted'] = sum(end - start for start, end in delete_segments)
+    save_delete_plan(out_dir / f"{input_audio.stem}_delete_plan.json",
+                     delete_segments, transcript_data['duration'], matches)
+
+    success = cut_audio(
+        str(input_audio),
+        str(output_audio),
+        delete_segments,
+        transcript_data['duration'],
+        audio=audio,
+        engine=args.cut_engine
+    )
+    if not success:
+        return '剪辑失败'
+
+    keep_segments = compute_keep_segments(delete_segments, transcript_data['duration'])
+    if args.change_voice and change_voice(output_audio, args.change_voice, audio, keep_segments) is None:
+        return '完成（变声失败）'
+    return '完成'
+
+def print_batch_summary(stats, wall_time):
+    """打印每个文件和总体的吞吐统计"""
+    print("\n" + "=" * 60)
+    print("📊 批量处理汇总")
+    print("=" * 60)
+    for stat in stats:
+        duration = stat['duration']
+        busy = stat['decode'] + stat['asr'] + stat['cut']
+        speed = f"{duration / busy:.1f}x" if busy > 0 else '-'
+        print(f"{Path(stat['file']).name}")
+        print(f"   时长 {duration:.1f}s | 解码 {stat['decode']:.1f}s | 转录 {stat['asr']:.1f}s | "
+              f"剪辑 {stat['cut']:.1f}s | {speed} 实时")
+        print(f"   匹配 {stat['matches']} 处，删除 {stat['deleted']:.1f}s | {stat['status']}")
+
+    total_audio = sum(s['duration'] for s in stats)
+    done = sum(1 for s in stats if s['status'].startswith('完成') or s['status'] == '无关键字')
+    print("-" * 60)
+    print(f"文件: {done}/{len(stats)} 成功")
+    print(f"音频总时长: {total_audio / 60:.1f} 分钟，墙钟时间: {wall_time:.1f}s")
+    if wall_time > 0:
+        print(f"吞吐: {total_audio / wall_time:.1f}x 实时")
+    print(f"各阶段累计: 解码 {sum(s['decode'] for s in stats):.1f}s | "
+          f"转录 {sum(s['asr'] for s in stats):.1f}s | 剪辑 {sum(s['cut'] for s in stats):.1f}s")
+    print("=" * 60)
+
+def run_follow(args, input_audio, output_audio, keywords_file):
+    """流式模式：跟随增长中的文件，以有界延迟输出删除决策和删除后的音频"""
+    keywords = load_keyword_matcher(str(keywords_file))
+    print(f"📋 加载了 {len(keywords.keywords)} 个关键字")
+
+    cuts_file = input_audio.parent / f"{input_audio.stem}_cuts.jsonl"
+    print(f"\n📡 流式处理（删除决策实时写入 {cuts_file}）...")
+    matches, delete_segments, duration = censor_stream(
+        input_audio,
+        output_audio,
+        keywords,
+        buffer_before=args.buffer_before,
+        buffer_after=args.buffer_after,
+        match_mode=args.match_mode,
+        max_distance=args.max_distance,
+        window=args.window,
+        idle_timeout=args.idle_timeout,
+        segmentation=args.segmentation,
+        cuts_file=cuts_file
+    )
+
+    delete_plan_file = input_audio.parent / f"{input_audio.stem}_delete_plan.json"
+    save_delete_plan(delete_plan_file, delete_segments, duration, matches)
+
+    print("\n" + "=" * 60)
+    print("✅ 处理完成！")
+    print("=" * 60)
+    print(f"音频时长: {duration:.2f}秒，匹配 {len(matches)} 处，删除 {len(delete_segments)} 个片段")
+    print(f"最终输出: {output_audio}")
+    print(f"删除计划: {delete_plan_file}")
+    print("=" * 60)
+
+def transcript_path(input_audio, args, output_dir=None):
+    """保留的转录文件路径"""
+    suffix = '.json' if args.transcript_format == 'json' else TRANSCRIPT_SUFFIX
+    return (output_dir or input_audio.parent) / f"{input_audio.stem}_transcript{suffix}"
 
 
 def main():
     parser = argparse.ArgumentParser(description='音频关键字过滤工具')
-    parser.add_argument('input_audio', help='输入音频文件')
-    parser.add_argument('-o', '--output', help='输出音频文件（默认：输入文件名_filtered.mp3）')
+    parser.add_argument('input_audio', nargs='?', help='输入音频文件')
+    parser.add_argument('-o', '--output', help='输出音频文件（默认：输入文件名_filtered.mp3）；批量模式下为输出目录（保留输入的子目录结构）')
+    parser.add_argument('--follow', action='store_true',
+                        help='流式模式：跟随增长中的文件（如录制中的直播存档），边转录边输出删除后的音频')
+    parser.add_argument('--window', type=float, default=DEFAULT_WINDOW,
+                        help=f'流式模式每个转录窗口的时长（秒，默认：{DEFAULT_WINDOW:.0f}），决定输出延迟')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help=f'流式模式下文件停止增长多久后结束（秒，默认：{DEFAULT_IDLE_TIMEOUT:.0f}）')
+    parser.add_argument('--batch', metavar='DIR|GLOB',
+                        help='批量处理目录或 glob 匹配的所有音频，模型只加载一次，解码/转录/剪辑流水线并行')
     parser.add_argument('-k', '--keywords', help='关键字配置文件（默认：config/keywords.json）')
     parser.add_argument('--buffer-before', type=float, default=0.5, help='删除前缓冲时间（秒）')
     parser.add_argument('--buffer-after', type=float, default=0.5, help='删除后缓冲时间（秒）')
     parser.add_argument('--keep-transcript', action='store_true', help='保留转录文件')
+    parser.add_argument('--transcript-format', choices=['bin', 'json'], default='bin',
+                        help='保留的转录文件格式: bin(紧凑二进制 .actr，默认), json(旧版逐字符 JSON)')
     parser.add_argument('--change-voice', help='变声处理（如: female_1, female_2, male_deep）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'每次送入 FunASR 的分段数（默认：{DEFAULT_BATCH_SIZE}）')
+    parser.add_argument('--match-mode', choices=['exact', 'pinyin', 'fuzzy'], default='exact',
+                        help='关键字匹配模式: exact(精确), pinyin(拼音/同音字), fuzzy(字符编辑距离)')
+    parser.add_argument('--max-distance', type=int, default=1,
+                        help='模糊匹配允许的最大编辑距离（默认：1）')
+    parser.add_argument('--cut-engine', choices=['auto', 'copy', 'pcm', 'filter'], default='auto',
+                        help='剪辑引擎: copy(流复制，仅重编码删除点附近), pcm(进程内剪辑+交叉淡化), '
+                             'filter(filter_complex 重编码), auto(默认，使用 pcm)')
+    parser.add_argument('--segmentation', choices=['vad', 'fixed'], default='vad',
+                        help='转录分段方式: vad(默认，在静音处切分并跳过长静音), fixed(固定 30s)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行转录进程数，每个进程加载一次模型（默认：1，串行）')
+    parser.add_argument('--cache-dir', help='转录缓存目录（默认：~/.cache/audiocut-keyword/transcripts）')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_MB,
+                        help=f'转录缓存大小上限，超出时淘汰最久未使用的条目（默认：{DEFAULT_MAX_MB} MB）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用转录缓存，强制重新转录')
 
     args = parser.parse_args()
 
+    if not args.batch and not args.input_audio:
+        parser.error('需要输入音频文件或 --batch DIR|GLOB')
+
+    # 关键字配置文件
+    if args.keywords:
+        keywords_file = Path(args.keywords)
+    else:
+        keywords_file = Path(__file__).parent.parent / 'config' / 'keywords.json'
+
+    if not keywords_file.exists():
+        print(f"❌ 错误: 关键字配置文件不存在 {keywords_file}")
+        sys.exit(1)
+
+    cache = None if args.no_cache else TranscriptCache(args.cache_dir, args.cache_max_mb)
+
+    if args.batch:
+        stats = run_batch(args, keywords_file, cache)
+        if any(not (s['status'].startswith('完成') or s['status'] == '无关键字') for s in stats):
+            sys.exit(1)
+        return
+
     # 设置路径
     input_audio = Path(args.input_audio)
     if not input_audio.exists():
@@ -41,16 +526,6 @@ def main():
     else:
         output_audio = input_audio.parent / f"{input_audio.stem}_filtered{input_audio.suffix}"
 
-    # 关键字配置文件
-    if args.keywords:
-        keywords_file = Path(args.keywords)
-    else:
-        keywords_file = Path(__file__).parent.parent / 'config' / 'keywords.json'
-
-    if not keywords_file.exists():
-        print(f"❌ 错误: 关键字配置文件不存在 {keywords_file}")
-        sys.exit(1)
-
     print("=" * 60)
     print("🎵 音频关键字过滤工具")
     print("=" * 60)
@@ -59,105 +534,100 @@ def main():
     print(f"关键字配置: {keywords_file}")
     print("=" * 60)
 
-    # 步骤 1: 转录音频
-    total_steps = 5 if args.change_voice else 4
-    print(f"\n📝 步骤 1/{total_steps}: 转录音频...")
-    transcript_file = input_audio.parent / f"{input_audio.stem}_transcript.json"
-    transcript_data = transcribe_with_funasr(str(input_audio), str(transcript_file))
-
-    # 步骤 2: 加载关键字
-    print(f"\n📋 步骤 2/{total_steps}: 加载关键字配置...")
-    keywords = load_keywords(str(keywords_file))
-    print(f"   加载了 {len(keywords)} 个关键字")
-
-    # 步骤 3: 查找关键字
-    print(f"\n🔍 步骤 3/{total_steps}: 查找关键字...")
-    matches = find_keyword_positions(transcript_data, keywords)
-
-    if not matches:
-        print("✅ 未找到任何关键字，无需处理")
-        print(f"   原始音频: {input_audio}")
-        sys.exit(0)
-
-    # 生成删除计划
-    print(f"\n📊 生成删除计划...")
-    delete_segments = generate_delete_plan(
-        matches,
-        buffer_before=args.buffer_before,
-        buffer_after=args.buffer_after
-    )
+    if args.follow:
+        run_follow(args, input_audio, output_audio, keywords_file)
+        return
 
-    print(f"   合并后删除片段数: {len(delete_segments)}")
-    for i, (start, end) in enumerate(delete_segments, 1):
-        print(f"   {i}. {start:.2f}s - {end:.2f}s ({end-start:.2f}s)")
+    # 解码音频（整个流程只解码一次，各阶段共享内存映射缓冲）
+    print(f"\n🎧 解码音频...")
+    with DecodedAudio.decode(str(input_audio)) as audio:
+        print(f"   采样率: {audio.sample_rate} Hz, 声道数: {audio.channels}, 时长: {audio.duration:.2f}秒")
 
-    # 保存删除计划
-    delete_plan_file = input_audio.parent / f"{input_audio.stem}_delete_plan.json"
-    with open(delete_plan_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'delete_segments': delete_segments,
-            'total_duration': transcript_data['duration'],
-            'matches': matches
-        }, f, ensure_ascii=False, indent=2)
+        # 步骤 1: 转录音频
+        total_steps = 5 if args.change_voice else 4
+        print(f"\n📝 步骤 1/{total_steps}: 转录音频...")
+        transcript_file = transcript_path(input_audio, args)
+        # 不保留转录文件时不写盘（结果已在内存和转录缓存中）
+        transcript_data = transcribe_with_funasr(
+            str(input_audio),
+            str(transcript_file) if args.keep_transcript else None,
+            batch_size=args.batch_size,
+            audio=audio,
+            workers=args.workers,
+            cache=cache,
+            segmentation=args.segmentation
+        )
 
-    # 步骤 4: 执行剪辑
-    print(f"\n✂️  步骤 4/{total_steps}: 执行剪辑...")
-    success = cut_audio(
-        str(input_audio),
-        str(output_audio),
-        delete_segments,
-        transcript_data['duration']
-    )
+        # 步骤 2: 加载关键字
+        print(f"\n📋 步骤 2/{total_steps}: 加载关键字配置...")
+        keywords = load_keyword_matcher(str(keywords_file))
+        print(f"   加载了 {len(keywords.keywords)} 个关键字")
 
-    if success:
-        # 步骤 5: 变声处理（可选）
-        final_output = output_audio
-        if args.change_voice:
-            print("\n🎤 步骤 5/5: 变声处理...")
-            print(f"   目标声音: {args.change_voice}")
+        # 步骤 3: 查找关键字
+        print(f"\n🔍 步骤 3/{total_steps}: 查找关键字...")
+        matches = find_keyword_positions(
+            transcript_data,
+            keywords,
+            mode=args.match_mode,
+            max_distance=args.max_distance
+        )
 
-            voice_changer_script = Path.home() / '.claude' / 'skills' / 'voice-changer' / 'scripts' / 'voice_change.py'
+        if not matches:
+            print("✅ 未找到任何关键字，无需处理")
+            print(f"   原始音频: {input_audio}")
+            sys.exit(0)
 
-            if not voice_changer_script.exists():
-                print(f"⚠️  警告: voice-changer skill 未安装，跳过变声处理")
-            else:
-                import subprocess
+        # 生成删除计划
+        print(f"\n📊 生成删除计划...")
+        delete_segments = generate_delete_plan(
+            matches,
+            buffer_before=args.buffer_before,
+            buffer_after=args.buffer_after
+        )
 
-                voice_output = output_audio.parent / f"{output_audio.stem}_voice_changed{output_audio.suffix}"
+        print(f"   合并后删除片段数: {len(delete_segments)}")
+        for i, (start, end) in enumerate(delete_segments, 1):
+            print(f"   {i}. {start:.2f}s - {end:.2f}s ({end-start:.2f}s)")
 
-                cmd = [
-                    'python3', str(voice_changer_script),
-                    str(output_audio),
-                    '-v', args.change_voice,
-                    '-o', str(voice_output)
-                ]
+        # 保存删除计划
+        delete_plan_file = input_audio.parent / f"{input_audio.stem}_delete_plan.json"
+        save_delete_plan(delete_plan_file, delete_segments, transcript_data['duration'], matches)
 
-                result = subprocess.run(cmd, capture_output=True, text=True)
+        # 步骤 4: 执行剪辑
+        print(f"\n✂️  步骤 4/{total_steps}: 执行剪辑...")
+        success = cut_audio(
+            str(input_audio),
+            str(output_audio),
+            delete_segments,
+            transcript_data['duration'],
+            audio=audio,
+            engine=args.cut_engine
+        )
 
-                if result.returncode == 0:
-                    print(f"✅ 变声完成: {voice_output}")
+        if success:
+            # 步骤 5: 变声处理（可选）
+            final_output = output_audio
+            if args.change_voice:
+                print("\n🎤 步骤 5/5: 变声处理...")
+                print(f"   目标声音: {args.change_voice}")
+                keep_segments = compute_keep_segments(delete_segments, transcript_data['duration'])
+                voice_output = change_voice(output_audio, args.change_voice, audio, keep_segments)
+                if voice_output is not None:
                     final_output = voice_output
-                else:
-                    print(f"⚠️  变声失败，使用原始过滤后的音频")
-                    print(f"   错误: {result.stderr}")
-
-        print("\n" + "=" * 60)
-        print("✅ 处理完成！")
-        print("=" * 60)
-        print(f"最终输出: {final_output}")
-        if args.change_voice and final_output != output_audio:
-            print(f"过滤音频: {output_audio}")
-        print(f"删除计划: {delete_plan_file}")
-        if args.keep_transcript:
-            print(f"转录文件: {transcript_file}")
+
+            print("\n" + "=" * 60)
+            print("✅ 处理完成！")
+            print("=" * 60)
+            print(f"最终输出: {final_output}")
+            if args.change_voice and final_output != output_audio:
+                print(f"过滤音频: {output_audio}")
+            print(f"删除计划: {delete_plan_file}")
+            if args.keep_transcript:
+                print(f"转录文件: {transcript_file}")
+            print("=" * 60)
         else:
-            # 清理转录文件
-            if transcript_file.exists():
-                transcript_file.unlink()
-        print("=" * 60)
-    else:
-        print("\n❌ 处理失败")
-        sys.exit(1)
+            print("\n❌ 处理失败")
+            sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -6,20 +6,44 @@
 import subprocess
 import sys
 import json
+import bisect
+import tempfile
 from pathlib import Path
 
-def generate_ffmpeg_filter(delete_segments, total_duration):
-    """
-    生成 FFmpeg filter_complex 命令
+import numpy as np
 
-    Args:
-        delete_segments: 要删除的时间段列表 [(start, end), ...]
-        total_duration: 音频总时长
+from audio_buffer import DecodedAudio, PcmEncoder
 
-    Returns:
-        filter_complex 字符串
-    """
-    # 计算保留的片段
+# 可按帧直接复制的编码及对应的重编码器（其他编码回退到 filter 全量重编码）
+STREAM_COPY_ENCODERS = {
+    'mp3': 'libmp3lame',
+    'aac': 'aac',
+    'flac': 'flac',
+}
+
+# 每个删除点两侧重编码的时长（秒），其余部分按帧原样复制
+REENCODE_WINDOW = 0.5
+
+# 复制区间短于该值时整段重编码（秒）
+MIN_COPY_SPAN = 1.0
+
+# 进程内剪辑：接缝交叉淡化时长（秒）和每次写入管道的帧数
+CROSSFADE_SECONDS = 0.01
+BLOCK_FRAMES = 1 << 18
+
+# 重编码窗口两侧多编码的上下文（秒），容纳编码器起始延迟与尾部填充，拼接时裁掉
+WINDOW_CONTEXT = 0.1
+
+# 流复制时长校验允许误差（秒）
+DURATION_TOLERANCE = 0.05
+
+# 接缝校验：接缝两侧比较的时长（秒）、允许的误差能量比、参照过静时的能量下限（每采样）
+SEAM_CHECK_SECONDS = 0.02
+SEAM_MAX_ERROR = 0.25
+SEAM_NOISE_FLOOR = 1e-6
+
+def compute_keep_segments(delete_segments, total_duration):
+    """根据删除片段计算保留片段 [(start, end), ...]"""
     keep_segments = []
     last_end = 0.0
 
@@ -32,6 +56,22 @@ def generate_ffmpeg_filter(delete_segments, total_duration):
     if last_end < total_duration:
         keep_segments.append((last_end, total_duration))
 
+    return keep_segments
+
+def generate_ffmpeg_filter(delete_segments, total_duration):
+    """
+    生成 FFmpeg filter_complex 命令
+
+    Args:
+        delete_segments: 要删除的时间段列表 [(start, end), ...]
+        total_duration: 音频总时长
+
+    Returns:
+        filter_complex 字符串
+    """
+    # 计算保留的片段
+    keep_segments = compute_keep_segments(delete_segments, total_duration)
+
     if not keep_segments:
         print("⚠️  警告: 没有保留的片段")
         return None
@@ -53,7 +93,530 @@ def generate_ffmpeg_filter(delete_segments, total_duration):
 
     return filter_complex, keep_segments
 
-def cut_audio(input_audio, output_audio, delete_segments, total_duration):
+def probe_stream_copy_info(input_audio):
+    """获取音频流编码信息和起始时间"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,sample_rate,channels,bit_rate:format=start_time,duration',
+        '-of', 'json',
+        input_audio
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    info = json.loads(result.stdout)
+    stream = info['streams'][0]
+    fmt = info.get('format', {})
+    return {
+        'codec_name': stream.get('codec_name'),
+        'sample_rate': stream.get('sample_rate'),
+        'channels': stream.get('channels'),
+        'bit_rate': stream.get('bit_rate'),
+        'start_time': float(fmt.get('start_time') or 0.0),
+    }
+
+def probe_packets(input_audio):
+    """
+    读取音频包（帧）边界时间与字节位置（只解复用，不解码）
+
+    Returns:
+        (boundaries, positions)
+        boundaries: 升序的边界时间列表，最后一项为最后一个包的结束时间
+        positions: 每个包在文件中的字节偏移（与 boundaries 前 N 项对应，未知为 None）
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'packet=pts_time,duration_time,pos',
+        '-of', 'csv=p=0',
+        input_audio
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+    packets = []
+    last_end = None
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 2 or fields[0] in ('', 'N/A'):
+            continue
+        pts = float(fields[0])
+        pos = int(fields[2]) if len(fields) > 2 and fields[2] not in ('', 'N/A') else None
+        packets.append((pts, pos))
+        if fields[1] not in ('', 'N/A'):
+            last_end = pts + float(fields[1])
+
+    packets.sort(key=lambda p: p[0])
+    boundaries = [pts for pts, _ in packets]
+    positions = [pos for _, pos in packets]
+    if boundaries and last_end is not None:
+        boundaries.append(last_end)
+    return boundaries, positions
+
+def probe_packet_boundaries(input_audio):
+    """读取音频包（帧）边界时间，见 probe_packets"""
+    return probe_packets(input_audio)[0]
+
+def probe_duration(audio_file):
+    """获取文件时长（秒）"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        audio_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+def mp3_main_data_begin(header):
+    """
+    MP3 帧的 main_data_begin：本帧数据从前面帧的比特池回溯的字节数
+
+    Args:
+        header: 帧开头至少 6 字节（帧头 + 可选 CRC + 边信息开头）
+
+    Returns:
+        回溯字节数，不是 Layer III 帧头时返回 None
+    """
+    if len(header) < 6 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    if layer != 1 or version == 1:
+        return None
+    # 保护位为 0 时帧头后有 2 字节 CRC
+    side = 4 if header[1] & 1 else 6
+    if len(header) < side + 2:
+        return None
+    if version == 3:
+        # MPEG-1：9 位
+        return (header[side] << 1) | (header[side + 1] >> 7)
+    # MPEG-2 / 2.5：8 位
+    return header[side]
+
+def mp3_clean_frame_checker(input_audio, positions):
+    """
+    返回 can_start(i)：第 i 帧不引用比特池（main_data_begin == 0）时为 True
+
+    复制区若从引用比特池的帧开始，前面拼接的是重编码窗口的帧，解码时会读到错误的比特池数据
+    """
+    cache = {}
+
+    def can_start(i):
+        if i not in cache:
+            pos = positions[i] if i < len(positions) else None
+            if pos is None:
+                cache[i] = False
+            else:
+                with open(input_audio, 'rb') as f:
+                    f.seek(pos)
+                    cache[i] = mp3_main_data_begin(f.read(8)) == 0
+        return cache[i]
+
+    return can_start
+
+def plan_stream_copy(keep_segments, boundaries, total_duration, start_time=0.0, can_start=None):
+    """
+    规划复制/重编码片段
+
+    每个保留片段拆成：删除点附近的短窗口重编码，中间部分对齐到帧边界后原样复制
+
+    Args:
+        keep_segments: 保留片段（解码时间轴，秒）
+        boundaries: 帧边界（文件时间戳）
+        total_duration: 音频总时长
+        start_time: 文件起始时间戳，用于解码时间与文件时间戳换算
+        can_start: 可选 can_start(i)，第 i 个边界能否作为重编码窗口之后复制区的起点
+
+    Returns:
+        [('copy' | 'encode', start, end), ...]，时间为解码时间轴
+    """
+    eps = 1e-6
+    rel = [t - start_time for t in boundaries]
+    pieces = []
+
+    for start, end in keep_segments:
+        # 文件开头/结尾没有删除点，可以直接从边界复制
+        if start <= eps:
+            copy_start = rel[0]
+        else:
+            i = bisect.bisect_left(rel, start + REENCODE_WINDOW - eps)
+            if can_start is not None:
+                while i < len(rel) - 1 and not can_start(i):
+                    i += 1
+            copy_start = rel[i] if i < len(rel) else None
+
+        if end >= total_duration - eps:
+            copy_end = rel[-1]
+        else:
+            i = bisect.bisect_right(rel, end - REENCODE_WINDOW + eps) - 1
+            copy_end = rel[i] if i >= 0 else None
+
+        if copy_start is None or copy_end is None or copy_end - copy_start < MIN_COPY_SPAN:
+            pieces.append(('encode', start, end))
+            continue
+
+        if copy_start > start + eps:
+            pieces.append(('encode', start, copy_start))
+        pieces.append(('copy', copy_start, copy_end))
+        if copy_end < end - eps:
+            pieces.append(('encode', copy_end, end))
+
+    return pieces
+
+def _concat_path(path):
+    """concat 列表中的路径转义"""
+    return "'" + str(Path(path).resolve()).replace("'", "'\\''") + "'"
+
+def encode_window(audio, start, end, encode_args, path, exact_start=False, exact_end=False):
+    """
+    编码一个重编码窗口
+
+    窗口两侧各多编码 WINDOW_CONTEXT 秒上下文，编码器起始延迟（priming）与尾部填充落在上下文中，
+    由 concat 的 inpoint/outpoint 裁掉（取窗口文件自身的包边界）。
+    与复制区相接的一端（exact_*）必须与源时间精确对齐：包边界相对编码起点的位置固定，
+    首次编码后按偏差平移起点重编码一次即可；与删除点相接的一端向保留区内取整，不带回已删除的音频
+
+    Returns:
+        (inpoint, outpoint, 源起点, 源终点)，时间单位秒；无法对齐时返回 None
+    """
+    sr = audio.sample_rate
+    tol = 0.5 / sr
+    context = int(round(WINDOW_CONTEXT * sr))
+    n0 = max(0, int(round(start * sr)) - context)
+    n1 = min(audio.frames, int(round(end * sr)) + context)
+    anchor = start if exact_start else (end if exact_end else None)
+
+    for _ in range(2):
+        # 直接从 PCM 缓冲送入，起点精确到采样
+        cmd = ['ffmpeg', '-y', '-v', 'error', '-f', 'f32le', '-ar', str(sr), '-ac', str(audio.channels),
+               '-i', 'pipe:0'] + encode_args + [str(path)]
+        data = np.ascontiguousarray(audio.pcm[n0:n1], dtype=np.float32)
+        try:
+            subprocess.run(cmd, input=memoryview(data).cast('B'), check=True, capture_output=True)
+            pb = probe_packet_boundaries(str(path))
+        except subprocess.CalledProcessError as e:
+            print(f"   重编码窗口失败: {e.stderr.decode(errors='replace')}")
+            return None
+        if len(pb) < 2:
+            return None
+        if anchor is None:
+            break
+
+        offset = anchor - n0 / sr
+        k = min(range(len(pb)), key=lambda j: abs(pb[j] - offset))
+        shift = int(round((offset - pb[k]) * sr))
+        if shift == 0:
+            break
+        # 平移编码起点，使锚点落在包边界上
+        if n0 + shift < 0:
+            return None
+        n0 += shift
+    else:
+        return None
+
+    enc_start = n0 / sr
+    s_off, e_off = start - enc_start, end - enc_start
+    if exact_start:
+        inpoint = min(pb, key=lambda b: abs(b - s_off))
+    else:
+        inpoint = next((b for b in pb if b >= s_off - tol), None)
+    if exact_end:
+        outpoint = min(pb, key=lambda b: abs(b - e_off))
+    else:
+        outpoint = next((b for b in reversed(pb) if b <= e_off + tol), None)
+    if inpoint is None or outpoint is None or outpoint - inpoint <= tol:
+        return None
+    return inpoint, outpoint, enc_start + inpoint, enc_start + outpoint
+
+def seam_discontinuities(output, reference, seams, sample_rate, window=SEAM_CHECK_SECONDS,
+                         max_error=SEAM_MAX_ERROR):
+    """
+    逐接缝比较剪辑输出与参照 PCM
+
+    在每个接缝两侧 window 秒内计算误差能量与参照能量之比（参照过静时按 SEAM_NOISE_FLOOR 计），
+    超过 max_error 视为不连续：编码器延迟造成的空隙、错位或比特池错误都会使误差接近或超过参照本身
+
+    Args:
+        output / reference: (frames, channels) 数组
+        seams: 接缝位置（帧）
+
+    Returns:
+        不连续的接缝位置列表
+    """
+    w = max(1, int(window * sample_rate))
+    n = min(len(output), len(reference))
+    bad = []
+    for seam in seams:
+        a, b = max(0, seam - w), min(n, seam + w)
+        if b <= a:
+            bad.append(seam)
+            continue
+        ref = reference[a:b].astype(np.float64)
+        err = float(np.sum(np.square(output[a:b] - ref)))
+        energy = max(float(np.sum(np.square(ref))), ref.size * SEAM_NOISE_FLOOR)
+        if err / energy > max_error:
+            bad.append(seam)
+    return bad
+
+def _decode_pcm(audio_file, sample_rate, channels):
+    """解码为 (frames, channels) float32 数组"""
+    cmd = ['ffmpeg', '-v', 'error', '-i', audio_file, '-map', '0:a:0',
+           '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1']
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+def cut_audio_stream_copy(input_audio, output_audio, keep_segments, total_duration, audio=None):
+    """
+    流复制剪辑（需显式指定 copy 引擎）：未改动的部分按帧原样复制，只重编码删除点附近的短窗口，
+    再用 concat demuxer 拼接
+
+    - 重编码窗口带上下文编码并按包边界裁剪，去掉编码器延迟与填充（见 encode_window）
+    - MP3 窗口关闭比特池（-reservoir 0），复制区只从不引用比特池的帧开始
+    - 完成后解码输出，与源 PCM 逐接缝比较（见 seam_discontinuities），并校验总时长
+
+    Returns:
+        True 成功，False 不适用或校验失败（由调用方回退到 pcm 引擎）
+    """
+    if Path(input_audio).suffix.lower() != Path(output_audio).suffix.lower():
+        print("   输出格式与输入不同，无法流复制")
+        return False
+
+    try:
+        info = probe_stream_copy_info(input_audio)
+    except (subprocess.CalledProcessError, KeyError, IndexError, ValueError) as e:
+        print(f"   无法读取编码信息，无法流复制: {e}")
+        return False
+
+    encoder = STREAM_COPY_ENCODERS.get(info['codec_name'])
+    if encoder is None:
+        print(f"   编码 {info['codec_name']} 不支持流复制")
+        return False
+
+    boundaries, positions = probe_packets(input_audio)
+    if len(boundaries) < 2:
+        print("   无法读取帧边界，无法流复制")
+        return False
+
+    can_start = mp3_clean_frame_checker(input_audio, positions) if info['codec_name'] == 'mp3' else None
+    pieces = plan_stream_copy(keep_segments, boundaries, total_duration, info['start_time'], can_start)
+    copied = sum(end - start for kind, start, end in pieces if kind == 'copy')
+    encoded = sum(end - start for kind, start, end in pieces if kind == 'encode')
+    print(f"   流复制: {copied:.2f}s 原样复制, {encoded:.2f}s 重编码（{len(pieces)} 个片段）")
+
+    suffix = Path(output_audio).suffix
+    encode_args = ['-c:a', encoder, '-ar', str(info['sample_rate']), '-ac', str(info['channels'])]
+    if info['bit_rate']:
+        encode_args += ['-b:a', str(info['bit_rate'])]
+    if encoder == 'libmp3lame':
+        # 窗口的帧不引用比特池，与复制区拼接后可独立解码
+        encode_args += ['-reservoir', '0']
+
+    # 重编码窗口与接缝校验都需要源 PCM
+    owns_audio = audio is None
+    if owns_audio:
+        audio = DecodedAudio.decode(input_audio)
+    try:
+        with tempfile.TemporaryDirectory(prefix='audiocut_copy_') as tmp:
+            lines = ['ffconcat version 1.0']
+            # 输出中各片段对应的源时间区间（解码时间轴），用于构造校验参照
+            ranges = []
+            eps = 1e-6
+            for i, (kind, start, end) in enumerate(pieces):
+                if kind == 'copy':
+                    lines.append(f"file {_concat_path(input_audio)}")
+                    lines.append(f"inpoint {start + info['start_time']:.6f}")
+                    lines.append(f"outpoint {end + info['start_time']:.6f}")
+                    ranges.append((start, end))
+                    continue
+
+                exact_start = i > 0 and pieces[i - 1][0] == 'copy' and abs(pieces[i - 1][2] - start) < eps
+                exact_end = (i + 1 < len(pieces) and pieces[i + 1][0] == 'copy'
+                             and abs(pieces[i + 1][1] - end) < eps)
+                piece = Path(tmp) / f"piece_{i:04d}{suffix}"
+                window = encode_window(audio, start, end, encode_args, piece, exact_start, exact_end)
+                if window is None:
+                    print(f"   重编码窗口无法对齐: {start:.3f}s - {end:.3f}s")
+                    return False
+                inpoint, outpoint, src_start, src_end = window
+                lines.append(f"file {_concat_path(piece)}")
+                lines.append(f"inpoint {inpoint:.6f}")
+                lines.append(f"outpoint {outpoint:.6f}")
+                ranges.append((src_start, src_end))
+
+            concat_list = Path(tmp) / 'concat.txt'
+            concat_list.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+            cmd = [
+                'ffmpeg', '-y', '-v', 'error',
+                '-f', 'concat', '-safe', '0', '-i', str(concat_list),
+                '-i', input_audio,
+                '-map', '0:a', '-map_metadata', '1',
+                '-c', 'copy',
+                output_audio
+            ]
+            try:
+                subprocess.run(cmd, check=True, capture_output=True)
+            except subprocess.CalledProcessError as e:
+                print(f"   concat 拼接失败: {e.stderr.decode(errors='replace')}")
+                return False
+
+        return verify_stream_copy(output_audio, audio, ranges, keep_segments)
+    finally:
+        if owns_audio:
+            audio.close()
+
+def verify_stream_copy(output_audio, audio, ranges, keep_segments):
+    """
+    校验流复制结果：总时长与保留时长一致，且每个接缝处与源 PCM 连续
+
+    Args:
+        ranges: 输出中各片段对应的源时间区间
+    """
+    sr = audio.sample_rate
+    try:
+        output = _decode_pcm(output_audio, sr, audio.channels)
+    except subprocess.CalledProcessError:
+        print("   无法解码输出，放弃流复制结果")
+        return False
+
+    expected = sum(end - start for start, end in keep_segments)
+    actual = len(output) / sr
+    print(f"   时长校验: 期望 {expected:.3f}s, 实际 {actual:.3f}s（允许误差 {DURATION_TOLERANCE:.3f}s）")
+    if abs(actual - expected) > DURATION_TOLERANCE:
+        print("   ⚠️  流复制时长误差过大")
+        return False
+
+    parts = []
+    seams = []
+    for start, end in ranges:
+        part = audio.pcm[int(round(start * sr)):int(round(end * sr))]
+        parts.append(part)
+        seams.append(sum(len(p) for p in parts))
+    reference = np.concatenate(parts) if parts else np.zeros((0, audio.channels), dtype=np.float32)
+    bad = seam_discontinuities(output, reference, seams[:-1], sr)
+    print(f"   接缝校验: {len(seams) - 1 - len(bad)}/{len(seams) - 1} 个接缝连续")
+    if bad:
+        print(f"   ⚠️  {len(bad)} 个接缝不连续（首个位于输出 {bad[0] / sr:.3f}s）")
+        return False
+    return True
+
+def iter_crossfaded_blocks(pcm, sample_rate, keep_segments, crossfade=CROSSFADE_SECONDS,
+                           block_frames=BLOCK_FRAMES):
+    """
+    按保留片段逐块输出 PCM，在每个接缝处做等功率交叉淡化
+
+    交叉淡化以剪辑点为中心：前一段向删除区延伸半个淡化长度，后一段提前半个淡化长度，
+    因此输出总长度与保留片段总长度完全一致。片段主体直接取自 pcm 的视图，不整体复制
+
+    Args:
+        pcm: (frames, channels) float32 数组（可为内存映射）
+        sample_rate: 采样率
+        keep_segments: 保留片段 [(start, end), ...]（秒）
+        crossfade: 淡化时长（秒）
+
+    Yields:
+        (frames, channels) float32 数组块
+    """
+    frames = pcm.shape[0]
+    bounds = []
+    for start, end in keep_segments:
+        s = min(frames, max(0, int(round(start * sample_rate))))
+        e = min(frames, max(0, int(round(end * sample_rate))))
+        if e > s:
+            bounds.append((s, e))
+
+    # 每个接缝的半宽：不超过相邻片段长度的一半
+    half = int(crossfade * sample_rate) // 2
+    halves = [
+        min(half, (bounds[j][1] - bounds[j][0]) // 2, (bounds[j + 1][1] - bounds[j + 1][0]) // 2)
+        for j in range(len(bounds) - 1)
+    ]
+
+    # 等功率淡化曲线（按最大半宽预计算，各接缝按需截取）
+    windows = {}
+
+    def fade_curves(h):
+        if h not in windows:
+            t = (np.arange(2 * h, dtype=np.float32) + 0.5) / (2 * h)
+            windows[h] = (np.cos(t * np.pi / 2)[:, None], np.sin(t * np.pi / 2)[:, None])
+        return windows[h]
+
+    for j, (s, e) in enumerate(bounds):
+        lead = halves[j - 1] if j > 0 else 0
+        trail = halves[j] if j < len(halves) else 0
+
+        # 片段主体（不含两端淡化区域）
+        for pos in range(s + lead, e - trail, block_frames):
+            yield pcm[pos:min(pos + block_frames, e - trail)]
+
+        # 与下一段的接缝
+        if trail:
+            fade_out, fade_in = fade_curves(trail)
+            next_s = bounds[j + 1][0]
+            a = pcm[e - trail:e + trail]
+            b = pcm[next_s - trail:next_s + trail]
+            yield a * fade_out + b * fade_in
+
+def render_keep_segments(pcm, sample_rate, keep_segments, crossfade=CROSSFADE_SECONDS):
+    """
+    将保留片段拼接为一个连续数组（与 pcm 引擎输出的采样完全一致）
+
+    供变声等进程内后续处理直接使用，无需先编码成文件再解码
+
+    Returns:
+        (frames, channels) float32 数组
+    """
+    blocks = list(iter_crossfaded_blocks(pcm, sample_rate, keep_segments, crossfade))
+    if not blocks:
+        return np.zeros((0, pcm.shape[1]), dtype=np.float32)
+    return np.concatenate(blocks).astype(np.float32, copy=False)
+
+def cut_audio_pcm(input_audio, output_audio, keep_segments, audio, crossfade=CROSSFADE_SECONDS):
+    """
+    进程内剪辑：按保留片段切分已解码的 PCM，接缝处交叉淡化，通过一个管道交给 ffmpeg 编码一次
+
+    不生成 filter_complex，剪辑点数量不受命令行长度限制
+
+    Returns:
+        True 成功，False 失败
+    """
+    print(f"   进程内剪辑: {len(keep_segments)} 个保留片段，接缝淡化 {crossfade * 1000:.0f}ms")
+    encoder = PcmEncoder(output_audio, audio.sample_rate, audio.channels, metadata_source=input_audio)
+    try:
+        for block in iter_crossfaded_blocks(audio.pcm, audio.sample_rate, keep_segments, crossfade):
+            encoder.write(block)
+    except BrokenPipeError:
+        pass
+    return encoder.close()
+
+def _cut_with_filter(input_audio, output_audio, filter_complex, audio=None):
+    """filter_complex 全量重编码剪辑"""
+    if audio is not None:
+        # 读取已解码的 PCM，源文件仅用于保留元数据（不解码）
+        cmd = ['ffmpeg', '-y'] + audio.ffmpeg_input_args() + [
+            '-i', input_audio,
+            '-filter_complex', filter_complex,
+            '-map', '[outa]',
+            '-map_metadata', '1',
+            output_audio
+        ]
+    else:
+        cmd = [
+            'ffmpeg', '-y', '-i', input_audio,
+            '-filter_complex', filter_complex,
+            '-map', '[outa]',
+            output_audio
+        ]
+
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ FFmpeg 执行失败:")
+        print(e.stderr.decode())
+        return False
+
+def cut_audio(input_audio, output_audio, delete_segments, total_duration, audio=None,
+              engine='auto'):
     """
     执行音频剪辑
 
@@ -62,6 +625,12 @@ def cut_audio(input_audio, output_audio, delete_segments, total_duration):
         output_audio: 输出音频文件
         delete_segments: 要删除的时间段
         total_duration: 音频总时长
+        audio: 已解码的 DecodedAudio（可选），提供时直接读取其 PCM 文件，不再解码源文件
+        engine: 剪辑引擎
+            filter - filter_complex 全量重编码
+            copy   - 流复制，只重编码删除点附近的短窗口（需显式指定；不适用或接缝校验失败时回退到 pcm）
+            pcm    - 进程内 NumPy 剪辑 + 接缝交叉淡化，单管道编码一次
+            auto   - 使用 pcm
     """
     print(f"✂️  开始剪辑音频...")
     print(f"   输入: {input_audio}")
@@ -84,26 +653,35 @@ def cut_audio(input_audio, output_audio, delete_segments, total_duration):
     print(f"   删除时长: {delete_duration:.2f}s ({delete_duration/total_duration*100:.1f}%)")
     print(f"   保留时长: {keep_duration:.2f}s ({keep_duration/total_duration*100:.1f}%)")
 
-    # 执行 FFmpeg 命令
-    cmd = [
-        'ffmpeg', '-y', '-i', input_audio,
-        '-filter_complex', filter_complex,
-        '-map', '[outa]',
-        output_audio
-    ]
+    if engine == 'copy':
+        print(f"   剪辑引擎: 流复制")
+        if cut_audio_stream_copy(input_audio, output_audio, keep_segments, total_duration, audio):
+            print(f"✅ 剪辑完成！")
+            return True
+        print(f"   回退到进程内剪辑")
 
-    try:
-        subprocess.run(cmd, check=True, capture_output=True)
+    if engine in ('pcm', 'auto', 'copy'):
+        owns_audio = audio is None
+        if owns_audio:
+            audio = DecodedAudio.decode(input_audio)
+        try:
+            if cut_audio_pcm(input_audio, output_audio, keep_segments, audio):
+                print(f"✅ 剪辑完成！")
+                return True
+        finally:
+            if owns_audio:
+                audio.close()
+        return False
+
+    # 执行 FFmpeg 命令
+    if _cut_with_filter(input_audio, output_audio, filter_complex, audio):
         print(f"✅ 剪辑完成！")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ FFmpeg 执行失败:")
-        print(e.stderr.decode())
-        return False
+    return False
 
 if __name__ == '__main__':
     if len(sys.argv) < 4:
-        print("用法: python cut_audio.py <输入音频> <输出音频> <删除计划JSON>")
+        print("用法: python cut_audio.py <输入音频> <输出音频> <删除计划JSON> [filter|copy|pcm|auto]")
         sys.exit(1)
 
     input_audio = sys.argv[1]
@@ -117,4 +695,5 @@ if __name__ == '__main__':
     delete_segments = data['delete_segments']
     total_duration = data['total_duration']
 
-    cut_audio(input_audio, output_audio, delete_segments, total_duration)
+    engine = sys.argv[4] if len(sys.argv) > 4 else 'auto'
+    cut_audio(input_audio, output_audio, delete_segments, total_duration, engine=engine)
@@ -4,9 +4,10 @@
 """
 
 import json
-import sys
-import re
-from pathlib import Path
+
+from keyword_matcher import KeywordMatcher
+from fuzzy_matcher import find_fuzzy_matches
+from transcript_format import as_transcript
 
 def load_keywords(config_file):
     """加载关键字配置文件"""
@@ -14,51 +15,72 @@ def load_keywords(config_file):
         config = json.load(f)
     return config.get('keywords', [])
 
-def find_keyword_positions(transcript_data, keywords):
+def find_keyword_positions(transcript_data, keywords, mode='exact', max_distance=1):
     """
     在转录文本中查找关键字位置
 
+    exact 模式使用 Aho-Corasick 自动机一遍扫描全文，结果与逐个关键字正则匹配一致；
+    pinyin/fuzzy 模式在拼音音节（或字符）索引上做有界编辑距离匹配，可识别同音字
+
     Args:
-        transcript_data: 转录数据（包含 chars 数组）
-        keywords: 关键字列表
+        transcript_data: Transcript，或旧版转录字典（包含 chars 数组）
+        keywords: 关键字列表，或已编译的 KeywordMatcher
+        mode: 匹配模式 exact / pinyin / fuzzy
+        max_distance: 模糊模式下允许的最大编辑距离
 
     Returns:
         匹配结果列表，每项包含 keyword, start, end, context
+        （模糊模式额外包含 distance）
     """
-    full_text = transcript_data['full_text']
-    chars = transcript_data['chars']
+    # 直接使用列式时间戳数组，不展开字符字典
+    transcript = as_transcript(transcript_data)
+    full_text = transcript.text
+    num_chars = len(transcript)
     matches = []
 
+    if isinstance(keywords, KeywordMatcher):
+        matcher = keywords
+    else:
+        matcher = KeywordMatcher(keywords)
+
     print(f"🔍 开始搜索关键字...")
     print(f"   文本长度: {len(full_text)} 字符")
-    print(f"   关键字数量: {len(keywords)}")
-
-    for keyword in keywords:
-        # 在文本中查找所有匹配位置
-        pattern = re.escape(keyword)
-        for match in re.finditer(pattern, full_text):
-            start_idx = match.start()
-            end_idx = match.end()
-
-            # 获取时间戳
-            if start_idx < len(chars) and end_idx <= len(chars):
-                start_time = chars[start_idx]['start']
-                end_time = chars[end_idx - 1]['end']
-
-                # 获取上下文（前后各10个字符）
-                context_start = max(0, start_idx - 10)
-                context_end = min(len(full_text), end_idx + 10)
-                context = full_text[context_start:context_end]
-
-                matches.append({
-                    'keyword': keyword,
-                    'start': start_time,
-                    'end': end_time,
-                    'position': start_idx,
-                    'context': context,
-                    'matched_text': full_text[start_idx:end_idx]
-                })
-
+    print(f"   关键字数量: {len(matcher.keywords)}")
+
+    if mode == 'exact':
+        hits = [(idx, start, end, None) for idx, start, end in matcher.find_all(full_text)]
+    else:
+        print(f"   匹配模式: {mode}（最大编辑距离 {max_distance}）")
+        hits = find_fuzzy_matches(full_text, matcher.keywords, mode, max_distance)
+
+    for keyword_idx, start_idx, end_idx, distance in hits:
+        keyword = matcher.keywords[keyword_idx]
+
+        # 获取时间戳
+        if start_idx < num_chars and end_idx <= num_chars:
+            start_time = transcript.start_time(start_idx)
+            end_time = transcript.end_time(end_idx - 1)
+
+            # 获取上下文（前后各10个字符）
+            context_start = max(0, start_idx - 10)
+            context_end = min(len(full_text), end_idx + 10)
+            context = full_text[context_start:context_end]
+
+            match = {
+                'keyword': keyword,
+                'start': start_time,
+                'end': end_time,
+                'position': start_idx,
+                'context': context,
+                'matched_text': full_text[start_idx:end_idx]
+            }
+            if distance is not None:
+                match['distance'] = distance
+            matches.append(match)
+
+            if match['matched_text'] != keyword:
+                print(f"   ≈ 找到 '{keyword}'（识别为 '{match['matched_text']}'）在 {start_time:.2f}s-{end_time:.2f}s")
+            else:
                 print(f"   ✓ 找到 '{keyword}' 在 {start_time:.2f}s-{end_time:.2f}s")
 
     print(f"✅ 搜索完成，共找到 {len(matches)} 处匹配")
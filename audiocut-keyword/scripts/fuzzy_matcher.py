@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+模糊关键字匹配 - 拼音音节索引 + 有界编辑距离
+用于识别 ASR 产生的同音字、近音字错误（如品牌名被识别成同音词）
+
+在转录文本上一次性建立倒排索引（每个字符对应一个记号：拼音音节或字符本身），
+每个关键字先用索引筛选候选位置，再在候选窗口内做有界编辑距离校验，
+避免对全文逐位置暴力计算
+"""
+
+import sys
+from collections import defaultdict
+
+MODES = ('pinyin', 'fuzzy')
+
+def _load_pinyin():
+    """加载 pypinyin（可选依赖），未安装时返回 None"""
+    try:
+        from pypinyin import lazy_pinyin, Style
+    except ImportError:
+        return None
+    return lambda char: lazy_pinyin(char, style=Style.NORMAL)[0]
+
+def make_tokenizer(mode):
+    """
+    返回逐字符的记号函数
+
+    Args:
+        mode: 'pinyin'（同音字视为相同）或 'fuzzy'（按字符比较）
+    """
+    if mode == 'pinyin':
+        to_pinyin = _load_pinyin()
+        if to_pinyin is None:
+            print("⚠️  未安装 pypinyin，拼音匹配降级为字符模糊匹配")
+            print("   安装: pip install pypinyin")
+        else:
+            cache = {}
+
+            def tokenize(text):
+                tokens = []
+                for char in text:
+                    token = cache.get(char)
+                    if token is None:
+                        token = cache[char] = to_pinyin(char).lower()
+                    tokens.append(token)
+                return tokens
+
+            return tokenize
+
+    return lambda text: [char.lower() for char in text]
+
+def effective_distance(length, max_distance):
+    """
+    关键字允许的最大编辑距离
+
+    短关键字容错过大会大量误删，限制为不超过长度的一半（向下取整，且至少保留一个匹配记号）
+    """
+    return max(0, min(max_distance, (length - 1) // 2))
+
+class FuzzyIndex:
+    """转录文本的记号倒排索引，建立一次即可查询任意数量的关键字"""
+
+    def __init__(self, text, mode='pinyin'):
+        self.mode = mode
+        self.tokenize = make_tokenizer(mode)
+        self.tokens = self.tokenize(text)
+        self.postings = defaultdict(list)
+        for pos, token in enumerate(self.tokens):
+            self.postings[token].append(pos)
+
+    def _candidate_ranges(self, pattern, k):
+        """
+        用记号计数筛选候选区间
+
+        编辑距离不超过 k 时，至少有 m-k 个关键字记号与文本对齐，
+        且这些对齐的对角线（文本位置 - 关键字位置）彼此相差不超过 2k，
+        因此宽度 2k 的对角线窗口内命中数不足 m-k 的位置可以安全排除
+
+        Returns:
+            [[最小对角线, 最大对角线], ...]（已合并相邻区间）
+        """
+        m = len(pattern)
+        need = m - k
+        diagonals = sorted(
+            pos - j
+            for j, token in enumerate(pattern)
+            for pos in self.postings.get(token, ())
+        )
+
+        ranges = []
+        left = 0
+        for right, d in enumerate(diagonals):
+            while d - diagonals[left] > 2 * k:
+                left += 1
+            if right - left + 1 < need:
+                continue
+            lo = diagonals[left]
+            # 相邻候选合并为一个区间，只校验一次
+            if ranges and lo <= ranges[-1][1] + m:
+                ranges[-1][1] = d
+            else:
+                ranges.append([lo, d])
+        return ranges
+
+    def _verify(self, pattern, lo, hi, k):
+        """
+        在 [lo, hi) 窗口内做半全局编辑距离（起止位置自由）
+
+        Returns:
+            [(start, end, distance), ...]，同一关键字的匹配互不重叠
+        """
+        text = self.tokens[lo:hi]
+        n = len(text)
+        # 第 0 行：任意位置都可作为起点
+        cost = [0] * (n + 1)
+        start = list(range(n + 1))
+
+        for token in pattern:
+            new_cost = [cost[0] + 1] + [0] * n
+            new_start = [start[0]] + [0] * n
+            for j in range(1, n + 1):
+                # 优先对角线（匹配/替换），其次删除、插入
+                best = cost[j - 1] + (text[j - 1] != token)
+                best_start = start[j - 1]
+                if cost[j] + 1 < best:
+                    best, best_start = cost[j] + 1, start[j]
+                if new_cost[j - 1] + 1 < best:
+                    best, best_start = new_cost[j - 1] + 1, new_start[j - 1]
+                new_cost[j] = best
+                new_start[j] = best_start
+            cost, start = new_cost, new_start
+
+        # 连续满足阈值的结束位置视为同一处命中，取距离最小者
+        matches = []
+        cluster = None
+        for j in range(1, n + 1):
+            if cost[j] <= k and start[j] < j:
+                hit = (cost[j], -(j - start[j]), start[j] + lo, j + lo)
+                if cluster is not None and hit[2] < cluster[3]:
+                    cluster = min(cluster, hit)
+                else:
+                    if cluster is not None:
+                        matches.append(cluster)
+                    cluster = hit
+        if cluster is not None:
+            matches.append(cluster)
+
+        result = []
+        last_end = lo
+        for distance, _, s, e in matches:
+            if s >= last_end:
+                result.append((s, e, distance))
+                last_end = e
+        return result
+
+    def search(self, keyword, max_distance=1):
+        """
+        查找与关键字编辑距离不超过 max_distance 的所有片段
+
+        Returns:
+            [(start, end, distance), ...]，位置为字符下标
+        """
+        pattern = self.tokenize(keyword)
+        m = len(pattern)
+        if m == 0:
+            return []
+        k = effective_distance(m, max_distance)
+
+        results = []
+        last_end = 0
+        for d_lo, d_hi in self._candidate_ranges(pattern, k):
+            lo = max(0, d_lo - 2 * k)
+            hi = min(len(self.tokens), d_hi + m + 2 * k)
+            for s, e, distance in self._verify(pattern, lo, hi, k):
+                if s >= last_end:
+                    results.append((s, e, distance))
+                    last_end = e
+        return results
+
+def find_fuzzy_matches(text, keywords, mode='pinyin', max_distance=1, index=None):
+    """
+    批量模糊匹配
+
+    Args:
+        text: 转录全文
+        keywords: 关键字列表
+        mode: 'pinyin' 或 'fuzzy'
+        max_distance: 最大编辑距离（按记号计）
+        index: 预先建立的 FuzzyIndex（可选）
+
+    Returns:
+        [(keyword_index, start, end, distance), ...]，按关键字顺序、再按位置
+    """
+    if index is None:
+        index = FuzzyIndex(text, mode)
+
+    found = []
+    results = {}
+    for idx, keyword in enumerate(keywords):
+        if not keyword:
+            continue
+        if keyword not in results:
+            results[keyword] = index.search(keyword, max_distance)
+        for start, end, distance in results[keyword]:
+            found.append((idx, start, end, distance))
+    return found
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("用法: python fuzzy_matcher.py <文本> <关键字> [pinyin|fuzzy] [最大编辑距离]")
+        sys.exit(1)
+
+    mode = sys.argv[3] if len(sys.argv) > 3 else 'pinyin'
+    max_distance = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    for _, start, end, distance in find_fuzzy_matches(sys.argv[1], [sys.argv[2]], mode, max_distance):
+        print(f"{sys.argv[1][start:end]}\t{start}\t{end}\t距离={distance}")
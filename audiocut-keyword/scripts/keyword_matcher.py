@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+多关键字匹配 - Aho-Corasick 自动机
+一遍扫描转录文本即可找到所有关键字，耗时与关键字数量无关
+"""
+
+import os
+import sys
+import json
+import hashlib
+from collections import deque
+from pathlib import Path
+
+# 匹配器缓存格式版本，to_state 结构变化时递增
+CACHE_VERSION = 1
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 多关键字匹配自动机
+
+    匹配语义与逐个关键字执行 re.finditer(re.escape(keyword), text) 一致：
+    同一关键字的匹配从左到右、互不重叠；不同关键字之间可以重叠
+    """
+
+    def __init__(self, keywords, digest=None):
+        self.keywords = list(keywords)
+        self.digest = digest
+
+        # 状态转移表、失败指针、每个状态结束的关键字
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        # 重复的关键字共享一个模式，空关键字忽略
+        self._patterns = []
+        self._pattern_indices = []
+        pattern_ids = {}
+        for idx, keyword in enumerate(self.keywords):
+            if not keyword:
+                continue
+            if keyword not in pattern_ids:
+                pattern_ids[keyword] = len(self._patterns)
+                self._patterns.append(keyword)
+                self._pattern_indices.append([])
+            self._pattern_indices[pattern_ids[keyword]].append(idx)
+
+        self._build()
+
+    def _build(self):
+        """构建 trie 和失败指针"""
+        goto = self._goto
+        out_sets = [[]]
+
+        for pid, pattern in enumerate(self._patterns):
+            state = 0
+            for char in pattern:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    out_sets.append([])
+                state = nxt
+            out_sets[state].append(pid)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(char, 0)
+                # 合并失败链上的输出，扫描时无需再沿失败链查找
+                out_sets[nxt] = out_sets[nxt] + out_sets[fail[nxt]]
+
+        self._fail = fail
+        self._out = [tuple(o) for o in out_sets]
+
+    def to_state(self):
+        """导出为纯数据（JSON 可序列化，用于缓存）"""
+        return {
+            'version': CACHE_VERSION,
+            'digest': self.digest,
+            'keywords': self.keywords,
+            'patterns': self._patterns,
+            'pattern_indices': self._pattern_indices,
+            'goto': self._goto,
+            'fail': self._fail,
+            'out': self._out,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        从缓存数据恢复，跳过构建过程
+
+        Raises:
+            ValueError: 数据版本不符或结构不一致
+        """
+        if state.get('version') != CACHE_VERSION:
+            raise ValueError("匹配器缓存版本不符")
+        matcher = cls.__new__(cls)
+        matcher.digest = state['digest']
+        matcher.keywords = list(state['keywords'])
+        matcher._patterns = list(state['patterns'])
+        matcher._pattern_indices = [list(i) for i in state['pattern_indices']]
+        matcher._goto = [dict(g) for g in state['goto']]
+        matcher._fail = list(state['fail'])
+        matcher._out = [tuple(o) for o in state['out']]
+
+        n = len(matcher._goto)
+        if len(matcher._fail) != n or len(matcher._out) != n or \
+                len(matcher._pattern_indices) != len(matcher._patterns):
+            raise ValueError("匹配器缓存结构不一致")
+        return matcher
+
+    def iter_matches(self, text):
+        """
+        一遍扫描文本
+
+        Yields:
+            (keyword_index, start, end)，按结束位置顺序
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        patterns, indices = self._patterns, self._pattern_indices
+        last_end = [0] * len(patterns)
+        state = 0
+
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for pid in out[state]:
+                end = pos + 1
+                start = end - len(patterns[pid])
+                # 同一关键字不重叠（与 re.finditer 相同）
+                if start < last_end[pid]:
+                    continue
+                last_end[pid] = end
+                for idx in indices[pid]:
+                    yield idx, start, end
+
+    def find_all(self, text):
+        """
+        返回所有匹配 [(keyword_index, start, end), ...]
+
+        排序方式与逐个关键字 re.finditer 的结果顺序一致：
+        先按关键字在列表中的顺序，再按出现位置
+        """
+        return sorted(self.iter_matches(text))
+
+def load_keyword_matcher(config_file):
+    """
+    加载关键字配置并返回编译好的匹配器
+
+    编译结果以 JSON 缓存在配置文件旁（.<文件名>.<哈希>.matcher），
+    以配置文件内容哈希为键，配置不变时直接加载；
+    缓存只含纯数据，加载时校验版本与哈希，不一致或损坏时重新构建
+    """
+    config_path = Path(config_file)
+    data = config_path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    cache_file = config_path.with_name(f".{config_path.name}.{digest[:16]}.matcher")
+
+    if cache_file.exists():
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('digest') == digest:
+                return KeywordMatcher.from_state(state)
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            pass
+
+    keywords = json.loads(data.decode('utf-8')).get('keywords', [])
+    matcher = KeywordMatcher(keywords, digest=digest)
+
+    try:
+        # 清理同一配置文件的旧缓存
+        for stale in config_path.parent.glob(f".{config_path.name}.*.matcher"):
+            stale.unlink()
+        tmp_file = cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(matcher.to_state(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        # 配置目录只读时仅跳过缓存
+        print(f"⚠️  无法写入匹配器缓存: {e}")
+
+    return matcher
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("用法: python keyword_matcher.py <关键字配置JSON> <文本>")
+        sys.exit(1)
+
+    matcher = load_keyword_matcher(sys.argv[1])
+    text = sys.argv[2]
+    for idx, start, end in matcher.find_all(text):
+        print(f"{matcher.keywords[idx]}\t{start}\t{end}")
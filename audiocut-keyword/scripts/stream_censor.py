@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+流式关键字过滤 - 用于录制中（持续增长）的音频文件
+边读取边解码，按滑动窗口转录，增量识别关键字，
+以有界延迟输出删除决策和删除关键字后的音频，无需等待整个文件写完
+
+流程:
+    文件尾随读取 → ffmpeg 解码（原始采样率 PCM + 16kHz PCM 两路管道）
+    → 滑动窗口转录（相邻窗口重叠，字符按窗口中线归属，不重复不遗漏）
+    → 在新增文本（含回看）上识别关键字 → 合并删除计划
+    → 确定不会再被删除的部分立即编码输出
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import contextlib
+
+import numpy as np
+
+from audio_buffer import ASR_SAMPLE_RATE, probe_audio_stream, PcmEncoder
+from transcribe_audio import transcribe_with_funasr, load_funasr_model, DEFAULT_MODEL
+from detect_keywords import find_keyword_positions, generate_delete_plan
+from transcript_format import Transcript
+
+# 每个转录窗口新增的音频时长（秒），决定输出延迟
+DEFAULT_WINDOW = 10.0
+
+# 窗口两侧的重叠上下文（秒），避免字在窗口边界被截断
+WINDOW_OVERLAP = 2.0
+
+# 文件停止增长多久后视为录制结束（秒）
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+# 文件尾随读取的轮询间隔（秒）
+POLL_INTERVAL = 0.5
+
+# 删除点两侧的淡出/淡入时长（秒）
+STREAM_FADE = 0.005
+
+READ_CHUNK = 1 << 16
+
+class PcmFifo:
+    """
+    按绝对采样位置访问的增长缓冲
+
+    解码线程不断追加，处理线程按位置读取并丢弃已处理的部分，内存占用与延迟成正比
+
+    Args:
+        channels: 声道数，采样为 (frames, channels) 数组；None 表示一维单声道数组
+    """
+
+    def __init__(self, channels=None):
+        self.channels = channels
+        self._blocks = []
+        self.start = 0
+        self.end = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def append(self, block):
+        with self._cond:
+            self._blocks.append(block)
+            self.end += len(block)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def wait(self, timeout):
+        with self._cond:
+            self._cond.wait(timeout)
+
+    def read(self, a, b):
+        """读取绝对位置 [a, b) 的采样（a 不早于已丢弃位置）"""
+        with self._cond:
+            blocks = list(self._blocks)
+            pos = self.start
+        out = []
+        for block in blocks:
+            block_end = pos + len(block)
+            if block_end > a and pos < b:
+                out.append(block[max(0, a - pos):min(len(block), b - pos)])
+            pos = block_end
+        if not out:
+            return np.zeros((0, self.channels) if self.channels else 0, dtype=np.float32)
+        return np.concatenate(out)
+
+    def discard_before(self, pos):
+        """丢弃完全位于 pos 之前的块"""
+        with self._cond:
+            while self._blocks and self.start + len(self._blocks[0]) <= pos:
+                self.start += len(self._blocks.pop(0))
+
+def _pump(stream, fifo, frame_bytes):
+    """读取 ffmpeg 输出管道，按整帧追加到缓冲"""
+    pending = b''
+    try:
+        while True:
+            data = stream.read(READ_CHUNK)
+            if not data:
+                break
+            pending += data
+            usable = len(pending) - len(pending) % frame_bytes
+            if usable:
+                block = np.frombuffer(pending[:usable], dtype=np.float32)
+                if fifo.channels:
+                    block = block.reshape(-1, fifo.channels)
+                fifo.append(block)
+                pending = pending[usable:]
+    finally:
+        fifo.close()
+
+def _tail_file(path, sink, stop, idle_timeout):
+    """
+    尾随读取增长中的文件并写入 ffmpeg stdin
+
+    文件超过 idle_timeout 秒没有增长时视为录制结束
+    """
+    last_growth = time.monotonic()
+    try:
+        with open(path, 'rb') as f:
+            while not stop.is_set():
+                data = f.read(READ_CHUNK)
+                if data:
+                    sink.write(data)
+                    last_growth = time.monotonic()
+                    continue
+                if time.monotonic() - last_growth > idle_timeout:
+                    break
+                time.sleep(POLL_INTERVAL)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            sink.close()
+        except BrokenPipeError:
+            pass
+
+def censor_block(block, start, sample_rate, delete_segments, fade=STREAM_FADE):
+    """
+    对从绝对采样位置 start 开始的一块 PCM 应用删除计划
+
+    删除区间内的采样丢弃，删除点前后各做 fade 秒的淡出/淡入
+
+    Returns:
+        保留下来的 (frames, channels) 数组
+    """
+    n = len(block)
+    end = start + n
+    f = int(fade * sample_rate)
+    keep = np.ones(n, dtype=bool)
+    gain = np.ones(n, dtype=np.float32)
+
+    for seg_start, seg_end in delete_segments:
+        s = int(round(seg_start * sample_rate))
+        e = int(round(seg_end * sample_rate))
+        if e + f <= start or s - f >= end:
+            continue
+        a, b = max(s, start), min(e, end)
+        if a < b:
+            keep[a - start:b - start] = False
+        if f:
+            idx = np.arange(max(s - f, start), min(s, end))
+            gain[idx - start] *= (s - idx) / f
+            idx = np.arange(max(e, start), min(e + f, end))
+            gain[idx - start] *= (idx - e + 1) / f
+
+    return (block * gain[:, None])[keep]
+
+class StreamCensor:
+    """
+    增量转录 + 关键字识别 + 删除输出
+
+    Args:
+        keywords: 关键字列表或 KeywordMatcher
+        sample_rate, channels: 输出 PCM 格式
+        encoder: 接收删除后 PCM 的 PcmEncoder（可为 None，只输出删除决策）
+        on_cut: 删除片段确定时的回调 (start, end)
+    """
+
+    def __init__(self, keywords, sample_rate, channels, encoder=None, on_cut=None,
+                 buffer_before=0.5, buffer_after=0.5, match_mode='exact', max_distance=1,
+                 window=DEFAULT_WINDOW, segmentation='vad', model_name=DEFAULT_MODEL):
+        self.keywords = keywords
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.encoder = encoder
+        self.on_cut = on_cut
+        self.buffer_before = buffer_before
+        self.buffer_after = buffer_after
+        self.match_mode = match_mode
+        self.max_distance = max_distance
+        self.window = int(window * ASR_SAMPLE_RATE)
+        self.overlap = int(WINDOW_OVERLAP * ASR_SAMPLE_RATE)
+        self.segmentation = segmentation
+        self.model_name = model_name
+
+        keyword_list = getattr(keywords, 'keywords', keywords)
+        # 新文本之前需要回看的字符数：跨窗口的关键字可能从已识别的文本开始
+        self.lookback = max((len(k) for k in keyword_list), default=1) - 1
+        if match_mode != 'exact':
+            self.lookback += max_distance
+
+        self.text = []
+        self.starts = []
+        self.ends = []
+        self.scanned = 0
+        self.matches = []
+        self.delete_segments = []
+        self.reported = 0
+
+        self.accept_from = 0
+        # 最近一个窗口中最早的字开始时间（秒）
+        self.window_start = 0.0
+        self.emitted = 0
+
+    def ready(self, asr_available, final):
+        """是否可以转录下一个窗口"""
+        if final:
+            return asr_available > self.accept_from
+        return asr_available >= self.accept_from + self.window + self.overlap
+
+    def transcribe_window(self, asr_fifo, final):
+        """转录下一个窗口，归属本窗口的字符加入全文"""
+        accept_to = asr_fifo.end if final else self.accept_from + self.window
+        lo = max(asr_fifo.start, self.accept_from - self.overlap)
+        hi = asr_fifo.end if final else accept_to + self.overlap
+        pcm = asr_fifo.read(lo, hi)
+        offset_ms = lo * 1000 / ASR_SAMPLE_RATE
+        accept_lo = self.accept_from * 1000 / ASR_SAMPLE_RATE
+        accept_hi = accept_to * 1000 / ASR_SAMPLE_RATE
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            window = transcribe_with_funasr(
+                f"stream@{lo / ASR_SAMPLE_RATE:.1f}s", None,
+                segment_length=max(30, (hi - lo) / ASR_SAMPLE_RATE),
+                model_name=self.model_name,
+                segmentation=self.segmentation,
+                pcm=pcm
+            )
+
+        # 字符按中点归属窗口，重叠区内的字只取一次
+        window_start = accept_lo
+        for char, start, end in zip(window.text, window.starts.tolist(), window.ends.tolist()):
+            start += offset_ms
+            end += offset_ms
+            center = (start + end) / 2
+            if accept_lo <= center < accept_hi:
+                self.text.append(char)
+                self.starts.append(int(round(start)))
+                self.ends.append(int(round(end)))
+                window_start = min(window_start, start)
+
+        self.window_start = window_start / 1000
+        self.accept_from = accept_to
+        asr_fifo.discard_before(self.accept_from - self.overlap)
+
+    def scan(self):
+        """在新增文本（含回看）上识别关键字"""
+        n = len(self.text)
+        if n == self.scanned:
+            return []
+        lo = max(0, self.scanned - self.lookback)
+        tail = Transcript(
+            ''.join(self.text[lo:]), self.starts[lo:], self.ends[lo:],
+            self.ends[-1] / 1000
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = find_keyword_positions(tail, self.keywords, self.match_mode, self.max_distance)
+
+        new = []
+        for match in found:
+            # 完全落在上次扫描范围内的匹配已经识别过
+            if lo + match['position'] + len(match['matched_text']) <= self.scanned:
+                continue
+            match['position'] += lo
+            context_start = max(0, match['position'] - 10)
+            match['context'] = ''.join(self.text[context_start:match['position'] + len(match['matched_text']) + 10])
+            new.append(match)
+
+        self.scanned = n
+        if new:
+            self.matches.extend(new)
+            self.delete_segments = generate_delete_plan(
+                self.matches, self.buffer_before, self.buffer_after
+            )
+        return new
+
+    def safe_time(self, final):
+        """此时间之前的音频不会再被新的删除片段影响，可以输出"""
+        if final:
+            return float('inf')
+        # 字按中点归属窗口，下一个窗口的第一个字可能在本窗口结束之前开始，
+        # 已接受的时间不能超过最近一个窗口中最早的字开始时间
+        committed = min(self.accept_from / ASR_SAMPLE_RATE, self.window_start)
+        # 回看范围内的字可能与后续文本组成关键字
+        n = len(self.text)
+        if self.lookback and n:
+            committed = min(committed, self.starts[max(0, n - self.lookback)] / 1000)
+        return committed - self.buffer_before - STREAM_FADE
+
+    def emit(self, pcm_fifo, final):
+        """输出确定的部分，并报告已确定的删除片段"""
+        safe = self.safe_time(final)
+        limit = pcm_fifo.end if final else min(pcm_fifo.end, int(safe * self.sample_rate))
+        if limit > self.emitted:
+            block = pcm_fifo.read(self.emitted, limit)
+            if self.encoder is not None:
+                kept = censor_block(block, self.emitted, self.sample_rate, self.delete_segments)
+                if len(kept):
+                    self.encoder.write(kept)
+            self.emitted = limit
+            pcm_fifo.discard_before(self.emitted)
+
+        # 结束于可输出位置之前的删除片段不会再与新片段合并
+        while self.reported < len(self.delete_segments):
+            start, end = self.delete_segments[self.reported]
+            if not final and end >= safe:
+                break
+            if self.on_cut:
+                self.on_cut(start, end)
+            self.reported += 1
+
+    @property
+    def latency(self):
+        """已接收但尚未输出的音频时长（秒）"""
+        return self.accept_from / ASR_SAMPLE_RATE - self.emitted / self.sample_rate
+
+def censor_stream(input_audio, output_audio, keywords, buffer_before=0.5, buffer_after=0.5,
+                  match_mode='exact', max_distance=1, window=DEFAULT_WINDOW,
+                  idle_timeout=DEFAULT_IDLE_TIMEOUT, segmentation='vad', cuts_file=None):
+    """
+    流式处理增长中的音频文件
+
+    Args:
+        input_audio: 输入文件（可仍在写入）
+        output_audio: 删除关键字后的输出文件
+        keywords: 关键字列表或 KeywordMatcher
+        window: 每个转录窗口的时长（秒），输出延迟约为 2×window + 2×重叠 + 缓冲时间
+        idle_timeout: 文件停止增长多久后结束（秒）
+        cuts_file: 删除决策 JSONL 文件（每确定一个删除片段追加一行）
+
+    Returns:
+        (matches, delete_segments, 已读取的音频时长)
+    """
+    sample_rate, channels = probe_audio_stream(str(input_audio))
+    print(f"   采样率: {sample_rate} Hz, 声道数: {channels}")
+    print(f"   窗口: {window:.0f}s（重叠 {WINDOW_OVERLAP:.0f}s），停止增长 {idle_timeout:.0f}s 后结束")
+
+    # 先加载模型（不在静默输出中，缺少依赖时可以看到提示）
+    load_funasr_model()
+
+    # 一个 ffmpeg 进程输出两路 PCM：stdout 为原始格式，额外管道为 16kHz 单声道
+    asr_read, asr_write = os.pipe()
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', 'pipe:0',
+        '-map', '0:a:0', '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1',
+        '-map', '0:a:0', '-f', 'f32le', '-ar', str(ASR_SAMPLE_RATE), '-ac', '1', f'pipe:{asr_write}',
+    ]
+    decoder = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               pass_fds=(asr_write,))
+    os.close(asr_write)
+
+    pcm_fifo = PcmFifo(channels)
+    asr_fifo = PcmFifo()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_tail_file, args=(str(input_audio), decoder.stdin, stop, idle_timeout), daemon=True),
+        threading.Thread(target=_pump, args=(decoder.stdout, pcm_fifo, 4 * channels), daemon=True),
+        threading.Thread(target=_pump, args=(os.fdopen(asr_read, 'rb'), asr_fifo, 4), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    cuts = open(cuts_file, 'a', encoding='utf-8') if cuts_file else None
+
+    def on_cut(start, end):
+        print(f"   ✂️  删除 {start:.2f}s - {end:.2f}s")
+        if cuts:
+            cuts.write(json.dumps({'start': start, 'end': end}) + '\n')
+            cuts.flush()
+
+    encoder = PcmEncoder(output_audio, sample_rate, channels)
+    censor = StreamCensor(keywords, sample_rate, channels, encoder, on_cut,
+                          buffer_before, buffer_after, match_mode, max_distance,
+                          window, segmentation)
+    last_report = 0.0
+    try:
+        while True:
+            final = asr_fifo.closed and pcm_fifo.closed
+            if censor.ready(asr_fifo.end, final):
+                censor.transcribe_window(asr_fifo, final)
+                for match in censor.scan():
+                    print(f"   ✓ 找到 '{match['keyword']}' 在 {match['start']:.2f}s-{match['end']:.2f}s")
+                censor.emit(pcm_fifo, final=False)
+            elif final:
+                censor.emit(pcm_fifo, final=True)
+                break
+            else:
+                asr_fifo.wait(POLL_INTERVAL)
+
+            now = time.monotonic()
+            if now - last_report > 10:
+                last_report = now
+                print(f"   已输出 {censor.emitted / sample_rate:.1f}s，延迟 {censor.latency:.1f}s，"
+                      f"删除 {len(censor.delete_segments)} 处")
+    except KeyboardInterrupt:
+        # 中断时输出已确定的部分
+        print("\n⏹️  已中断，输出已处理部分")
+        censor.emit(pcm_fifo, final=False)
+    finally:
+        stop.set()
+        encoder.close()
+        decoder.kill()
+        decoder.wait()
+        if cuts:
+            cuts.close()
+
+    return censor.matches, censor.delete_segments, pcm_fifo.end / sample_rate
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        print("用法: python stream_censor.py <增长中的音频文件> <输出文件> <关键字配置JSON> [窗口秒数]")
+        sys.exit(1)
+
+    from keyword_matcher import load_keyword_matcher
+
+    matches, delete_segments, _ = censor_stream(
+        sys.argv[1], sys.argv[2], load_keyword_matcher(sys.argv[3]),
+        window=float(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_WINDOW
+    )
+    print(f"✅ 完成: {len(matches)} 处匹配，删除 {len(delete_segments)} 个片段")
@@ -1,53 +1,54 @@
 #!/usr/bin/env python3
 """
-音频转录脚本 - 使用 FunASR 进行 30s 分段转录
-获取字符级时间戳，用于后续关键字定位和剪辑
+音频转录脚本 - 使用 FunASR 获取字符级时间戳，用于后续关键字定位和剪辑
+音频只解码一次为 16kHz 内存缓冲，按 VAD 静音边界（或固定时长）分段，
+模型只加载一次，分段按批送入 generate（可选多进程并行），结果按内容哈希缓存
 """
 
 import os
 import sys
-import json
 import subprocess
 from pathlib import Path
 
-def get_audio_duration(audio_file):
-    """获取音频时长（秒）"""
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        audio_file
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return float(result.stdout.strip())
+import numpy as np
+
+from transcript_cache import audio_cache_key
+from vad import plan_vad_segments
+from transcript_format import Transcript, save_transcript
 
-def extract_audio_segment(audio_file, start, duration, output_wav):
-    """提取音频片段并转换为 16kHz 单声道 WAV"""
+DEFAULT_MODEL = "paraformer-zh"
+SAMPLE_RATE = 16000
+DEFAULT_BATCH_SIZE = 8
+
+# 进程内模型缓存，避免重复加载
+_MODEL_CACHE = {}
+
+def decode_audio_16k(audio_file):
+    """一次性解码整段音频为 16kHz 单声道 float32 数组（FunASR 输入格式）"""
     cmd = [
-        'ffmpeg', '-y', '-i', audio_file,
-        '-ss', str(start),
-        '-t', str(duration),
+        'ffmpeg', '-v', 'error', '-i', audio_file,
         '-vn',  # 不要视频
-        '-acodec', 'pcm_s16le',  # 16-bit PCM
-        '-ar', '16000',  # 16kHz 采样率
+        '-f', 'f32le',  # 原始 32-bit float PCM
+        '-ar', str(SAMPLE_RATE),  # 16kHz 采样率
         '-ac', '1',  # 单声道
-        output_wav
+        'pipe:1'
     ]
-    subprocess.run(cmd, capture_output=True, check=True)
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
 
-def transcribe_with_funasr(audio_file, output_json, segment_length=30):
+def load_funasr_model(model_name=DEFAULT_MODEL, ncpu=None):
     """
-    使用 FunASR 进行 30s 分段转录
+    加载 FunASR 模型，同一进程内只加载一次
 
     Args:
-        audio_file: 输入音频文件路径
-        output_json: 输出 JSON 文件路径
-        segment_length: 分段长度（秒），默认 30
+        model_name: FunASR 模型名称，默认 paraformer-zh
+        ncpu: 推理线程数（默认沿用 FunASR 设置）
 
     Returns:
-        转录结果字典
+        AutoModel 实例
     """
-    print(f"🎤 开始转录音频: {audio_file}")
+    if model_name in _MODEL_CACHE:
+        return _MODEL_CACHE[model_name]
 
     # 检查 FunASR 是否安装
     try:
@@ -57,91 +58,312 @@ def transcribe_with_funasr(audio_file, output_json, segment_length=30):
         print("请运行: pip install funasr modelscope")
         sys.exit(1)
 
-    # 获取音频时长
-    duration = get_audio_duration(audio_file)
-    print(f"📊 音频时长: {duration:.2f}秒")
-
-    # 加载 FunASR 模型
     print("🔧 加载 FunASR 模型...")
+    kwargs = {'ncpu': ncpu} if ncpu else {}
     model = AutoModel(
-        model="paraformer-zh",
-        disable_update=True
+        model=model_name,
+        disable_update=True,
+        **kwargs
+    )
+    _MODEL_CACHE[model_name] = model
+    return model
+
+# 固定分段时，短于该时长的尾段并入前一段（秒）
+MIN_TAIL_SECONDS = 2
+
+def plan_fixed_segments(total_samples, segment_length=30):
+    """按固定时长切分，返回 [(start_sample, end_sample), ...]"""
+    step = int(segment_length * SAMPLE_RATE)
+    segments = [
+        (start, min(start + step, total_samples))
+        for start in range(0, total_samples, step)
+    ]
+    # 过短的尾段几乎没有内容，并入前一段，避免多一次无用的推理
+    if len(segments) > 1 and segments[-1][1] - segments[-1][0] < MIN_TAIL_SECONDS * SAMPLE_RATE:
+        segments[-2:] = [(segments[-2][0], segments[-1][1])]
+    return segments
+
+def plan_segments(pcm, segment_length=30, segmentation='vad'):
+    """
+    规划转录分段
+
+    Args:
+        pcm: 16kHz 单声道 float32 数组
+        segment_length: 分段（最大）长度（秒）
+        segmentation: 'vad'（在静音处切分并跳过长静音）或 'fixed'（固定时长）
+    """
+    if segmentation == 'vad':
+        return plan_vad_segments(pcm, segment_length, SAMPLE_RATE)
+    return plan_fixed_segments(len(pcm), segment_length)
+
+def chars_from_result(item, offset):
+    """
+    将单段 FunASR 结果转换为字符级时间戳
+
+    Args:
+        item: model.generate 返回的单项结果
+        offset: 该段在原音频中的起始时间（秒）
+
+    Returns:
+        [(char, start_ms, end_ms), ...]，时间为原音频中的毫秒数
+    """
+    chars = []
+    if 'timestamp' in item and 'text' in item:
+        text = item['text'].replace(' ', '')
+        offset_ms = offset * 1000
+
+        # 确保时间戳数量匹配
+        timestamps = item['timestamp']
+        for idx, char in enumerate(text):
+            if idx < len(timestamps):
+                ts = timestamps[idx]
+                chars.append((char, int(round(offset_ms + ts[0])), int(round(offset_ms + ts[1]))))
+    return chars
+
+def transcribe_batch(model, pcm, batch):
+    """
+    一次 generate 转录一批音频段
+
+    Returns:
+        每段的字符列表，顺序与 batch 一致
+    """
+    # 切片是原数组的视图，不复制数据
+    inputs = [pcm[start:end] for start, end in batch]
+
+    # FunASR 批量转录（字符级时间戳）
+    results = model.generate(
+        input=inputs,
+        batch_size=len(inputs),
+        return_raw_text=True,
+        timestamp_granularity="character"
     )
 
-    # 分段转录
+    return [
+        chars_from_result(item, start / SAMPLE_RATE)
+        for (start, _), item in zip(batch, results)
+    ]
+
+def split_batches(segments, batch_size):
+    """将分段按批大小分组"""
+    batch_size = max(1, int(batch_size))
+    return [segments[b:b + batch_size] for b in range(0, len(segments), batch_size)]
+
+def transcribe_segments(model, pcm, segments, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    按批次将内存中的音频段送入 FunASR，一次 generate 处理一批
+
+    Args:
+        model: FunASR AutoModel 实例
+        pcm: 16kHz 单声道 float32 数组
+        segments: [(start_sample, end_sample), ...]
+        batch_size: 每次 generate 的段数
+
+    Returns:
+        字符级时间戳列表（按时间顺序）
+    """
     all_chars = []
-    num_segments = int(duration // segment_length) + 1
-
-    print(f"📝 开始分段转录（共 {num_segments} 段）...")
-
-    for i in range(num_segments):
-        start = i * segment_length
-        dur = min(segment_length, duration - start)
-
-        if dur <= 0:
-            break
-
-        # 提取音频段
-        wav_file = f'/tmp/audiocut_seg_{i}.wav'
-        extract_audio_segment(audio_file, start, dur, wav_file)
-
-        # FunASR 转录（字符级时间戳）
-        result = model.generate(
-            input=wav_file,
-            return_raw_text=True,
-            timestamp_granularity="character"
-        )
-
-        # 处理转录结果
-        for item in result:
-            if 'timestamp' in item and 'text' in item:
-                text = item['text'].replace(' ', '')
-
-                # 确保时间戳数量匹配
-                timestamps = item['timestamp']
-                for idx, char in enumerate(text):
-                    if idx < len(timestamps):
-                        ts = timestamps[idx]
-                        all_chars.append({
-                            'char': char,
-                            'start': round(start + ts[0] / 1000, 2),
-                            'end': round(start + ts[1] / 1000, 2)
-                        })
-
-        # 清理临时文件
-        os.remove(wav_file)
+    num_segments = len(segments)
+    done = 0
+
+    for batch in split_batches(segments, batch_size):
+        for chars in transcribe_batch(model, pcm, batch):
+            all_chars.extend(chars)
 
         # 显示进度
-        progress = (i + 1) / num_segments * 100
-        print(f"   进度: {progress:.1f}% ({i+1}/{num_segments})")
+        done += len(batch)
+        progress = done / num_segments * 100
+        print(f"   进度: {progress:.1f}% ({done}/{num_segments})")
 
-    # 构建完整文本
-    full_text = ''.join([c['char'] for c in all_chars])
+    return all_chars
 
-    # 保存结果
-    result_data = {
-        'audio_file': str(audio_file),
-        'duration': duration,
-        'total_chars': len(all_chars),
-        'full_text': full_text,
-        'chars': all_chars
-    }
+# 工作进程内的模型和音频缓冲（每个进程初始化一次）
+_WORKER_STATE = {}
+
+def _init_worker(model_name, pcm_source, ncpu):
+    """进程池初始化：每个工作进程加载一次模型，并映射音频缓冲"""
+    _WORKER_STATE['pcm'] = _map_pcm(pcm_source)
+    _WORKER_STATE['model'] = load_funasr_model(model_name, ncpu=ncpu)
+
+def _map_pcm(pcm_source):
+    """路径则直接映射父进程解码好的 PCM 文件，不经过进程间拷贝"""
+    if isinstance(pcm_source, (str, Path)):
+        return np.memmap(pcm_source, dtype=np.float32, mode='r')
+    return pcm_source
+
+def _transcribe_batch_in_worker(batch, pcm_path=None):
+    if pcm_path is not None:
+        # 常驻进程池按任务切换音频文件，同一文件只映射一次
+        if _WORKER_STATE.get('pcm_path') != pcm_path:
+            _WORKER_STATE['pcm_path'] = pcm_path
+            _WORKER_STATE['pcm'] = _map_pcm(pcm_path)
+    return transcribe_batch(_WORKER_STATE['model'], _WORKER_STATE['pcm'], batch)
+
+def create_transcribe_pool(workers, model_name=DEFAULT_MODEL):
+    """
+    创建常驻转录进程池（批量处理多个文件时复用，模型只加载一次）
 
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(result_data, f, ensure_ascii=False, indent=2)
+    Returns:
+        ProcessPoolExecutor，使用完毕后需 shutdown()
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    workers = max(1, int(workers))
+    # 平分 CPU，避免每个进程都开满推理线程
+    ncpu = max(1, (os.cpu_count() or 1) // workers)
+    print(f"   转录进程池: {workers} 个进程，每进程 {ncpu} 线程")
+    # spawn 避免 fork 继承 torch 线程状态
+    ctx = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                               initializer=_init_worker,
+                               initargs=(model_name, None, ncpu))
+
+def transcribe_segments_parallel(pcm_source, segments, batch_size=DEFAULT_BATCH_SIZE,
+                                 workers=2, model_name=DEFAULT_MODEL, executor=None):
+    """
+    用进程池并行转录，每个工作进程只加载一次模型
+
+    分批方式与串行路径相同，结果按分段顺序合并，输出与串行路径一致
+
+    Args:
+        pcm_source: 16kHz PCM 文件路径（工作进程自行映射）或 float32 数组
+        segments: [(start_sample, end_sample), ...]
+        batch_size: 每次 generate 的段数
+        workers: 工作进程数
+        model_name: FunASR 模型名称
+        executor: 常驻进程池（见 create_transcribe_pool，此时 pcm_source 须为文件路径）
+
+    Returns:
+        字符级时间戳列表（按时间顺序）
+    """
+    batches = split_batches(segments, batch_size)
+    num_segments = len(segments)
+
+    own_executor = executor is None
+    if own_executor:
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        workers = max(1, min(int(workers), len(batches)))
+        # 平分 CPU，避免每个进程都开满推理线程
+        ncpu = max(1, (os.cpu_count() or 1) // workers)
+        print(f"   并行转录: {workers} 个进程，每进程 {ncpu} 线程")
+        # spawn 避免 fork 继承 torch 线程状态
+        ctx = multiprocessing.get_context('spawn')
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                       initializer=_init_worker,
+                                       initargs=(model_name, pcm_source, ncpu))
+        pcm_paths = [None] * len(batches)
+    else:
+        pcm_paths = [str(pcm_source)] * len(batches)
+
+    all_chars = []
+    done = 0
+    try:
+        # map 按提交顺序返回，保证时间顺序
+        results = executor.map(_transcribe_batch_in_worker, batches, pcm_paths)
+        for batch, batch_chars in zip(batches, results):
+            for chars in batch_chars:
+                all_chars.extend(chars)
+
+            # 显示进度
+            done += len(batch)
+            progress = done / num_segments * 100
+            print(f"   进度: {progress:.1f}% ({done}/{num_segments})")
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return all_chars
+
+def transcribe_with_funasr(audio_file, output_file=None, segment_length=30,
+                           batch_size=DEFAULT_BATCH_SIZE, model_name=DEFAULT_MODEL,
+                           audio=None, workers=1, cache=None, executor=None,
+                           segmentation='vad', pcm=None):
+    """
+    使用 FunASR 进行分段转录（默认按 VAD 在静音处切分，每段不超过 30s）
+
+    音频只解码一次到内存，分段为数组切片，按批次送入模型
+
+    Args:
+        audio_file: 输入音频文件路径
+        output_file: 输出转录文件路径（.json 导出旧版 JSON，其他扩展名保存为二进制格式；
+            为 None 时不写文件）
+        segment_length: 分段（最大）长度（秒），默认 30
+        batch_size: 每次 generate 处理的段数，默认 8
+        model_name: FunASR 模型名称
+        audio: 已解码的 DecodedAudio（可选），提供时直接使用其 16kHz 缓冲
+        workers: 并行转录进程数，大于 1 时使用进程池
+        cache: TranscriptCache（可选），按音频内容哈希复用已有转录
+        executor: 常驻转录进程池（可选，需同时提供 audio），批量处理时跨文件复用
+        segmentation: 'vad'（在静音处切分，跳过长静音）或 'fixed'（固定时长切分）
+        pcm: 已解码的 16kHz 单声道数组（可选，如流式模式下的一个窗口），时间戳相对数组起点
+
+    Returns:
+        Transcript（兼容原字典访问方式）
+    """
+    print(f"🎤 开始转录音频: {audio_file}")
+
+    # 解码音频（流程中已解码则直接使用其 16kHz 视图）
+    if pcm is None:
+        pcm = audio.asr if audio is not None else decode_audio_16k(audio_file)
+    duration = len(pcm) / SAMPLE_RATE
+    print(f"📊 音频时长: {duration:.2f}秒")
+
+    # 查询转录缓存（键为解码后音频内容 + 模型 + 分段参数）
+    cached = None
+    if cache is not None:
+        cache_key = audio_cache_key(pcm, model_name, segment_length, segmentation)
+        cached = cache.get(cache_key)
+
+    if cached is not None:
+        print(f"♻️  命中转录缓存，跳过 ASR")
+        transcript = Transcript(cached.text, cached.starts, cached.ends, duration, audio_file)
+    else:
+        # 分段转录
+        segments = plan_segments(pcm, segment_length, segmentation)
+        if segmentation == 'vad' and len(pcm):
+            speech = sum(end - start for start, end in segments) / SAMPLE_RATE
+            print(f"🔇 VAD 分段: 语音 {speech:.1f}秒，跳过静音 {duration - speech:.1f}秒"
+                  f"（{(1 - speech / duration) * 100:.0f}%）")
+        print(f"📝 开始分段转录（共 {len(segments)} 段，批大小 {batch_size}）...")
+        if executor is not None and audio is not None:
+            all_chars = transcribe_segments_parallel(
+                audio.asr_path, segments, batch_size, executor=executor
+            )
+        elif workers > 1 and len(segments) > batch_size:
+            # 工作进程直接映射已解码的 PCM 文件
+            pcm_source = audio.asr_path if audio is not None else pcm
+            all_chars = transcribe_segments_parallel(
+                pcm_source, segments, batch_size, workers, model_name
+            )
+        else:
+            # 加载 FunASR 模型（进程内只加载一次）
+            model = load_funasr_model(model_name)
+            all_chars = transcribe_segments(model, pcm, segments, batch_size)
+
+        transcript = Transcript.from_rows(all_chars, duration, audio_file)
+        if cache is not None:
+            cache.put(cache_key, transcript)
+
+    # 保存结果
+    if output_file:
+        save_transcript(transcript, output_file)
 
     print(f"✅ 转录完成！")
-    print(f"   总字符数: {len(all_chars)}")
-    print(f"   输出文件: {output_json}")
+    print(f"   总字符数: {len(transcript)}")
+    if output_file:
+        print(f"   输出文件: {output_file}")
 
-    return result_data
+    return transcript
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("用法: python transcribe_audio.py <音频文件> [输出JSON]")
+        print("用法: python transcribe_audio.py <音频文件> [输出文件(.json|.actr)] [批大小]")
         sys.exit(1)
 
     audio_file = sys.argv[1]
-    output_json = sys.argv[2] if len(sys.argv) > 2 else audio_file.replace('.mp3', '_transcript.json')
+    output_file = sys.argv[2] if len(sys.argv) > 2 else audio_file.replace('.mp3', '_transcript.json')
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_BATCH_SIZE
 
-    transcribe_with_funasr(audio_file, output_json)
+    transcribe_with_funasr(audio_file, output_file, batch_size=batch_size)
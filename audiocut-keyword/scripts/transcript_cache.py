@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+转录缓存 - 以解码后音频内容哈希为键
+同一段音频（即使文件名不同、重新导出过元数据）只转录一次，
+调整关键字或缓冲时间后重新运行可直接跳到关键字识别
+
+缓存条目按最近使用时间（mtime）做 LRU 淘汰，总大小不超过上限
+"""
+
+import os
+import sys
+import json
+import hashlib
+from pathlib import Path
+
+from transcript_format import Transcript, TRANSCRIPT_SUFFIX
+
+DEFAULT_MAX_MB = 512
+CACHE_SUFFIX = '.transcript' + TRANSCRIPT_SUFFIX
+
+# 缓存键版本，转录逻辑变化时递增使旧条目失效
+CACHE_VERSION = 3
+
+def default_cache_dir():
+    """默认缓存目录（遵循 XDG_CACHE_HOME）"""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'audiocut-keyword' / 'transcripts'
+
+def audio_cache_key(pcm, model_name, segment_length, segmentation='fixed', chunk_samples=1 << 22):
+    """
+    计算缓存键：16kHz PCM 内容 + 模型名 + 分段参数
+
+    Args:
+        pcm: 16kHz 单声道 float32 数组（可为内存映射）
+        model_name: FunASR 模型名称
+        segment_length: 分段长度（秒）
+        segmentation: 分段方式（vad / fixed）
+        chunk_samples: 每次送入哈希的采样数，避免一次性读入整个映射
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        'version': CACHE_VERSION,
+        'model': model_name,
+        'segment_length': segment_length,
+        'segmentation': segmentation,
+        'samples': len(pcm),
+    }, sort_keys=True).encode('utf-8'))
+    for start in range(0, len(pcm), chunk_samples):
+        h.update(memoryview(pcm[start:start + chunk_samples]).cast('B'))
+    return h.hexdigest()
+
+class TranscriptCache:
+    """
+    本地转录缓存
+
+    条目为二进制转录格式（全文 + 毫秒时间戳数组，见 transcript_format.py），
+    命中时内存映射加载
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key):
+        """
+        读取缓存条目
+
+        Returns:
+            Transcript 或 None（未命中/条目损坏）
+        """
+        path = self._path(key)
+        try:
+            transcript = Transcript.load(path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # 刷新 mtime，作为 LRU 的最近使用时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return transcript
+
+    def put(self, key, transcript):
+        """写入缓存条目，并按大小上限淘汰最久未使用的条目"""
+        path = self._path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = path.with_suffix('.tmp')
+            transcript.save(tmp_file)
+            os.replace(tmp_file, path)
+            self.evict()
+        except OSError as e:
+            # 缓存失败不影响主流程
+            print(f"⚠️  无法写入转录缓存: {e}")
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        # 最新的条目即使超过上限也保留
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """清空缓存"""
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            path.unlink()
+
+if __name__ == '__main__':
+    cache = TranscriptCache(sys.argv[2] if len(sys.argv) > 2 else None)
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        cache.clear()
+        print(f"✅ 已清空转录缓存: {cache.cache_dir}")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'info':
+        files = list(cache.cache_dir.glob(f"*{CACHE_SUFFIX}"))
+        size = sum(f.stat().st_size for f in files)
+        print(f"缓存目录: {cache.cache_dir}")
+        print(f"条目数: {len(files)}")
+        print(f"总大小: {size / 1024 / 1024:.2f} MB")
+    else:
+        print("用法: python transcript_cache.py info|clear [缓存目录]")
+        sys.exit(1)
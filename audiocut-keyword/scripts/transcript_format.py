@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+紧凑转录格式 - 文本 + 毫秒时间戳数组
+替代每个字符一个 {'char','start','end'} 字典的 JSON，
+一小时普通话约 6 万字符，二进制文件约 700KB，可直接内存映射加载
+
+文件布局（小端）:
+    magic 'ACTR' | uint32 版本 | uint32 头长度 | JSON 头（补齐到 4 字节）
+    | UTF-32 码位 (n × uint32) | 起始毫秒 (n × int32) | 结束毫秒 (n × int32)
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b'ACTR'
+FORMAT_VERSION = 1
+TRANSCRIPT_SUFFIX = '.actr'
+
+class Transcript:
+    """
+    列式转录结果
+
+    Attributes:
+        text: 全文（str）
+        starts: 每个字符的起始时间（int32 毫秒数组）
+        ends: 每个字符的结束时间（int32 毫秒数组）
+        duration: 音频时长（秒）
+        audio_file: 源音频路径
+
+    兼容原字典访问方式（transcript['full_text'] / ['duration'] / ['chars'] ...），
+    'chars' 仅在访问时才展开为字典列表
+    """
+
+    def __init__(self, text, starts, ends, duration, audio_file=''):
+        if not len(text) == len(starts) == len(ends):
+            raise ValueError("文本长度与时间戳数量不一致")
+        self.text = text
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.duration = float(duration)
+        self.audio_file = str(audio_file)
+
+    @classmethod
+    def from_rows(cls, rows, duration, audio_file=''):
+        """由 [(char, start_ms, end_ms), ...] 构建"""
+        text = ''.join(row[0] for row in rows)
+        starts = np.fromiter((row[1] for row in rows), dtype=np.int32, count=len(rows))
+        ends = np.fromiter((row[2] for row in rows), dtype=np.int32, count=len(rows))
+        return cls(text, starts, ends, duration, audio_file)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由旧版 JSON 结构（chars 字典列表）构建"""
+        chars = data.get('chars', [])
+        rows = [
+            (c['char'], int(round(c['start'] * 1000)), int(round(c['end'] * 1000)))
+            for c in chars
+        ]
+        duration = data.get('duration', rows[-1][2] / 1000 if rows else 0.0)
+        return cls.from_rows(rows, duration, data.get('audio_file', ''))
+
+    def __len__(self):
+        return len(self.text)
+
+    def start_time(self, idx):
+        """第 idx 个字符的起始时间（秒）"""
+        return int(self.starts[idx]) / 1000
+
+    def end_time(self, idx):
+        """第 idx 个字符的结束时间（秒）"""
+        return int(self.ends[idx]) / 1000
+
+    def __getitem__(self, key):
+        if key == 'full_text':
+            return self.text
+        if key == 'duration':
+            return self.duration
+        if key == 'audio_file':
+            return self.audio_file
+        if key == 'total_chars':
+            return len(self.text)
+        if key == 'chars':
+            return [
+                {'char': char, 'start': start / 1000, 'end': end / 1000}
+                for char, start, end in zip(self.text, self.starts.tolist(), self.ends.tolist())
+            ]
+        raise KeyError(key)
+
+    def to_dict(self):
+        """导出为旧版 JSON 结构"""
+        return {
+            'audio_file': self.audio_file,
+            'duration': self.duration,
+            'total_chars': len(self.text),
+            'full_text': self.text,
+            'chars': self['chars'],
+        }
+
+    def save(self, path):
+        """保存为二进制格式"""
+        header = json.dumps({
+            'audio_file': self.audio_file,
+            'duration': self.duration,
+            'chars': len(self.text),
+        }, ensure_ascii=False).encode('utf-8')
+        header += b' ' * (-len(header) % 4)
+
+        codepoints = np.frombuffer(self.text.encode('utf-32-le'), dtype='<u4')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.array([FORMAT_VERSION, len(header)], dtype='<u4').tobytes())
+            f.write(header)
+            f.write(codepoints.tobytes())
+            f.write(self.starts.astype('<i4').tobytes())
+            f.write(self.ends.astype('<i4').tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """内存映射加载二进制格式（时间戳数组不复制）"""
+        with open(path, 'rb') as f:
+            prefix = f.read(12)
+            if len(prefix) < 12 or prefix[:4] != MAGIC:
+                raise ValueError(f"不是转录文件: {path}")
+            version, header_len = np.frombuffer(prefix[4:], dtype='<u4')
+            if version != FORMAT_VERSION:
+                raise ValueError(f"不支持的转录文件版本: {version}")
+            header = json.loads(f.read(int(header_len)).decode('utf-8'))
+
+        n = header['chars']
+        offset = 12 + int(header_len)
+        if n == 0:
+            return cls('', [], [], header['duration'], header['audio_file'])
+
+        data = np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(3 * n,))
+        text = data[:n].tobytes().decode('utf-32-le')
+        starts = data[n:2 * n].view('<i4')
+        ends = data[2 * n:].view('<i4')
+        return cls(text, starts, ends, header['duration'], header['audio_file'])
+
+    def export_json(self, path):
+        """导出为旧版 JSON（便于人工查看或与其他工具对接）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+def as_transcript(data):
+    """将 Transcript 或旧版转录字典统一为 Transcript"""
+    if isinstance(data, dict):
+        return Transcript.from_dict(data)
+    return data
+
+def load_transcript(path):
+    """按文件内容加载转录（二进制或旧版 JSON）"""
+    with open(path, 'rb') as f:
+        is_binary = f.read(4) == MAGIC
+    if is_binary:
+        return Transcript.load(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return Transcript.from_dict(json.load(f))
+
+def save_transcript(transcript, path):
+    """按扩展名保存：.json 导出旧版 JSON，其他保存为二进制"""
+    if Path(path).suffix.lower() == '.json':
+        transcript.export_json(path)
+    else:
+        transcript.save(path)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("用法: python transcript_format.py <输入转录文件> <输出文件(.json|.actr)>")
+        sys.exit(1)
+
+    transcript = load_transcript(sys.argv[1])
+    save_transcript(transcript, sys.argv[2])
+    print(f"✅ 已转换 {len(transcript)} 个字符: {sys.argv[2]}")
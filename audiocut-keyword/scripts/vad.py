@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+能量 VAD 分段 - 在静音处切分转录分段
+按帧能量找出语音区间，把语音打包成接近 30s 的分段，只在静音处切分，
+不把一个字切到两段里；较长的静音直接跳过，不送入 ASR
+"""
+
+import sys
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# 分析帧长（秒）
+FRAME_SECONDS = 0.03
+
+# 短于该时长的静音视为语音内部停顿（秒）
+MIN_SILENCE = 0.3
+
+# 短于该时长的孤立能量峰视为噪声（秒）
+MIN_SPEECH = 0.1
+
+# 语音区间两侧保留的余量（秒），避免切掉字头字尾
+SPEECH_PAD = 0.2
+
+# 长于该时长的静音不送入 ASR，并在此处结束当前分段（秒）
+SKIP_SILENCE = 1.0
+
+# 阈值上限（dBFS）：高于该电平的帧一律视为语音，不会被跳过
+MAX_THRESHOLD = -45.0
+
+# 阈值下限（dBFS），避免数字静音把阈值拉得过低
+MIN_THRESHOLD = -60.0
+
+# 噪声底以上多少 dB 视为语音
+NOISE_MARGIN = 10.0
+
+# 逐帧能量的计算块大小（帧），避免为整段音频分配临时数组
+LEVEL_BLOCK = 4096
+
+# 单个语音区间超长时，在分段末尾这段范围内找最安静的帧切分（秒）
+SPLIT_SEARCH = 5.0
+
+def frame_levels(pcm, frame_size):
+    """
+    逐帧能量（dBFS），末尾不足一帧的部分补零
+
+    按 LEVEL_BLOCK 帧分块读取，pcm 为内存映射时不会整体复制到内存
+    """
+    n_frames = -(-len(pcm) // frame_size)
+    power = np.zeros(n_frames, dtype=np.float64)
+    full = len(pcm) // frame_size
+    for start in range(0, full, LEVEL_BLOCK):
+        end = min(start + LEVEL_BLOCK, full)
+        block = np.asarray(pcm[start * frame_size:end * frame_size], dtype=np.float32)
+        block = block.reshape(end - start, frame_size)
+        power[start:end] = np.einsum('ij,ij->i', block, block, dtype=np.float64)
+    if full < n_frames:
+        tail = np.asarray(pcm[full * frame_size:], dtype=np.float64)
+        power[full] = np.dot(tail, tail)
+    return (10 * np.log10(power / frame_size + 1e-10)).astype(np.float32)
+
+def speech_threshold(levels):
+    """
+    能量阈值：噪声底（低分位电平）+ NOISE_MARGIN
+
+    限制在 [MIN_THRESHOLD, MAX_THRESHOLD] 内。静音很少时低分位电平落在语音上，
+    阈值上限保证较安静的语音（例如整体响亮的录音中低几 dB 的段落）不会被当作静音跳过
+    """
+    floor = float(np.percentile(levels, 10))
+    return min(max(floor + NOISE_MARGIN, MIN_THRESHOLD), MAX_THRESHOLD)
+
+def _runs(mask):
+    """布尔序列中连续 True 的区间 [(start, end), ...]"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def detect_speech(pcm, sample_rate=SAMPLE_RATE):
+    """
+    检测语音区间
+
+    Returns:
+        (regions, levels, frame_size)
+        regions: [(start_frame, end_frame), ...]，已合并短停顿、去除短噪声并加余量
+    """
+    frame_size = int(FRAME_SECONDS * sample_rate)
+    levels = frame_levels(pcm, frame_size)
+    if len(levels) == 0:
+        return [], levels, frame_size
+
+    mask = levels > speech_threshold(levels)
+    frames_per_second = sample_rate / frame_size
+    min_silence = int(MIN_SILENCE * frames_per_second)
+    min_speech = int(MIN_SPEECH * frames_per_second)
+    pad = int(SPEECH_PAD * frames_per_second)
+
+    # 填平短停顿
+    for start, end in _runs(~mask):
+        if end - start < min_silence and start > 0 and end < len(mask):
+            mask[start:end] = True
+
+    regions = []
+    for start, end in _runs(mask):
+        if end - start < min_speech:
+            continue
+        start, end = max(0, start - pad), min(len(mask), end + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions, levels, frame_size
+
+def plan_vad_segments(pcm, segment_length=30, sample_rate=SAMPLE_RATE):
+    """
+    按语音区间规划转录分段
+
+    相邻语音区间间隔小于 SKIP_SILENCE 且合并后不超过 segment_length 时打包进同一分段；
+    单个语音区间超过 segment_length 时，在末尾 SPLIT_SEARCH 秒内最安静的帧处切开
+
+    Args:
+        pcm: 16kHz 单声道 float32 数组
+        segment_length: 分段最大长度（秒）
+
+    Returns:
+        [(start_sample, end_sample), ...]（静音部分不包含在任何分段中）
+    """
+    regions, levels, frame_size = detect_speech(pcm, sample_rate)
+    frames_per_second = sample_rate / frame_size
+    max_frames = max(1, int(segment_length * frames_per_second))
+    skip_frames = int(SKIP_SILENCE * frames_per_second)
+    search_frames = min(max_frames // 2, int(SPLIT_SEARCH * frames_per_second))
+
+    # 超长语音区间在最安静处切开；分段过短、没有搜索范围时直接在 max_frames 处切开
+    pieces = []
+    for start, end in regions:
+        while end - start > max_frames:
+            lo = start + max_frames - search_frames
+            search = levels[lo:start + max_frames]
+            cut = lo + int(np.argmin(search)) if len(search) else start + max_frames
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    # 打包成接近 segment_length 的分段
+    chunks = []
+    for start, end in pieces:
+        if chunks:
+            chunk_start, chunk_end = chunks[-1]
+            if start - chunk_end < skip_frames and end - chunk_start <= max_frames:
+                chunks[-1] = (chunk_start, end)
+                continue
+        chunks.append((start, end))
+
+    total = len(pcm)
+    return [
+        (start * frame_size, min(end * frame_size, total))
+        for start, end in chunks
+        if start * frame_size < total
+    ]
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("用法: python vad.py <音频文件> [分段长度]")
+        sys.exit(1)
+
+    from audio_buffer import DecodedAudio
+
+    segment_length = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    with DecodedAudio.decode(sys.argv[1]) as audio:
+        segments = plan_vad_segments(audio.asr, segment_length)
+        speech = sum(end - start for start, end in segments) / SAMPLE_RATE
+        for start, end in segments:
+            print(f"{start / SAMPLE_RATE:8.2f}s - {end / SAMPLE_RATE:8.2f}s ({(end - start) / SAMPLE_RATE:.2f}s)")
+        print(f"分段数: {len(segments)}，语音 {speech:.1f}s / 总计 {audio.duration:.1f}s")
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("audiocut_keyword", SCRIPTS / "audiocut_keyword.py")
+assert SPEC and SPEC.loader
+audiocut = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(audiocut)
+
+
+class BatchInputTests(unittest.TestCase):
+    def test_directory_lists_audio_and_skips_outputs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for name in ("b.mp3", "a.WAV", "a_filtered.wav", "c_voice_changed.mp3", "notes.txt"):
+                (root / name).write_bytes(b"")
+            (root / "sub").mkdir()
+            found = audiocut.collect_batch_inputs(str(root))
+            self.assertEqual([p.name for p in found], ["a.WAV", "b.mp3"])
+
+    def test_glob_pattern(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "x").mkdir()
+            for name in ("x/1.mp3", "x/2.mp3", "x/2_filtered.mp3", "3.mp3"):
+                (root / name).write_bytes(b"")
+            found = audiocut.collect_batch_inputs(str(root / "**" / "*.mp3"))
+            self.assertEqual([p.name for p in found], ["3.mp3", "1.mp3", "2.mp3"])
+
+    def test_output_dirs_keep_subdirectory_layout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            inputs = [root / "in" / "a" / "talk.mp3", root / "in" / "b" / "talk.mp3", root / "in" / "c.mp3"]
+            out = root / "out"
+            dirs = audiocut.batch_output_dirs(inputs, out)
+            self.assertEqual(dirs, [out / "a", out / "b", out])
+            self.assertEqual(audiocut.find_output_collisions(inputs, dirs), [])
+            self.assertEqual(audiocut.batch_output_dirs(inputs, None), [p.parent for p in inputs])
+
+    def test_same_stem_in_same_directory_collides(self):
+        inputs = [Path("x/a.mp3"), Path("x/a.wav"), Path("x/b.mp3")]
+        dirs = audiocut.batch_output_dirs(inputs, Path("out"))
+        self.assertEqual(audiocut.find_output_collisions(inputs, dirs), [inputs[:2]])
+
+
+class FakeDecoded:
+    opened = []
+
+    def __init__(self, path):
+        self.duration = 1.0
+        self.closed = False
+        FakeDecoded.opened.append(self)
+
+    @classmethod
+    def decode(cls, path):
+        return cls(path)
+
+    def close(self):
+        self.closed = True
+
+
+class BatchInterruptTests(unittest.TestCase):
+    def test_queued_audio_is_closed_when_asr_loop_exits(self):
+        originals = (audiocut.DecodedAudio, audiocut.transcribe_with_funasr, audiocut.load_keyword_matcher)
+
+        def interrupt(*args, **kwargs):
+            raise KeyboardInterrupt
+
+        audiocut.DecodedAudio = FakeDecoded
+        audiocut.transcribe_with_funasr = interrupt
+        audiocut.load_keyword_matcher = lambda path: argparse.Namespace(keywords=[])
+        FakeDecoded.opened = []
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                for i in range(6):
+                    (Path(tmp) / f"{i}.mp3").write_bytes(b"")
+                args = argparse.Namespace(batch=tmp, output=None, workers=1, keep_transcript=False,
+                                          batch_size=8, segmentation="vad")
+                with self.assertRaises(KeyboardInterrupt):
+                    audiocut.run_batch(args, "keywords.json", None)
+            self.assertGreater(len(FakeDecoded.opened), 1)
+            self.assertTrue(all(audio.closed for audio in FakeDecoded.opened))
+        finally:
+            audiocut.DecodedAudio, audiocut.transcribe_with_funasr, audiocut.load_keyword_matcher = originals
+
+
+class VoiceChangerImportTests(unittest.TestCase):
+    def test_module_is_imported_once(self):
+        calls = []
+        original = audiocut._import_voice_changer
+        audiocut._import_voice_changer = lambda: calls.append(1) or object()
+        audiocut._voice_changer, audiocut._voice_changer_loaded = None, False
+        try:
+            first = audiocut.load_voice_changer()
+            self.assertIs(audiocut.load_voice_changer(), first)
+            self.assertEqual(len(calls), 1)
+        finally:
+            audiocut._import_voice_changer = original
+            audiocut._voice_changer, audiocut._voice_changer_loaded = None, False
+
+
+class FakeEncoder:
+    """记录写入块的 PcmEncoder 替身"""
+
+    def __init__(self, output_audio, sample_rate, channels, metadata_source=None):
+        self.blocks = []
+        self.ok = True
+        FakeEncoder.last = self
+
+    def write(self, block):
+        self.blocks.append(block)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeVoiceChanger:
+    STREAMING_METHODS = ("pedalboard",)
+
+    def __init__(self, method):
+        self.method = method
+        self.calls = []
+
+    def load_config(self):
+        return {}
+
+    def resolve_voice(self, config, voice):
+        return {}, self.method, "配置文件", 3
+
+    def change_voice_blocks(self, blocks, sample_rate, voice, config):
+        self.calls.append("blocks")
+        for block in blocks:
+            yield block * 2
+
+    def change_voice_array(self, audio, sample_rate, voice, config):
+        self.calls.append("array")
+        return audio * 2
+
+
+class ChangeVoiceInProcessTests(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+
+        self.original = audiocut.PcmEncoder
+        audiocut.PcmEncoder = FakeEncoder
+        pcm = np.ones((1000, 2), dtype=np.float32)
+        self.audio = argparse.Namespace(pcm=pcm, sample_rate=100, channels=2, source="in.wav")
+        self.keep = [(0.0, 3.0), (5.0, 10.0)]
+
+    def tearDown(self):
+        audiocut.PcmEncoder = self.original
+
+    def run_method(self, method):
+        import numpy as np
+
+        changer = FakeVoiceChanger(method)
+        self.assertTrue(audiocut.change_voice_in_process(changer, "out.wav", "robot", self.audio, self.keep))
+        return changer.calls, np.concatenate(FakeEncoder.last.blocks)
+
+    def test_streaming_method_never_renders_whole_cut(self):
+        original = audiocut.render_keep_segments
+        audiocut.render_keep_segments = None
+        try:
+            calls, written = self.run_method("pedalboard")
+        finally:
+            audiocut.render_keep_segments = original
+        self.assertEqual(calls, ["blocks"])
+        self.assertEqual(written.shape, (800, 2))
+
+    def test_other_methods_use_array_path(self):
+        calls, written = self.run_method("rvc")
+        self.assertEqual(calls, ["array"])
+        self.assertEqual(written.shape, (800, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
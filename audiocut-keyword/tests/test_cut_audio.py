@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("cut_audio", SCRIPTS / "cut_audio.py")
+assert SPEC and SPEC.loader
+cut = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(cut)
+
+
+class RenderKeepSegmentsTests(unittest.TestCase):
+    def test_output_length_equals_kept_length(self):
+        sr = 1000
+        pcm = np.random.default_rng(0).standard_normal((10 * sr, 2)).astype(np.float32)
+        keep = cut.compute_keep_segments([(1.0, 2.0), (5.0, 5.5)], 10.0)
+        rendered = cut.render_keep_segments(pcm, sr, keep)
+        self.assertEqual(rendered.shape, (8500, 2))
+        self.assertEqual(rendered.dtype, np.float32)
+
+    def test_untouched_regions_are_copied_exactly(self):
+        sr = 1000
+        pcm = np.random.default_rng(1).standard_normal((4 * sr, 1)).astype(np.float32)
+        rendered = cut.render_keep_segments(pcm, sr, [(0.0, 1.0), (2.0, 4.0)], crossfade=0.01)
+        np.testing.assert_array_equal(rendered[:995], pcm[:995])
+        np.testing.assert_array_equal(rendered[1005:], pcm[2005:])
+
+    def test_blocks_do_not_change_result(self):
+        sr = 1000
+        pcm = np.random.default_rng(2).standard_normal((6 * sr, 2)).astype(np.float32)
+        keep = [(0.0, 2.0), (3.0, 6.0)]
+        whole = np.concatenate(list(cut.iter_crossfaded_blocks(pcm, sr, keep)))
+        small = np.concatenate(list(cut.iter_crossfaded_blocks(pcm, sr, keep, block_frames=7)))
+        np.testing.assert_array_equal(whole, small)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class StreamCopyTests(unittest.TestCase):
+    def test_seam_with_gap_is_reported(self):
+        sr = 8000
+        t = np.arange(2 * sr) / sr
+        ref = np.sin(2 * np.pi * 440 * t).astype(np.float32)[:, None]
+        self.assertEqual(cut.seam_discontinuities(ref.copy(), ref, [sr], sr), [])
+
+        # 编码器延迟：接缝后插入 1152 个采样的静音
+        delayed = np.concatenate([ref[:sr], np.zeros((1152, 1), np.float32), ref[sr:]])[:len(ref)]
+        self.assertEqual(cut.seam_discontinuities(delayed, ref, [sr], sr), [sr])
+
+    def test_quiet_seam_is_not_reported(self):
+        sr = 8000
+        ref = np.zeros((sr, 1), np.float32)
+        out = ref + 1e-5
+        self.assertEqual(cut.seam_discontinuities(out, ref, [sr // 2], sr), [])
+
+    def test_mp3_main_data_begin(self):
+        # MPEG-1 Layer III，无 CRC：边信息前 9 位
+        self.assertEqual(cut.mp3_main_data_begin(bytes([0xFF, 0xFB, 0x90, 0x64, 0x00, 0x00])), 0)
+        self.assertEqual(cut.mp3_main_data_begin(bytes([0xFF, 0xFB, 0x90, 0x64, 0x81, 0x80])), 259)
+        # 带 CRC：跳过 2 字节
+        self.assertEqual(cut.mp3_main_data_begin(bytes([0xFF, 0xFA, 0x90, 0x64, 0xAA, 0xBB, 0x00, 0x00])), 0)
+        # MPEG-2：8 位
+        self.assertEqual(cut.mp3_main_data_begin(bytes([0xFF, 0xF3, 0x90, 0x64, 0x12, 0x00])), 0x12)
+        # 非帧头
+        self.assertIsNone(cut.mp3_main_data_begin(b'ID3\x04\x00\x00'))
+
+    def test_plan_copy_starts_only_where_allowed(self):
+        boundaries = [i * 0.1 for i in range(101)]
+        keep = [(0.0, 3.0), (4.0, 10.0)]
+        plain = cut.plan_stream_copy(keep, boundaries, 10.0)
+        self.assertEqual([p[0] for p in plain], ['copy', 'encode', 'encode', 'copy'])
+        self.assertAlmostEqual(plain[3][1], 4.5)
+
+        allowed = cut.plan_stream_copy(keep, boundaries, 10.0, can_start=lambda i: i >= 48)
+        self.assertAlmostEqual(allowed[3][1], 4.8)
+        self.assertAlmostEqual(allowed[2][2], 4.8)
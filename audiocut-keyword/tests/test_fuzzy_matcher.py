@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("fuzzy_matcher", SCRIPTS / "fuzzy_matcher.py")
+assert SPEC and SPEC.loader
+fuzzy = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(fuzzy)
+
+HAS_PINYIN = importlib.util.find_spec("pypinyin") is not None
+
+
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        prev, row[0] = row[:], i
+        for j, y in enumerate(b, 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (x != y))
+    return row[-1]
+
+
+class FuzzyMatcherTests(unittest.TestCase):
+    def test_short_keywords_allow_no_edits(self):
+        self.assertEqual(fuzzy.effective_distance(2, 1), 0)
+        self.assertEqual(fuzzy.effective_distance(3, 1), 1)
+        self.assertEqual(fuzzy.effective_distance(5, 3), 2)
+
+    def test_character_mode_finds_single_substitution(self):
+        text = "欢迎收看最佳拍挡，下期再见"
+        found = fuzzy.find_fuzzy_matches(text, ["最佳拍档"], mode="fuzzy", max_distance=1)
+        self.assertEqual(found, [(0, 4, 8, 1)])
+
+    def test_reported_distance_is_exact_edit_distance(self):
+        text = "本期视屏由大飞赞助本其视频观看本期视频"
+        keyword = "本期视频"
+        for _, start, end, distance in fuzzy.find_fuzzy_matches(text, [keyword], "fuzzy", 1):
+            self.assertEqual(levenshtein(keyword, text[start:end]), distance)
+            self.assertLessEqual(distance, 1)
+
+    @unittest.skipUnless(HAS_PINYIN, "pypinyin 未安装")
+    def test_pinyin_mode_matches_homophones(self):
+        text = "我是大非，欢迎收看最家拍档"
+        found = fuzzy.find_fuzzy_matches(text, ["大飞", "最佳拍档"], mode="pinyin", max_distance=0)
+        self.assertEqual([(idx, text[s:e], d) for idx, s, e, d in found], [(0, "大非", 0), (1, "最家拍档", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
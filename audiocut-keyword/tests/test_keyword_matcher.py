@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import json
+import random
+import re
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("keyword_matcher", SCRIPTS / "keyword_matcher.py")
+assert SPEC and SPEC.loader
+matcher_module = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(matcher_module)
+
+
+def regex_matches(text, keywords):
+    """原实现：逐个关键字 re.finditer"""
+    found = []
+    for idx, keyword in enumerate(keywords):
+        for match in re.finditer(re.escape(keyword), text):
+            found.append((idx, match.start(), match.end()))
+    return found
+
+
+class KeywordMatcherTests(unittest.TestCase):
+    def test_matches_regex_on_overlapping_keywords(self):
+        keywords = ["本期视频", "观看本期视频", "视频", "大飞", "飞飞"]
+        text = "欢迎观看本期视频，我是大飞飞飞，本期视频到此结束视频视频"
+        matcher = matcher_module.KeywordMatcher(keywords)
+        self.assertEqual(matcher.find_all(text), regex_matches(text, keywords))
+
+    def test_same_keyword_does_not_overlap_itself(self):
+        matcher = matcher_module.KeywordMatcher(["aa"])
+        self.assertEqual(matcher.find_all("aaaaa"), [(0, 0, 2), (0, 2, 4)])
+
+    def test_duplicate_keywords_are_reported_per_entry(self):
+        keywords = ["广告", "赞助", "广告"]
+        text = "本节目广告由赞助商提供广告"
+        matcher = matcher_module.KeywordMatcher(keywords)
+        self.assertEqual(matcher.find_all(text), regex_matches(text, keywords))
+
+    def test_random_texts_match_regex(self):
+        rng = random.Random(7)
+        alphabet = "关注订阅点赞广告"
+        for _ in range(200):
+            keywords = [
+                "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                for _ in range(rng.randint(1, 8))
+            ]
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            matcher = matcher_module.KeywordMatcher(keywords)
+            self.assertEqual(matcher.find_all(text), regex_matches(text, keywords), (keywords, text))
+
+    def test_compiled_matcher_is_cached_by_config_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Path(tmp) / "keywords.json"
+            config.write_text(json.dumps({"keywords": ["广告"]}, ensure_ascii=False), encoding="utf-8")
+            first = matcher_module.load_keyword_matcher(config)
+            caches = list(Path(tmp).glob(".keywords.json.*.matcher"))
+            self.assertEqual(len(caches), 1)
+            self.assertIn(first.digest[:16], caches[0].name)
+
+            config.write_text(json.dumps({"keywords": ["赞助"]}, ensure_ascii=False), encoding="utf-8")
+            second = matcher_module.load_keyword_matcher(config)
+            self.assertEqual(second.keywords, ["赞助"])
+            self.assertEqual(len(list(Path(tmp).glob(".keywords.json.*.matcher"))), 1)
+
+    def test_cache_is_json_and_rejects_tampered_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Path(tmp) / "keywords.json"
+            config.write_text(json.dumps({"keywords": ["广告", "告诉"]}, ensure_ascii=False), encoding="utf-8")
+            first = matcher_module.load_keyword_matcher(config)
+            cache = next(Path(tmp).glob(".keywords.json.*.matcher"))
+            state = json.loads(cache.read_text(encoding="utf-8"))
+            self.assertEqual(state["version"], matcher_module.CACHE_VERSION)
+
+            # 从缓存加载的匹配器与重新构建的结果一致
+            cached = matcher_module.load_keyword_matcher(config)
+            self.assertEqual(cached.find_all("广告诉说"), first.find_all("广告诉说"))
+
+            # 版本不符或内容损坏时重新构建，不使用缓存
+            state["version"] = -1
+            cache.write_text(json.dumps(state), encoding="utf-8")
+            self.assertEqual(matcher_module.load_keyword_matcher(config).find_all("广告"), [(0, 0, 2)])
+            cache.write_bytes(b"\x80\x04not json")
+            self.assertEqual(matcher_module.load_keyword_matcher(config).find_all("广告"), [(0, 0, 2)])
+
+
+class FindKeywordPositionsTests(unittest.TestCase):
+    def test_match_dicts_keep_original_shape(self):
+        detect = importlib.import_module("detect_keywords")
+        text = "欢迎观看本期视频"
+        transcript = {
+            "full_text": text,
+            "chars": [
+                {"char": c, "start": i * 0.2, "end": i * 0.2 + 0.2}
+                for i, c in enumerate(text)
+            ],
+        }
+        matches = detect.find_keyword_positions(transcript, ["本期视频", "欢迎"])
+        self.assertEqual([m["keyword"] for m in matches], ["本期视频", "欢迎"])
+        self.assertEqual(matches[0]["position"], 4)
+        self.assertEqual(matches[0]["matched_text"], "本期视频")
+        self.assertAlmostEqual(matches[0]["start"], 0.8)
+        self.assertAlmostEqual(matches[0]["end"], 1.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
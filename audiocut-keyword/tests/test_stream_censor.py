@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("stream_censor", SCRIPTS / "stream_censor.py")
+assert SPEC and SPEC.loader
+sc = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(sc)
+
+
+def feed(censor, text, first_second):
+    """模拟一个转录窗口：每字 1 秒"""
+    for i, char in enumerate(text):
+        t = (first_second + i) * 1000
+        censor.text.append(char)
+        censor.starts.append(t)
+        censor.ends.append(t + 800)
+    censor.window_start = first_second
+    censor.accept_from = (first_second + len(text)) * sc.ASR_SAMPLE_RATE
+
+
+class StreamCensorTests(unittest.TestCase):
+    def test_keyword_split_across_windows_is_found_once(self):
+        censor = sc.StreamCensor(["广告时间"], 1000, 1)
+        feed(censor, "欢迎收听广告", 0)
+        self.assertEqual(censor.scan(), [])
+        feed(censor, "时间到了", 6)
+        new = censor.scan()
+        self.assertEqual([(m["keyword"], m["position"]) for m in new], [("广告时间", 4)])
+        feed(censor, "广告时间", 10)
+        self.assertEqual([m["position"] for m in censor.scan()], [10])
+        self.assertEqual(len(censor.matches), 2)
+
+    def test_output_waits_for_possible_matches(self):
+        censor = sc.StreamCensor(["广告时间"], 1000, 1)
+        feed(censor, "欢迎收听广告", 0)
+        censor.scan()
+        # 末尾 3 个字可能是关键字的开头，之前的音频才能输出
+        self.assertLessEqual(censor.safe_time(False), 3.0 - censor.buffer_before)
+
+    def test_keyword_straddling_window_boundary_is_not_emitted(self):
+        sr = 1000
+        censor = sc.StreamCensor(["广"], sr, 1)
+        fifo = sc.PcmFifo(1)
+        fifo.append(np.ones((20 * sr, 1), dtype=np.float32))
+
+        feed(censor, "欢迎收听", 0)
+        feed(censor, "节目", 4)
+        censor.scan()
+        censor.emit(fifo, final=False)
+
+        # 下一个窗口的第一个字从 5.7s 开始，中点落在 6s 之后
+        censor.text.append("广")
+        censor.starts.append(5700)
+        censor.ends.append(6500)
+        censor.window_start = 5.7
+        censor.accept_from = 10 * sc.ASR_SAMPLE_RATE
+        censor.scan()
+        start, _ = censor.delete_segments[0]
+        self.assertGreaterEqual(start * sr, censor.emitted)
+
+    def test_censored_output_matches_delete_plan(self):
+        sr = 1000
+        cuts = []
+        censor = sc.StreamCensor(["广告"], sr, 1, on_cut=lambda s, e: cuts.append((s, e)))
+
+        class Sink:
+            frames = 0
+
+            def write(self, block):
+                Sink.frames += len(block)
+
+        censor.encoder = Sink()
+        fifo = sc.PcmFifo(1)
+        fifo.append(np.ones((12 * sr, 1), dtype=np.float32))
+        fifo.close()
+
+        feed(censor, "欢迎收听广告之后继续", 0)
+        censor.scan()
+        censor.emit(fifo, final=False)
+        censor.emit(fifo, final=True)
+        self.assertEqual(cuts, [(3.5, 6.3)])
+        self.assertEqual(Sink.frames, 12 * sr - 2800)
+
+    def test_censor_block_fades_around_cut(self):
+        block = np.ones((100, 2), dtype=np.float32)
+        out = sc.censor_block(block, 0, 1000, [(0.04, 0.06)], fade=0.005)
+        self.assertEqual(out.shape, (80, 2))
+        self.assertAlmostEqual(float(out[39, 0]), 0.2)
+        self.assertAlmostEqual(float(out[40, 0]), 0.2)
+        self.assertEqual(float(out[0, 0]), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("transcript_cache", SCRIPTS / "transcript_cache.py")
+assert SPEC and SPEC.loader
+cache_module = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(cache_module)
+
+
+format_module = importlib.import_module("transcript_format")
+TRANSCRIPT = format_module.Transcript("欢迎", [100, 300], [300, 520], 1.5)
+
+
+class TranscriptCacheTests(unittest.TestCase):
+    def test_key_depends_on_content_and_parameters(self):
+        pcm = np.linspace(-1, 1, 16000, dtype=np.float32)
+        key = cache_module.audio_cache_key(pcm, "paraformer-zh", 30)
+        self.assertEqual(key, cache_module.audio_cache_key(pcm.copy(), "paraformer-zh", 30))
+        self.assertNotEqual(key, cache_module.audio_cache_key(pcm, "paraformer-zh", 20))
+        self.assertNotEqual(key, cache_module.audio_cache_key(pcm, "other-model", 30))
+        changed = pcm.copy()
+        changed[100] = 0.5
+        self.assertNotEqual(key, cache_module.audio_cache_key(changed, "paraformer-zh", 30))
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = cache_module.TranscriptCache(tmp)
+            self.assertIsNone(cache.get("missing"))
+            cache.put("abc", TRANSCRIPT)
+            cached = cache.get("abc")
+            self.assertEqual(cached.text, "欢迎")
+            self.assertEqual(cached.starts.tolist(), [100, 300])
+            self.assertEqual(cached.ends.tolist(), [300, 520])
+            self.assertEqual(cached.duration, 1.5)
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = cache_module.TranscriptCache(tmp)
+            for key in ("a", "b", "c"):
+                cache.put(key, TRANSCRIPT)
+            now = time.time()
+            os.utime(cache._path("a"), (now - 30, now - 30))
+            os.utime(cache._path("b"), (now - 20, now - 20))
+            os.utime(cache._path("c"), (now - 10, now - 10))
+            # 读取 a 使其成为最近使用
+            cache.get("a")
+
+            entry_size = cache._path("a").stat().st_size
+            cache.max_bytes = entry_size * 2
+            cache.evict()
+
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("transcript_format", SCRIPTS / "transcript_format.py")
+assert SPEC and SPEC.loader
+fmt = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(fmt)
+
+
+TEXT = "欢迎观看本期视频😀abc"
+ROWS = [(c, i * 200, i * 200 + 180) for i, c in enumerate(TEXT)]
+
+
+class TranscriptFormatTests(unittest.TestCase):
+    def test_binary_round_trip(self):
+        transcript = fmt.Transcript.from_rows(ROWS, 12.5, "a.mp3")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "a.actr"
+            transcript.save(path)
+            loaded = fmt.load_transcript(path)
+            self.assertEqual(loaded.text, TEXT)
+            self.assertEqual(loaded.starts.tolist(), [r[1] for r in ROWS])
+            self.assertEqual(loaded.ends.tolist(), [r[2] for r in ROWS])
+            self.assertEqual(loaded.duration, 12.5)
+            self.assertEqual(loaded.audio_file, "a.mp3")
+
+    def test_empty_transcript_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "empty.actr"
+            fmt.Transcript("", [], [], 3.0).save(path)
+            loaded = fmt.load_transcript(path)
+            self.assertEqual(len(loaded), 0)
+            self.assertEqual(loaded["duration"], 3.0)
+
+    def test_json_export_keeps_legacy_shape(self):
+        transcript = fmt.Transcript.from_rows(ROWS, 12.5, "a.mp3")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "a.json"
+            fmt.save_transcript(transcript, path)
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.assertEqual(data["full_text"], TEXT)
+            self.assertEqual(data["chars"][1], {"char": "迎", "start": 0.2, "end": 0.38})
+            self.assertEqual(fmt.load_transcript(path).starts.tolist(), transcript.starts.tolist())
+
+    def test_keyword_positions_match_legacy_dict(self):
+        detect = importlib.import_module("detect_keywords")
+        transcript = fmt.Transcript.from_rows(ROWS, 12.5)
+        keywords = ["本期视频", "abc"]
+        self.assertEqual(
+            detect.find_keyword_positions(transcript, keywords),
+            detect.find_keyword_positions(transcript.to_dict(), keywords),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("vad", SCRIPTS / "vad.py")
+assert SPEC and SPEC.loader
+vad = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(vad)
+
+SR = 16000
+
+
+def synth(total, speech_spans, seed=0):
+    """低电平噪声底 + 若干段高电平“语音”"""
+    rng = np.random.default_rng(seed)
+    pcm = (rng.standard_normal(int(total * SR)) * 0.001).astype(np.float32)
+    for start, end in speech_spans:
+        a, b = int(start * SR), int(end * SR)
+        pcm[a:b] = rng.standard_normal(b - a) * 0.2
+    return pcm
+
+
+class VadSegmentationTests(unittest.TestCase):
+    def test_long_silence_is_skipped(self):
+        pcm = synth(40, [(0, 8), (20, 30)])
+        segments = vad.plan_vad_segments(pcm, 30)
+        self.assertEqual(len(segments), 2)
+        covered = sum(end - start for start, end in segments) / SR
+        self.assertLess(covered, 20)
+        for start, end in segments:
+            self.assertFalse(start / SR > 8.5 and end / SR < 19.5)
+
+    def test_segments_respect_max_length_and_cut_in_pauses(self):
+        spans = [(t, t + 3) for t in np.arange(0, 90, 3.5)]
+        pcm = synth(95, spans)
+        segments = vad.plan_vad_segments(pcm, 30)
+        self.assertGreater(len(segments), 2)
+        for start, end in segments:
+            self.assertLessEqual((end - start) / SR, 30 + vad.FRAME_SECONDS)
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            # 切点落在两段语音之间的停顿里
+            mid = (end + start) / 2 / SR
+            self.assertTrue(any(s + 3 <= mid <= s + 3.5 for s, _ in spans), mid)
+
+    def test_continuous_speech_is_split(self):
+        pcm = synth(70, [(0, 70)])
+        segments = vad.plan_vad_segments(pcm, 30)
+        self.assertEqual(segments[0][0], 0)
+        self.assertEqual(segments[-1][1], len(pcm))
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            self.assertEqual(end, start)
+
+    def test_quieter_passage_without_silence_is_kept(self):
+        # 响亮语音 60s，低 6dB 的语音 20s，再响亮 60s，中间没有静音
+        rng = np.random.default_rng(3)
+        pcm = (rng.standard_normal(140 * SR) * 0.2).astype(np.float32)
+        pcm[60 * SR:80 * SR] *= 0.5
+        segments = vad.plan_vad_segments(pcm, 30)
+        covered = np.zeros(len(pcm), dtype=bool)
+        for start, end in segments:
+            covered[start:end] = True
+        self.assertTrue(covered.all())
+
+    def test_levels_match_unblocked_computation(self):
+        pcm = np.random.default_rng(4).standard_normal(10 * 480 + 100).astype(np.float32)
+        original = vad.LEVEL_BLOCK
+        vad.LEVEL_BLOCK = 3
+        try:
+            levels = vad.frame_levels(pcm, 480)
+        finally:
+            vad.LEVEL_BLOCK = original
+        padded = np.zeros(11 * 480, dtype=np.float32)
+        padded[:len(pcm)] = pcm
+        expected = 10 * np.log10(np.square(padded.reshape(11, 480)).mean(axis=1) + 1e-10)
+        np.testing.assert_allclose(levels, expected, rtol=1e-5)
+
+    def test_tiny_segment_length_cuts_hard(self):
+        pcm = synth(2, [(0, 2)])
+        for segment_length in (0.01, vad.FRAME_SECONDS, 2 * vad.FRAME_SECONDS):
+            segments = vad.plan_vad_segments(pcm, segment_length)
+            self.assertEqual(segments[0][0], 0)
+            self.assertEqual(segments[-1][1], len(pcm))
+            for start, end in segments:
+                self.assertGreater(end, start)
+
+    def test_silence_only(self):
+        self.assertEqual(vad.plan_vad_segments(np.zeros(5 * SR, dtype=np.float32)), [])
+        self.assertEqual(vad.plan_vad_segments(np.zeros(0, dtype=np.float32)), [])
+
+
+class FixedSegmentationTests(unittest.TestCase):
+    def test_short_tail_is_merged(self):
+        transcribe = importlib.import_module("transcribe_audio")
+        segments = transcribe.plan_fixed_segments(int(61 * SR), 30)
+        self.assertEqual(segments, [(0, 30 * SR), (30 * SR, 61 * SR)])
+        segments = transcribe.plan_fixed_segments(int(65 * SR), 30)
+        self.assertEqual(len(segments), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
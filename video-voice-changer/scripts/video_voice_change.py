@@ -13,8 +13,12 @@ import argparse
 import subprocess
 import tempfile
 import shutil
+import importlib.util
 from pathlib import Path
 
+# 单次流水线每次读取的帧数
+PIPE_BLOCK_FRAMES = 1 << 16
+
 def check_dependencies():
     """检查必要的依赖"""
     dependencies = {
@@ -62,6 +66,152 @@ def get_video_info(video_file):
         return json.loads(result.stdout)
     return None
 
+def get_audio_stream_info(video_file):
+    """
+    获取第一条音轨的采样率与声道数
+
+    Returns:
+        (sample_rate, channels)，没有音轨时返回 None
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=sample_rate,channels',
+        '-of', 'json',
+        video_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    streams = json.loads(result.stdout).get('streams')
+    if not streams:
+        return None
+    return int(streams[0]['sample_rate']), int(streams[0]['channels'])
+
+def load_voice_engine():
+    """
+    导入 voice-changer 的进程内变声接口（voice_change.change_voice_blocks）
+
+    Returns:
+        voice_change 模块，voice-changer 不存在或缺少 numpy 时返回 None
+    """
+    scripts_dir = Path(__file__).parent.parent.parent / 'voice-changer' / 'scripts'
+    if not (scripts_dir / 'voice_change.py').exists():
+        return None
+    # 只探测是否安装，不为此导入 numpy
+    if importlib.util.find_spec('numpy') is None:
+        return None
+    if str(scripts_dir) not in sys.path:
+        sys.path.insert(0, str(scripts_dir))
+    import voice_change
+    return voice_change
+
+def change_video_voice_streaming(voice_engine, video_file, output_file, voice_type, config):
+    """
+    单次流水线变声：ffmpeg 解码出原始 PCM → 变声引擎 → ffmpeg 复制视频流并封装
+
+    音频全程以 float32 PCM 经管道流转，不写中间音频文件，只在最终封装时编码一次 AAC；
+    只有可逐块处理的方法（voice_change.STREAMING_METHODS）走管道，
+    RVC 等需要整段音频的方法交给 change_video_voice_chunked()
+    """
+    import numpy as np
+
+    voice_config, method, _, pitch_shift = voice_engine.resolve_voice(config, voice_type)
+    if method not in voice_engine.STREAMING_METHODS:
+        return change_video_voice_chunked(voice_engine, video_file, output_file, voice_type,
+                                          voice_config, method, pitch_shift)
+
+    info = get_audio_stream_info(video_file)
+    if info is None:
+        print(f"视频中没有音轨: {video_file}")
+        return False
+    sample_rate, channels = info
+    print(f"音轨: {sample_rate} Hz，{channels} 声道")
+    print(f"正在变声并合并音频和视频（单次流水线）...")
+
+    pcm_args = ['-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels)]
+    decode_cmd = ['ffmpeg', '-v', 'error', '-i', video_file, '-map', '0:a:0', '-vn'] + pcm_args + ['pipe:1']
+    mux_cmd = [
+        'ffmpeg', '-v', 'error',
+        '-i', video_file,
+    ] + pcm_args + [
+        '-i', 'pipe:0',
+        '-map', '0:v:0',  # 使用输入文件的视频
+        '-map', '1:a:0',  # 使用管道送入的新音频
+        '-c:v', 'copy',   # 复制视频流，不重新编码
+        '-c:a', 'aac',    # 音频编码为 AAC
+        '-shortest',      # 以最短的流为准
+        # 变声有启动延迟，允许视频包多缓冲一些，等待音频到达
+        '-max_muxing_queue_size', '4096',
+        '-y',
+        output_file
+    ]
+
+    # ffmpeg 的错误输出写入临时文件，避免管道写满阻塞
+    with tempfile.TemporaryFile() as decode_log, tempfile.TemporaryFile() as mux_log:
+        decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=decode_log)
+        muxer = subprocess.Popen(mux_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=mux_log)
+
+        def read_blocks():
+            frame_bytes = 4 * channels
+            while True:
+                data = decoder.stdout.read(PIPE_BLOCK_FRAMES * frame_bytes)
+                if not data:
+                    break
+                data = data[:len(data) - len(data) % frame_bytes]
+                yield np.frombuffer(data, dtype='<f4').reshape(-1, channels)
+
+        error = None
+        try:
+            for block in voice_engine.change_voice_blocks(read_blocks(), sample_rate, voice_type, config):
+                muxer.stdin.write(np.ascontiguousarray(block, dtype='<f4').tobytes())
+        except BrokenPipeError:
+            error = "封装进程提前退出"
+        except Exception as e:
+            error = str(e)
+        finally:
+            try:
+                muxer.stdin.close()
+            except BrokenPipeError:
+                pass
+            if error:
+                decoder.kill()
+                muxer.kill()
+            decoder.stdout.close()
+            decode_code = decoder.wait()
+            mux_code = muxer.wait()
+
+        if error is None and decode_code != 0:
+            decode_log.seek(0)
+            error = f"音频解码失败: {decode_log.read().decode(errors='replace')}"
+        if error is None and mux_code != 0:
+            mux_log.seek(0)
+            error = f"合并失败: {mux_log.read().decode(errors='replace')}"
+
+    if error:
+        print(f"变声失败: {error}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return False
+    print(f"合并完成: {output_file}")
+    return True
+
+def change_video_voice_chunked(voice_engine, video_file, output_file, voice_type, voice_config, method, pitch_shift):
+    """
+    非流式方法（RVC）变声：由变声引擎直接从视频解码音轨并分段并行转换，
+    结果写入无损临时 WAV 后与视频合并
+
+    RVC 只解码为 16kHz 单声道，不在内存中保留原采样率的整条多声道音轨
+    """
+    print(f"正在变声（{method}，分段处理）...")
+    with tempfile.TemporaryDirectory(prefix='video_voice_change_') as temp_dir:
+        changed_audio = os.path.join(temp_dir, 'changed.wav')
+        if not voice_engine.run_voice(video_file, changed_audio, voice_type, voice_config, method, pitch_shift):
+            print("变声失败")
+            return False
+        return merge_audio_video(video_file, changed_audio, output_file)
+
 def extract_audio(video_file, audio_file):
     """从视频中提取音频"""
     print(f"正在从视频中提取音频...")
@@ -226,7 +376,12 @@ def main():
         print(f"分辨率: {stream.get('width', 'N/A')}x{stream.get('height', 'N/A')}")
     print()
 
-    # 创建临时目录
+    # 默认走单次流水线；保留音频文件或变声引擎不可用（缺少 numpy）时走文件中转流程
+    voice_engine = None if args.keep_audio else load_voice_engine()
+    if voice_engine is None and not args.keep_audio:
+        print("voice-changer 进程内接口不可用（需要 numpy），使用文件中转流程")
+
+    # 创建临时目录（单次流水线只在覆盖原文件时需要）
     if args.temp_dir:
         temp_dir = Path(args.temp_dir)
     else:
@@ -234,28 +389,35 @@ def main():
 
     temp_dir.mkdir(parents=True, exist_ok=True)
 
+    # 如果输出是原文件，先输出到临时文件再移动
+    if output_video == args.input_video:
+        merge_output = temp_dir / f"{input_path.stem}_output{input_path.suffix}"
+    else:
+        merge_output = Path(output_video)
+
     try:
-        # 步骤 1: 从视频中提取音频
-        temp_audio = temp_dir / f"{input_path.stem}_original.mp3"
-        if not extract_audio(args.input_video, str(temp_audio)):
-            sys.exit(1)
+        if voice_engine is not None:
+            config = load_voice_config(args.config)
+            if not change_video_voice_streaming(voice_engine, args.input_video, str(merge_output), args.voice, config):
+                sys.exit(1)
+        else:
+            # 步骤 1: 从视频中提取音频
+            temp_audio = temp_dir / f"{input_path.stem}_original.mp3"
+            if not extract_audio(args.input_video, str(temp_audio)):
+                sys.exit(1)
 
-        # 步骤 2: 对音频进行变声
-        changed_audio = temp_dir / f"{input_path.stem}_changed.mp3"
-        if not change_audio_voice(str(temp_audio), str(changed_audio), args.voice, args.config):
-            sys.exit(1)
+            # 步骤 2: 对音频进行变声
+            changed_audio = temp_dir / f"{input_path.stem}_changed.mp3"
+            if not change_audio_voice(str(temp_audio), str(changed_audio), args.voice, args.config):
+                sys.exit(1)
 
-        # 步骤 3: 将变声后的音频与视频合并
-        if output_video == args.input_video:
-            # 如果输出是原文件，先输出到临时文件再移动
-            temp_output = temp_dir / f"{input_path.stem}_output{input_path.suffix}"
-            if not merge_audio_video(args.input_video, str(changed_audio), str(temp_output)):
+            # 步骤 3: 将变声后的音频与视频合并
+            if not merge_audio_video(args.input_video, str(changed_audio), str(merge_output)):
                 sys.exit(1)
+
+        if output_video == args.input_video:
             # 移动临时文件到目标位置
-            shutil.move(str(temp_output), output_video)
-        else:
-            if not merge_audio_video(args.input_video, str(changed_audio), output_video):
-                sys.exit(1)
+            shutil.move(str(merge_output), output_video)
 
         print()
         print("=" * 50)
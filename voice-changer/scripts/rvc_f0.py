@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+RVC F0 提取引擎
+在 RVC Pipeline 自带的 pm / harvest / crepe / rmvpe 之外增加 pyworld dio，
+统一为 extract_f0() 接口，并记录每次提取的耗时
+
+auto 模式在第一段音频的开头做一次小规模校准：以 harvest 为参照，
+测量各方法的速度与一致率，选出满足质量要求的最快方法
+"""
+import os
+import time
+import hashlib
+from pathlib import Path
+
+# numpy 在用到时才导入，命令行读取 F0_METHODS 等常量时无需加载
+
+SCRIPT_DIR = Path(__file__).parent.parent
+RVC_CODE_PATH = SCRIPT_DIR / 'models' / 'Retrieval-based-Voice-Conversion-WebUI'
+
+SAMPLE_RATE = 16000
+
+# Pipeline 的 F0 帧移（采样点，10ms）
+HOP = 160
+
+F0_MIN = 50
+F0_MAX = 1100
+
+F0_METHODS = ('pm', 'dio', 'harvest', 'rmvpe', 'crepe')
+
+# 校准参照方法（RVC 默认，质量最稳定）
+REFERENCE_METHOD = 'harvest'
+
+# 校准候选（crepe 在 CPU 上远慢于 harvest，不参与）
+CALIBRATION_METHODS = ('pm', 'dio', 'rmvpe')
+
+# 校准使用的音频长度（秒）
+CALIBRATION_SECONDS = 10
+
+# 默认质量要求：与参照的帧一致率
+DEFAULT_QUALITY = 0.85
+
+# 两种方法都判为浊音时，音高差在该范围内视为一致（音分）
+AGREEMENT_CENTS = 50
+
+def find_rmvpe_root():
+    """
+    查找 rmvpe.pt 所在目录并设置 RVC 读取的 rmvpe_root 环境变量
+
+    Returns:
+        目录路径，未找到返回 None
+    """
+    candidates = [os.environ.get('rmvpe_root'), RVC_CODE_PATH / 'assets' / 'rmvpe']
+    for root in candidates:
+        if root and (Path(root) / 'rmvpe.pt').exists():
+            os.environ['rmvpe_root'] = str(root)
+            return str(root)
+    return None
+
+def quantize_f0(f0):
+    """
+    F0（Hz）量化为 1-255 的粗粒度音高（与 RVC Pipeline.get_f0 相同）
+
+    Returns:
+        (f0_coarse, f0)
+    """
+    import numpy as np
+
+    f0_mel_min = 1127 * np.log(1 + F0_MIN / 700)
+    f0_mel_max = 1127 * np.log(1 + F0_MAX / 700)
+    f0_mel = 1127 * np.log(1 + f0 / 700)
+    f0_mel[f0_mel > 0] = (f0_mel[f0_mel > 0] - f0_mel_min) * 254 / (f0_mel_max - f0_mel_min) + 1
+    f0_mel[f0_mel <= 1] = 1
+    f0_mel[f0_mel > 255] = 255
+    return np.rint(f0_mel).astype(np.int32), f0
+
+def fit_length(f0, p_len):
+    """截断或补零到 p_len 帧"""
+    import numpy as np
+
+    if len(f0) >= p_len:
+        return f0[:p_len]
+    return np.pad(f0, (0, p_len - len(f0)))
+
+def f0_dio(x, p_len, filter_radius=3):
+    """pyworld dio + stonemask：速度约为 harvest 的数十倍，浊音判断略粗"""
+    import numpy as np
+    import pyworld
+    from scipy import signal
+
+    x = np.asarray(x, dtype=np.double)
+    f0, t = pyworld.dio(x, fs=SAMPLE_RATE, f0_ceil=F0_MAX, f0_floor=F0_MIN, frame_period=1000 * HOP / SAMPLE_RATE)
+    f0 = pyworld.stonemask(x, f0, t, SAMPLE_RATE)
+    if filter_radius > 2:
+        f0 = signal.medfilt(f0, 3)
+    return fit_length(f0, p_len)
+
+def f0_agreement(f0, reference):
+    """
+    与参照 F0 的帧一致率：浊音判断一致，且同为浊音时音高差不超过 AGREEMENT_CENTS
+
+    Returns:
+        0-1 之间的比例
+    """
+    import numpy as np
+
+    n = min(len(f0), len(reference))
+    if n == 0:
+        return 0.0
+    f0, reference = f0[:n], reference[:n]
+    voiced, ref_voiced = f0 > 0, reference > 0
+    agree = voiced == ref_voiced
+    both = voiced & ref_voiced
+    cents = np.zeros(n)
+    cents[both] = 1200 * np.abs(np.log2(f0[both] / reference[both]))
+    agree &= cents <= AGREEMENT_CENTS
+    return float(agree.mean())
+
+class F0Engine:
+    """
+    F0 提取引擎：包装 Pipeline.get_f0，增加 dio 并记录每次提取耗时
+
+    Attributes:
+        timings: [{'method', 'seconds', 'audio_seconds'}, ...]
+    """
+
+    def __init__(self, get_f0):
+        self._get_f0 = get_f0
+        self.timings = []
+        find_rmvpe_root()
+
+    def extract_f0(self, method, x, p_len, filter_radius=3):
+        """
+        提取未做音高调整的 F0（Hz，p_len 帧）
+
+        Args:
+            method: F0_METHODS 之一
+            x: 16kHz 音频
+        """
+        import numpy as np
+
+        if method not in F0_METHODS:
+            raise ValueError(f"不支持的 F0 方法: {method}")
+        start = time.perf_counter()
+        if method == 'dio':
+            f0 = f0_dio(x, p_len, filter_radius)
+        else:
+            from infer.modules.vc import pipeline as pipeline_module
+
+            # harvest 按该标识做 lru_cache，取内容哈希避免不同音频互相命中
+            audio_key = 'f0-' + hashlib.sha1(np.ascontiguousarray(x).tobytes()).hexdigest()
+            try:
+                _, f0 = self._get_f0(audio_key, x, p_len, 0, method, filter_radius)
+            finally:
+                pipeline_module.input_audio_path2wav.pop(audio_key, None)
+        self.timings.append({
+            'method': method,
+            'seconds': time.perf_counter() - start,
+            'audio_seconds': len(x) / SAMPLE_RATE,
+        })
+        return f0
+
+    def get_f0(self, input_audio_path, x, p_len, f0_up_key, f0_method, filter_radius, inp_f0=None):
+        """与 Pipeline.get_f0 签名一致，可直接替换"""
+        if inp_f0 is not None or f0_method != 'dio':
+            start = time.perf_counter()
+            result = self._get_f0(input_audio_path, x, p_len, f0_up_key, f0_method, filter_radius, inp_f0)
+            self.timings.append({
+                'method': f0_method,
+                'seconds': time.perf_counter() - start,
+                'audio_seconds': len(x) / SAMPLE_RATE,
+            })
+            return result
+
+        f0 = self.extract_f0('dio', x, p_len, filter_radius)
+        return quantize_f0(f0 * pow(2, f0_up_key / 12))
+
+    def calibrate(self, audio, methods=CALIBRATION_METHODS, quality=DEFAULT_QUALITY,
+                  seconds=CALIBRATION_SECONDS, filter_radius=3):
+        """
+        在音频开头做一次校准，选出满足质量要求的最快方法
+
+        Args:
+            audio: 16kHz 单声道音频（通常为第一段）
+            methods: 候选方法
+            quality: 与参照（harvest）的最低帧一致率
+
+        Returns:
+            (method, report)
+            report: [{'method', 'rtf', 'agreement'} 或 {'method', 'error'}, ...]
+        """
+        import numpy as np
+
+        x = np.asarray(audio[:int(seconds * SAMPLE_RATE)], dtype=np.double)
+        p_len = len(x) // HOP
+        duration = max(len(x) / SAMPLE_RATE, 1e-6)
+
+        def run(method):
+            start = time.perf_counter()
+            f0 = self.extract_f0(method, x, p_len, filter_radius)
+            return f0, (time.perf_counter() - start) / duration
+
+        reference, reference_rtf = run(REFERENCE_METHOD)
+        report = [{'method': REFERENCE_METHOD, 'rtf': reference_rtf, 'agreement': 1.0}]
+        for method in methods:
+            if method == REFERENCE_METHOD:
+                continue
+            if method == 'rmvpe' and not os.environ.get('rmvpe_root'):
+                report.append({'method': method, 'error': '未找到 rmvpe.pt'})
+                continue
+            try:
+                f0, rtf = run(method)
+            except Exception as e:
+                report.append({'method': method, 'error': str(e)})
+                continue
+            report.append({'method': method, 'rtf': rtf, 'agreement': f0_agreement(f0, reference)})
+
+        passed = [r for r in report if 'rtf' in r and r['agreement'] >= quality]
+        best = min(passed, key=lambda r: r['rtf'])
+        return best['method'], report
+
+def format_calibration(method, report):
+    """校准结果的可读文本（多行）"""
+    lines = []
+    for r in report:
+        if 'error' in r:
+            lines.append(f"  {r['method']:8s} 不可用: {r['error']}")
+        else:
+            mark = ' ←' if r['method'] == method else ''
+            lines.append(f"  {r['method']:8s} RTF {r['rtf']:.3f}  一致率 {r['agreement']:.1%}{mark}")
+    return '\n'.join(lines)
+
+def install_f0_engine(runtime):
+    """为 RVCRuntime 安装 F0 引擎（需在特征缓存之前安装）"""
+    engine = F0Engine(runtime.pipeline.get_f0)
+    runtime.pipeline.get_f0 = engine.get_f0
+    runtime.f0_engine = engine
+    return engine
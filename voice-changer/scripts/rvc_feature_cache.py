@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+RVC 特征缓存 - F0 与 HuBERT 特征按输入内容缓存
+同一段旁白换声音、换音高重新转换时，只需重新跑合成（net_g）一步
+
+缓存键取自 Pipeline 实际收到的输入（滤波、填充后的分段音频），
+因此已隐含音频内容与分段边界；F0 另按提取方法与过滤半径区分。
+F0 在音高调整之前缓存，不同 f0up_key 共用同一条目
+
+条目为压缩 .npz，按最近使用时间（mtime）做 LRU 淘汰，总大小不超过上限
+"""
+import os
+import sys
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from rvc_f0 import quantize_f0
+
+DEFAULT_MAX_MB = 2048
+CACHE_SUFFIX = '.npz'
+
+# 缓存键版本，特征提取逻辑变化时递增使旧条目失效
+CACHE_VERSION = 1
+
+def default_cache_dir():
+    """默认缓存目录（遵循 XDG_CACHE_HOME）"""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'voice-changer' / 'features'
+
+def feature_key(kind, data, *params):
+    """由特征类型、输入数组内容与参数计算缓存键"""
+    h = hashlib.sha256()
+    h.update(repr((CACHE_VERSION, kind, str(data.dtype), data.shape) + params).encode('utf-8'))
+    h.update(memoryview(np.ascontiguousarray(data)).cast('B'))
+    return f"{kind}-{h.hexdigest()}"
+
+class FeatureCache:
+    """本地特征缓存，多个 worker 进程可共用同一目录"""
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key):
+        """
+        读取缓存条目
+
+        Returns:
+            {名称: 数组} 或 None（未命中/条目损坏）
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError, EOFError):
+            self.misses += 1
+            return None
+
+        # 刷新 mtime，作为 LRU 的最近使用时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return arrays
+
+    def put(self, key, **arrays):
+        """写入缓存条目，并按大小上限淘汰最久未使用的条目"""
+        path = self._path(key)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 多个 worker 可能同时写同一条目，临时文件按进程区分
+            tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_file, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_file, path)
+            self.evict()
+        except OSError as e:
+            # 缓存失败不影响主流程
+            print(f"⚠️  无法写入特征缓存: {e}")
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        # 最新的条目即使超过上限也保留
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """清空缓存"""
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            path.unlink()
+
+def cached_get_f0(get_f0, cache):
+    """
+    包装 Pipeline.get_f0：缓存未做音高调整的 F0，命中时只做音高调整与量化
+    """
+    def wrapper(input_audio_path, x, p_len, f0_up_key, f0_method, filter_radius, inp_f0=None):
+        if inp_f0 is not None:
+            return get_f0(input_audio_path, x, p_len, f0_up_key, f0_method, filter_radius, inp_f0)
+
+        key = feature_key('f0', x, f0_method, filter_radius, p_len)
+        entry = cache.get(key)
+        if entry is None:
+            _, f0 = get_f0(input_audio_path, x, p_len, 0, f0_method, filter_radius)
+            cache.put(key, f0=f0)
+        else:
+            f0 = entry['f0']
+        return quantize_f0(f0 * pow(2, f0_up_key / 12))
+
+    return wrapper
+
+class CachedHubert:
+    """
+    HuBERT 模型代理：extract_features 结果按输入分段内容缓存，其余属性转发给原模型
+    """
+
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+
+    def extract_features(self, source, padding_mask=None, output_layer=None):
+        import torch
+
+        key = feature_key('hubert', source.detach().cpu().numpy(), output_layer)
+        entry = self.cache.get(key)
+        if entry is not None:
+            feats = torch.from_numpy(entry['feats']).to(device=source.device, dtype=source.dtype)
+            return feats, None
+
+        logits = self.model.extract_features(source=source, padding_mask=padding_mask, output_layer=output_layer)
+        self.cache.put(key, feats=logits[0].detach().float().cpu().numpy())
+        return logits
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+def install_feature_cache(runtime, cache):
+    """为 RVCRuntime 启用特征缓存"""
+    runtime.hubert_model = CachedHubert(runtime.hubert_model, cache)
+    runtime.pipeline.get_f0 = cached_get_f0(runtime.pipeline.get_f0, cache)
+
+if __name__ == '__main__':
+    cache = FeatureCache(sys.argv[2] if len(sys.argv) > 2 else None)
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        cache.clear()
+        print(f"✅ 已清空特征缓存: {cache.cache_dir}")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'info':
+        files = list(cache.cache_dir.glob(f"*{CACHE_SUFFIX}"))
+        size = sum(f.stat().st_size for f in files)
+        print(f"缓存目录: {cache.cache_dir}")
+        print(f"条目数: {len(files)}（F0 {sum(f.name.startswith('f0-') for f in files)}）")
+        print(f"总大小: {size / 1024 / 1024:.2f} MB")
+    else:
+        print("用法: python rvc_feature_cache.py info|clear [缓存目录]")
+        sys.exit(1)
@@ -6,13 +6,12 @@ import os
 import sys
 import argparse
 import numpy as np
-import torch
-import librosa
-import soundfile as sf
 from pathlib import Path
-import subprocess
+import hashlib
 import traceback
 
+# torch / soundfile 在用到时才导入，--help 与参数检查无需等待加载
+
 # 添加 RVC 路径
 SCRIPT_DIR = Path(__file__).parent.parent
 RVC_CODE_PATH = SCRIPT_DIR / 'models' / 'Retrieval-based-Voice-Conversion-WebUI'
@@ -26,6 +25,8 @@ def get_device():
 class RVCConfig:
     """RVC 配置类"""
     def __init__(self, device="cpu"):
+        import torch
+
         self.device = torch.device(device)
         self.is_half = False
         self.x_pad = 3
@@ -40,6 +41,8 @@ def load_rvc_model(model_path, device="cpu"):
     Returns:
         (net_g, tgt_sr, if_f0, version)
     """
+    import torch
+
     print(f"正在加载 RVC 模型: {os.path.basename(model_path)}")
 
     # 加载 checkpoint
@@ -131,10 +134,154 @@ def load_rvc_model(model_path, device="cpu"):
 
     return net_g, tgt_sr, if_f0, version
 
+def find_hubert_model():
+    """查找 HuBERT 模型文件"""
+    hubert_model_path = SCRIPT_DIR / 'models' / 'rvc_models' / 'weizuo' / 'rvc-model' / 'assets' / 'hubert' / 'hubert_base.pt'
+    if not hubert_model_path.exists():
+        # 尝试其他位置
+        hubert_model_path = SCRIPT_DIR / 'models' / 'rvc_models' / 'hubert' / 'hubert_base.pt'
+
+    if not hubert_model_path.exists():
+        raise FileNotFoundError(f"HuBERT 模型文件不存在: {hubert_model_path}")
+    return hubert_model_path
+
+def load_hubert_model(device="cpu"):
+    """加载 HuBERT 模型（使用 RVC 的 get_hubert_model 函数）"""
+    import torch
+    from infer.lib.jit.get_hubert import get_hubert_model
+
+    hubert_model_path = find_hubert_model()
+    print(f"  加载文件: {hubert_model_path}")
+    hubert_model = get_hubert_model(str(hubert_model_path), torch.device(device))
+    hubert_model.eval()
+    print(f"  HuBERT 模型加载成功")
+    return hubert_model
+
+class RVCRuntime:
+    """
+    常驻内存的 RVC 推理环境
+
+    RVC 模型、HuBERT 与 Pipeline 只加载一次，之后每次 convert() 只做推理，
+    供分块处理和常驻 worker（rvc_worker.py）重复使用。
+    F0 提取经 F0Engine（rvc_f0.py），f0_method='auto' 时首次转换前校准一次
+    """
+
+    def __init__(self, model_path, device="cpu", voice_config=None):
+        from infer.modules.vc.pipeline import Pipeline
+        from rvc_f0 import install_f0_engine
+
+        self.voice_config = dict(voice_config or {})
+        self.net_g, self.tgt_sr, self.if_f0, self.version = load_rvc_model(model_path, device)
+
+        print("正在加载 HuBERT 模型...")
+        self.hubert_model = load_hubert_model(device)
+        self.pipeline = Pipeline(self.tgt_sr, RVCConfig(device))
+        install_f0_engine(self)
+        self.auto_f0_method = None
+        self.last_f0_method = None
+
+        file_index = self.voice_config.get('index_path') or ''
+        # 展开 ~ 路径
+        if file_index:
+            file_index = os.path.expanduser(file_index)
+        self.file_index = file_index if file_index and os.path.exists(file_index) else ''
+
+    def calibrate_f0(self, audio, quality=None):
+        """
+        在音频开头校准 F0 方法，之后 f0_method='auto' 的转换都使用结果
+
+        Returns:
+            (method, report)
+        """
+        from rvc_f0 import DEFAULT_QUALITY, format_calibration
+
+        if quality is None:
+            quality = self.voice_config.get('f0_quality', DEFAULT_QUALITY)
+        method, report = self.f0_engine.calibrate(
+            audio, quality=quality, filter_radius=self.voice_config.get('filter_radius', 3)
+        )
+        print(f"F0 方法校准（一致率要求 {quality:.0%}）:")
+        print(format_calibration(method, report))
+        self.auto_f0_method = method
+        return method, report
+
+    def convert(self, audio, f0up_key=None, f0_method=None, resample_sr=None, times=None, audio_key=None):
+        """
+        转换一段音频
+
+        Args:
+            audio: 16kHz 单声道 float32 数组
+            f0up_key: 音高调整（半音，默认取 voice_config）
+            f0_method: F0 提取方法（默认取 voice_config；auto 为校准选出的方法）
+            resample_sr: 输出采样率（默认模型采样率）
+            times: [特征, F0, 推理] 累计耗时列表
+            audio_key: 音频标识，RVC 以此缓存 harvest F0（默认取内容哈希）
+
+        Returns:
+            (float32 输出音频, 输出采样率)
+        """
+        from infer.modules.vc import pipeline as pipeline_module
+
+        config = self.voice_config
+        if f0up_key is None:
+            f0up_key = config.get('f0up_key', 0)
+        if f0_method is None:
+            f0_method = config.get('f0_method', 'harvest')
+        if resample_sr is None:
+            resample_sr = config.get('resample_sr', 0)
+        if resample_sr < 16000:
+            resample_sr = self.tgt_sr
+        if times is None:
+            times = [0, 0, 0]
+
+        audio = np.asarray(audio, dtype=np.float32)
+        if f0_method == 'auto':
+            f0_method = self.auto_f0_method or self.calibrate_f0(audio)[0]
+        self.last_f0_method = f0_method
+
+        audio_max = np.abs(audio).max() / 0.95 if len(audio) else 0
+        if audio_max > 1:
+            audio = audio / audio_max
+
+        # harvest F0 按 audio_key 做 lru_cache，分块时每块必须不同
+        if audio_key is None:
+            audio_key = 'pcm-' + hashlib.sha1(audio.tobytes()).hexdigest()
+
+        try:
+            audio_opt = self.pipeline.pipeline(
+                self.hubert_model,
+                self.net_g,
+                0,  # speaker ID
+                audio,
+                audio_key,
+                times,
+                f0up_key,
+                f0_method,
+                self.file_index,
+                config.get('index_rate', 0.75),
+                self.if_f0,
+                config.get('filter_radius', 3),
+                self.tgt_sr,
+                resample_sr,
+                config.get('rms_mix_rate', 0.25),
+                self.version,
+                config.get('protect', 0.33),
+            )
+        finally:
+            # Pipeline 把每段音频存进模块级字典，常驻进程中不清理会持续占用内存
+            pipeline_module.input_audio_path2wav.pop(audio_key, None)
+
+        # Pipeline 输出 int16
+        if audio_opt.dtype == np.int16:
+            audio_opt = audio_opt.astype(np.float32) / 32768
+        return audio_opt, resample_sr
+
 def voice_conversion(input_audio, output_audio, model_path, voice_config=None, f0up_key=0,
-                     f0_method="harvest", device="cpu"):
+                     f0_method="auto", device="cpu", feature_cache=None):
     """
     执行 RVC 语音转换 - 使用完整的 RVC Pipeline
+
+    feature_cache: F0/HuBERT 特征缓存目录，None 表示不缓存
     """
     if voice_config is None:
         voice_config = {}
@@ -147,116 +294,51 @@ def voice_conversion(input_audio, output_audio, model_path, voice_config=None, f
     print("RVC 真实语音转换")
     print("=" * 50)
 
-    # 加载模型
+    # 加载模型、HuBERT 与 Pipeline
     try:
-        net_g, tgt_sr, if_f0, version = load_rvc_model(model_path, device)
-    except Exception as e:
-        print(f"模型加载失败: {e}")
-        traceback.print_exc()
-        return False
+        runtime = RVCRuntime(model_path, device, voice_config)
+        if feature_cache:
+            from rvc_feature_cache import FeatureCache, install_feature_cache
 
-    # 加载 HuBERT 模型（使用 RVC 的 get_hubert_model 函数）
-    print("正在加载 HuBERT 模型...")
-    try:
-        # 使用 RVC 的 get_hubert_model 函数
-        from infer.lib.jit.get_hubert import get_hubert_model
-
-        # 查找 HuBERT 模型文件
-        hubert_model_path = SCRIPT_DIR / 'models' / 'rvc_models' / 'weizuo' / 'rvc-model' / 'assets' / 'hubert' / 'hubert_base.pt'
-        if not hubert_model_path.exists():
-            # 尝试其他位置
-            hubert_model_path = SCRIPT_DIR / 'models' / 'rvc_models' / 'hubert' / 'hubert_base.pt'
-
-        if not hubert_model_path.exists():
-            raise FileNotFoundError(f"HuBERT 模型文件不存在: {hubert_model_path}")
-
-        print(f"  加载文件: {hubert_model_path}")
-        hubert_model = get_hubert_model(str(hubert_model_path), torch.device(device))
-        hubert_model.eval()
-        print(f"  HuBERT 模型加载成功")
+            install_feature_cache(runtime, FeatureCache(feature_cache))
     except Exception as e:
-        print(f"  HuBERT 加载失败: {e}")
-        traceback.print_exc()
-        return False
-
-    # 创建配置
-    config = RVCConfig(device)
-
-    # 导入 Pipeline
-    try:
-        from infer.modules.vc.pipeline import Pipeline
-        from infer.lib.audio import load_audio
-    except Exception as e:
-        print(f"  无法导入 Pipeline: {e}")
+        print(f"模型加载失败: {e}")
         traceback.print_exc()
         return False
 
-    # 创建 Pipeline
-    pipeline = Pipeline(tgt_sr, config)
-
     # 加载音频
     print("正在加载音频...")
     try:
+        from infer.lib.audio import load_audio
+
         audio = load_audio(input_audio, 16000)
-        audio_max = np.abs(audio).max() / 0.95
-        if audio_max > 1:
-            audio = audio / audio_max
     except Exception as e:
         print(f"  音频加载失败: {e}")
         traceback.print_exc()
         return False
 
-    # RVC 推理参数
-    sid = 0  # speaker ID
-    file_index = voice_config.get('index_path', '')
-    # 展开 ~ 路径
-    if file_index:
-        file_index = os.path.expanduser(file_index)
-    index_rate = voice_config.get('index_rate', 0.75)
-    filter_radius = voice_config.get('filter_radius', 3)
-    resample_sr = voice_config.get('resample_sr', 0)
-    rms_mix_rate = voice_config.get('rms_mix_rate', 0.25)
-    protect = voice_config.get('protect', 0.33)
-
     print(f"正在执行 RVC 推理...")
     print(f"  音高调整: {f0up_key:+d} 半音")
     print(f"  F0 方法: {f0_method}")
-    if file_index and os.path.exists(file_index):
-        print(f"  使用 Index 文件: {os.path.basename(file_index)}")
-    else:
-        file_index = ""
+    if runtime.file_index:
+        print(f"  使用 Index 文件: {os.path.basename(runtime.file_index)}")
 
     # 执行 RVC Pipeline
     try:
         times = [0, 0, 0]  # 计时
-
-        audio_opt = pipeline.pipeline(
-            hubert_model,
-            net_g,
-            sid,
-            audio,
-            input_audio,
-            times,
-            f0up_key,
-            f0_method,
-            file_index,
-            index_rate,
-            if_f0,
-            filter_radius,
-            tgt_sr,
-            resample_sr if resample_sr >= 16000 else tgt_sr,
-            rms_mix_rate,
-            version,
-            protect,
+        audio_opt, out_sr = runtime.convert(
+            audio, f0up_key, f0_method, times=times, audio_key=input_audio
         )
 
         # 保存输出
+        import soundfile as sf
+
         print("正在保存输出...")
-        sf.write(output_audio, audio_opt, tgt_sr)
+        sf.write(output_audio, audio_opt, out_sr)
 
         print(f"✅ RVC 转换完成！")
         print(f"输出文件: {output_audio}")
-        print(f"处理时间: 提取特征={times[0]:.2f}s, F0提取={times[1]:.2f}s, 推理={times[2]:.2f}s")
+        print(f"处理时间: 提取特征={times[0]:.2f}s, F0提取({runtime.last_f0_method})={times[1]:.2f}s, 推理={times[2]:.2f}s")
         return True
 
     except Exception as e:
@@ -270,8 +352,9 @@ def main():
     parser.add_argument('-o', '--output', required=True, help='输出音频文件')
     parser.add_argument('-m', '--model', required=True, help='RVC 模型路径 (.pth)')
     parser.add_argument('-p', '--pitch', type=int, default=0, help='音高调整（半音）')
-    parser.add_argument('-f', '--f0-method', default='harvest',
-                       choices=['harvest', 'pm', 'crepe'], help='F0 提取方法')
+    parser.add_argument('-f', '--f0-method', default='auto',
+                       choices=['auto', 'harvest', 'pm', 'dio', 'rmvpe', 'crepe'],
+                       help='F0 提取方法（默认: auto，校准后选满足质量要求的最快方法）')
     parser.add_argument('-d', '--device', help='运行设备（cpu/cuda/mps）')
     parser.add_argument('-i', '--index', help='Index 文件路径（提高音质）')
     parser.add_argument('--index-rate', type=float, default=0.75, help='Index 混合率')
@@ -279,6 +362,7 @@ def main():
     parser.add_argument('--resample-sr', type=int, default=0, help='重采样率')
     parser.add_argument('--rms-mix-rate', type=float, default=0.25, help='RMS 混合率')
     parser.add_argument('--protect', type=float, default=0.33, help='保护清音比例')
+    parser.add_argument('--feature-cache', help='F0/HuBERT 特征缓存目录（默认: 不缓存）')
 
     args = parser.parse_args()
 
@@ -310,7 +394,8 @@ def main():
         args.output,
         args.model,
         voice_config=voice_config,
-        device=device
+        device=device,
+        feature_cache=args.feature_cache
     )
 
     sys.exit(0 if success else 1)
@@ -2,234 +2,375 @@
 """
 RVC 分批处理长音频
 将长音频分割成小段分别处理，然后合并
+
+分段全程在内存中流转：解码一次得到 16kHz PCM，分段以数组视图送入常驻 RVC worker，
+输出直接写入预分配的输出缓冲，只有最终编码才写磁盘
 """
 import os
 import sys
 import argparse
-import numpy as np
-import torch
-import librosa
-import soundfile as sf
+import queue
+import threading
 from pathlib import Path
-import tempfile
+
+# numpy / json / rvc_worker / rvc_feature_cache 在用到时才导入，--help 与参数检查无需等待加载
+from rvc_f0 import F0_METHODS, DEFAULT_QUALITY, format_calibration
 
 # 添加 RVC 路径
 SCRIPT_DIR = Path(__file__).parent.parent
 RVC_CODE_PATH = SCRIPT_DIR / 'models' / 'Retrieval-based-Voice-Conversion-WebUI'
 sys.path.insert(0, str(RVC_CODE_PATH))
 
-def split_audio(audio_path, chunk_duration=60, overlap=2):
+# 默认分段时长（秒）；Pipeline 自身会在每段两侧各做 x_pad 秒的反射填充，分段过短时填充开销占比变大
+DEFAULT_CHUNK = 30
+
+# 默认重叠时长（秒）；重叠区交叉淡化，不需要为丢弃重叠而多算数秒
+DEFAULT_OVERLAP = 0.5
+
+# 自动并行时每个 worker 的 torch 线程数；单次推理的线程扩展性有限，多开 worker 更能吃满多核
+THREADS_PER_WORKER = 4
+
+# 自动并行时按每个 worker 约占用的内存（MB，RVC 模型 + HuBERT + 推理中间结果）估算上限
+WORKER_MEMORY_MB = 1500
+
+def split_audio(total_samples, sr, chunk_duration=DEFAULT_CHUNK, overlap=DEFAULT_OVERLAP):
     """
-    分割音频为小段
+    规划音频分段
 
     Args:
-        audio_path: 输入音频文件
+        total_samples: 音频总采样数
+        sr: 采样率
         chunk_duration: 每段时长（秒）
         overlap: 重叠时长（秒）
 
     Returns:
-        list of (audio_segment, start_time, end_time)
+        list of (start_sample, end_sample)
     """
-    audio, sr = librosa.load(audio_path, sr=None)
-    duration = len(audio) / sr
-
     chunk_samples = int(chunk_duration * sr)
     overlap_samples = int(overlap * sr)
 
     segments = []
     start = 0
 
-    while start < len(audio):
-        end = min(start + chunk_samples, len(audio))
-
-        segment_audio = audio[start:end]
-        start_time = start / sr
-        end_time = end / sr
-
-        segments.append((segment_audio, sr, start_time, end_time))
-
+    while start < total_samples:
+        end = min(start + chunk_samples, total_samples)
+        segments.append((start, end))
+        if end == total_samples:
+            break
         start += (chunk_samples - overlap_samples)
 
     return segments
 
-def merge_audio_segments(segment_paths, output_path, sample_rate, overlap_seconds=2):
-    """合并音频段，去掉重叠部分"""
-    import subprocess
+def crossfade_window(overlap_samples):
+    """
+    Hann 交叉淡化窗：sin²+cos²=1，两窗幅度之和恒为 1
 
-    all_audio = []
-    overlap_samples = int(overlap_seconds * sample_rate)
+    相邻分段转换的是同一段重叠音频，两段在重叠区高度相关，幅度相加才能保持电平不变
+    （等功率窗在此会在接缝处抬高约 3dB）
 
-    for i, seg_path in enumerate(segment_paths):
-        audio, sr = librosa.load(seg_path, sr=sample_rate)
+    Returns:
+        (fade_in, fade_out)
+    """
+    import numpy as np
 
-        if i == 0:
-            # 第一段：全部保留
-            all_audio.append(audio)
-        elif i == len(segment_paths) - 1:
-            # 最后一段：去掉重叠部分
-            all_audio.append(audio[overlap_samples:])
-        else:
-            # 中间段：去掉重叠部分
-            all_audio.append(audio[overlap_samples:])
+    t = (np.arange(overlap_samples, dtype=np.float32) + 0.5) / max(overlap_samples, 1)
+    return np.sin(t * np.pi / 2) ** 2, np.cos(t * np.pi / 2) ** 2
 
-    # 连接所有段
-    merged_audio = np.concatenate(all_audio, axis=0)
+def merge_segment(output, segment_audio, offset, window=None):
+    """
+    将一段转换结果叠加写入输出缓冲
 
-    # 先保存为临时 WAV 文件
-    temp_wav = output_path.rsplit('.', 1)[0] + '_temp.wav'
-    sf.write(temp_wav, merged_audio, sample_rate)
-    print(f"  已合并 {len(segment_paths)} 个音频段（已去除 {overlap_seconds} 秒重叠）")
+    与上一段重叠的部分按 Hann 窗交叉淡化，其余部分直接写入
 
-    # 如果输出是 MP3，使用 ffmpeg 转换（40000Hz 需要重采样）
+    Args:
+        output: 预分配的输出数组（上一段已写入重叠区）
+        segment_audio: 该段转换结果
+        offset: 该段在输出中的起始采样
+        window: crossfade_window() 的结果；第一段传 None
+    """
+    if offset >= len(output):
+        return
+    data = segment_audio[:len(output) - offset]
+    overlap = 0
+    if window is not None:
+        fade_in, fade_out = window
+        overlap = min(len(fade_in), len(data))
+        region = output[offset:offset + overlap]
+        region *= fade_out[:overlap]
+        region += data[:overlap] * fade_in[:overlap]
+    output[offset + overlap:offset + len(data)] = data[overlap:]
+
+def encode_output(audio, output_path, sample_rate):
+    """经 ffmpeg 管道将 PCM 编码为输出文件（唯一的磁盘写入）"""
+    import subprocess
+    import numpy as np
+
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+    ]
+    # 如果输出是 MP3（40000Hz 需要重采样）
     if output_path.lower().endswith('.mp3'):
-        print(f"  正在转换为 MP3...")
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', temp_wav,
+        print(f"  正在编码为 MP3...")
+        cmd.extend([
             '-ar', '48000',  # 重采样到 48000 Hz（MP3 兼容）
             '-acodec', 'libmp3lame',
             '-b:a', '192k',
-            output_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            os.unlink(temp_wav)
-            print(f"  MP3 转换完成")
-        else:
-            print(f"  ⚠️  MP3 转换失败，保留 WAV 文件: {temp_wav}")
-            if result.stderr:
-                print(f"  错误: {result.stderr}")
-            # 如果转换失败，保留 WAV 文件并返回 False
-            return False
-    else:
-        # 非 MP3 格式，直接重命名
-        import shutil
-        shutil.move(temp_wav, output_path)
-
+        ])
+    cmd.append(output_path)
+
+    data = np.ascontiguousarray(audio, dtype=np.float32)
+    result = subprocess.run(cmd, input=memoryview(data).cast('B'), capture_output=True)
+    if result.returncode != 0:
+        print(f"  ⚠️  编码失败")
+        if result.stderr:
+            print(f"  错误: {result.stderr.decode(errors='replace')}")
+        return False
     return True
 
-def get_rvc_python():
-    """获取 RVC Python 解释器路径（优先使用 Python 3.10）"""
-    rvc_env_310 = SCRIPT_DIR / 'models' / 'rvc_env_310' / 'bin' / 'python3'
-    rvc_env = SCRIPT_DIR / 'models' / 'rvc_env' / 'bin' / 'python3'
+def auto_worker_count(threads=THREADS_PER_WORKER, worker_memory_mb=WORKER_MEMORY_MB):
+    """
+    按核数与可用内存估算 worker 数
 
-    if rvc_env_310.exists():
-        return str(rvc_env_310)
-    elif rvc_env.exists():
-        return str(rvc_env)
-    else:
-        return 'python3'
+    每个 worker 占 threads 个核，并各自持有一份 RVC 模型与 HuBERT
+    """
+    by_cpu = max(1, (os.cpu_count() or 1) // threads)
+    try:
+        available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        # macOS 等平台没有 SC_AVPHYS_PAGES，按物理内存的一半估算
+        try:
+            available = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+        except (ValueError, OSError, AttributeError):
+            return by_cpu
+    by_memory = max(1, available // (worker_memory_mb * 1024 * 1024))
+    return int(min(by_cpu, by_memory))
+
+def process_audio_segment(segment_audio, sr, worker, f0up_key, f0_method='harvest', resample_sr=None):
+    """
+    经常驻 RVC worker 处理单个音频段
 
-def process_audio_segment(segment_audio, sr, model_path, f0up_key, device="cpu"):
-    """处理单个音频段"""
-    import subprocess
+    resample_sr: 输出采样率（默认模型采样率）
+
+    Returns:
+        (processed_audio, out_sr, timing)
+        timing: {'f0_method', 'feature', 'f0', 'infer'}（秒）
+    """
+    processed_audio, out_sr = worker.convert(segment_audio, sr, f0up_key, f0_method, resample_sr)
+    feature, f0, infer = worker.last_times or (0, 0, 0)
+    timing = {'f0_method': worker.last_f0_method or f0_method, 'feature': feature, 'f0': f0, 'infer': infer}
+    return processed_audio, out_sr, timing
+
+def iter_converted_segments(audio, sr, segments, model_path, f0up_key=0, device="cpu",
+                            workers=1, threads=None, feature_cache=None, f0_method='harvest',
+                            f0_quality=None, resample_sr=None, pool=None):
+    """
+    多个 worker 并行转换分段，按原顺序逐段产出
 
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_input:
-        sf.write(temp_input.name, segment_audio, sr)
-        temp_input_path = temp_input.name
+    每个 worker 是一个独立进程，各自加载模型并固定 torch 线程数；
+    传入 pool（已启动的 RVCWorker 列表）时直接复用其中的 worker，用完不关闭。
+    分段从共享队列领取，先完成的结果暂存，等前面的分段完成后再按顺序产出。
+    f0_method='auto' 时由最先就绪的 worker 在第一段上校准一次，所有分段使用同一方法；
+    校准失败只记录一次，所有分段回退到 harvest。
+    部分 worker 启动失败时由其余 worker 处理全部分段，全部启动失败才报错
 
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_output:
-        temp_output_path = temp_output.name
+    Yields:
+        (index, processed_audio, out_sr, timing)
+    """
+    tasks = queue.Queue()
+    for item in enumerate(segments):
+        tasks.put(item)
+    results = queue.Queue()
+    stop = threading.Event()
+    calibrated = threading.Event()
+    calibration_lock = threading.Lock()
+    chosen = {'f0_method': f0_method}
+    if f0_method != 'auto':
+        calibrated.set()
+
+    def calibrate(worker):
+        with calibration_lock:
+            if calibrated.is_set():
+                return
+            start, end = segments[0]
+            try:
+                method, report = worker.calibrate(audio[start:end], sr, f0_quality)
+            except Exception as e:
+                print(f"  ⚠️  F0 方法校准失败，使用 harvest: {e}")
+                chosen['f0_method'] = 'harvest'
+            else:
+                print(f"  F0 方法校准（第 1 段开头）:")
+                print(format_calibration(method, report))
+                chosen['f0_method'] = method
+            calibrated.set()
+
+    def run(worker=None):
+        index = None
+        owned = worker is None
+        if owned:
+            from rvc_worker import RVCWorker
 
-    try:
-        # 使用 RVC 推理脚本
-        rvc_script = SCRIPT_DIR / 'scripts' / 'rvc_infer_real.py'
-        python_exe = get_rvc_python()
-
-        cmd = [
-            python_exe,
-            str(rvc_script),
-            temp_input_path,
-            '-o', temp_output_path,
-            '-m', model_path,
-            '-p', str(f0up_key),
-            '-f', 'harvest',
-            '-d', device
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-
-        if result.returncode == 0 and os.path.exists(temp_output_path):
-            audio, sr = librosa.load(temp_output_path, sr=None)
-            os.unlink(temp_input_path)
-            os.unlink(temp_output_path)
-            return audio, sr
-        else:
-            error_msg = result.stderr if result.stderr else "未知错误"
-            raise RuntimeError(f"RVC 推理失败: {error_msg}")
+            try:
+                worker = RVCWorker(model_path, device=device, threads=threads, feature_cache=feature_cache)
+            except Exception as e:
+                results.put((None, None, None, None, e))
+                return
+        try:
+            calibrate(worker)
+            while not stop.is_set():
+                try:
+                    index, (start, end) = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                results.put((index,) + process_audio_segment(
+                    audio[start:end], sr, worker, f0up_key, chosen['f0_method'], resample_sr
+                ) + (None,))
+        except Exception as e:
+            results.put((index, None, None, None, e))
+        finally:
+            if owned:
+                worker.close()
+
+    if pool:
+        assigned = list(pool[:len(segments)])
+    else:
+        assigned = [None] * max(1, min(workers, len(segments)))
+    runners = [threading.Thread(target=run, args=(worker,), daemon=True) for worker in assigned]
+    for thread in runners:
+        thread.start()
 
+    try:
+        pending = {}
+        next_index = 0
+        failed = 0
+        while next_index < len(segments):
+            index, processed_audio, out_sr, timing, error = results.get()
+            if error is not None:
+                if index is None:
+                    # 其余 worker 继续从队列领取分段
+                    failed += 1
+                    print(f"    ⚠️  RVC worker 启动失败（{failed}/{len(runners)}）: {error}")
+                    if failed == len(runners):
+                        raise RuntimeError(f"RVC worker 全部启动失败: {error}")
+                    continue
+                print(f"    ❌ 第 {index+1} 段 RVC 处理失败，不降级")
+                print(f"    错误: {error}")
+                raise RuntimeError(f"RVC 处理失败（第 {index+1} 段）: {error}")
+            pending[index] = (processed_audio, out_sr, timing)
+            while next_index in pending:
+                yield (next_index,) + pending.pop(next_index)
+                next_index += 1
     finally:
-        if os.path.exists(temp_input_path):
-            os.unlink(temp_input_path)
-        if os.path.exists(temp_output_path):
-            os.unlink(temp_output_path)
+        stop.set()
+        for thread in runners:
+            thread.join()
+
+def print_timing_summary(timings):
+    """打印分段耗时汇总"""
+    if not timings:
+        return
+    totals = {key: sum(t[key] for t in timings) for key in ('feature', 'f0', 'infer')}
+    methods = sorted({t['f0_method'] for t in timings})
+    print(f"  耗时合计: 特征 {totals['feature']:.1f}s / F0({', '.join(methods)}) {totals['f0']:.1f}s / "
+          f"推理 {totals['infer']:.1f}s")
+
+def convert_audio(audio, sr, model_path=None, f0up_key=0, device="cpu", chunk_duration=DEFAULT_CHUNK,
+                  overlap=DEFAULT_OVERLAP, workers=1, threads=None, feature_cache=None, f0_method='harvest',
+                  f0_quality=None, resample_sr=None, pool=None, timings=None):
+    """
+    分段并行转换整段单声道音频，结果按 Hann 窗交叉淡化写入预分配的输出缓冲
 
-def process_long_audio(input_audio, output_audio, model_path, f0up_key=0, device="cpu"):
+    Args:
+        audio: 单声道 float32 数组（worker 内部重采样到 16kHz）
+        sr: 输入采样率
+        resample_sr: 输出采样率（默认模型采样率）
+        pool: 已启动的 RVCWorker 列表；None 时按 workers 启动、用完关闭
+        timings: 传入列表时追加每段耗时
+        其余参数同 iter_converted_segments()
+
+    Returns:
+        (output, out_sr)
+    """
+    import numpy as np
+
+    segments = split_audio(len(audio), sr, chunk_duration, overlap)
+    if not segments:
+        return np.zeros(0, dtype=np.float32), resample_sr or sr
+    runners = len(pool) if pool else workers
+    print(f"  分成 {len(segments)} 段，{max(1, min(runners, len(segments)))} 个 worker 并行"
+          + (f"（每个 {threads} 线程）" if threads and not pool else ""))
+
+    output = None
+    for i, processed_audio, out_sr, timing in iter_converted_segments(
+        audio, sr, segments, model_path, f0up_key, device, workers, threads, feature_cache,
+        f0_method, f0_quality, resample_sr, pool
+    ):
+        if output is None:
+            output = np.zeros(int(np.ceil(len(audio) * out_sr / sr)), dtype=np.float32)
+            window = crossfade_window(int(overlap * out_sr))
+
+        start, end = segments[i]
+        merge_segment(output, processed_audio, round(start * out_sr / sr), window if i else None)
+        if timings is not None:
+            timings.append(dict(timing, segment=i + 1, start=start / sr, end=end / sr))
+        print(f"  完成第 {i+1}/{len(segments)} 段 ({start / sr:.1f}s - {end / sr:.1f}s) "
+              f"特征 {timing['feature']:.1f}s / F0({timing['f0_method']}) {timing['f0']:.1f}s / "
+              f"推理 {timing['infer']:.1f}s")
+
+    if len(segments) > 1:
+        print(f"  已合并 {len(segments)} 个音频段（{overlap} 秒重叠交叉淡化）")
+    return output, out_sr
+
+def process_long_audio(input_audio, output_audio, model_path, f0up_key=0, device="cpu",
+                       chunk_duration=DEFAULT_CHUNK, overlap=DEFAULT_OVERLAP, workers=1, threads=None,
+                       feature_cache=None, f0_method='harvest', f0_quality=None, timings_file=None):
     """处理长音频"""
     print(f"正在处理长音频，将分批处理...")
 
-    segments = split_audio(input_audio, chunk_duration=30, overlap=2)
-
-    print(f"  分成 {len(segments)} 段")
+    # librosa 导入较慢，只在真正处理时加载
+    import json
+    import librosa
+    from rvc_worker import RVC_INPUT_SR
 
-    processed_segments = []
-    temp_dir = tempfile.mkdtemp()
+    # 直接解码为 RVC 输入采样率，分段送入 worker 时无需再重采样
+    audio, sr = librosa.load(input_audio, sr=RVC_INPUT_SR)
 
+    timings = []
     try:
-        for i, (segment_audio, sr, start_time, end_time) in enumerate(segments):
-            print(f"  处理第 {i+1}/{len(segments)} 段 ({start_time:.1f}s - {end_time:.1f}s)...")
-
-            try:
-                # 处理这一段
-                processed_audio, out_sr = process_audio_segment(
-                    segment_audio, sr, model_path, f0up_key, device
-                )
-
-                # 保存到临时文件
-                seg_path = os.path.join(temp_dir, f"segment_{i:04d}.wav")
-                sf.write(seg_path, processed_audio, out_sr)
-                processed_segments.append(seg_path)
-
-                print(f"    完成")
-
-            except Exception as e:
-                # 不降级：RVC 失败则整个处理失败
-                print(f"    ❌ 第 {i+1} 段 RVC 处理失败，不降级")
-                print(f"    错误: {e}")
-                # 清理临时文件
-                for seg_path in processed_segments:
-                    if os.path.exists(seg_path):
-                        os.unlink(seg_path)
-                os.rmdir(temp_dir)
-                raise RuntimeError(f"RVC 处理失败（第 {i+1} 段）: {e}")
-
-        # 合并所有段
-        print(f"  正在合并音频段...")
-        merge_success = merge_audio_segments(processed_segments, output_audio, 40000, overlap_seconds=2)
-
-        # 清理临时文件
-        for seg_path in processed_segments:
-            os.unlink(seg_path)
-        os.rmdir(temp_dir)
-
-        return merge_success
+        output, out_sr = convert_audio(audio, sr, model_path, f0up_key, device, chunk_duration, overlap,
+                                       workers, threads, feature_cache, f0_method, f0_quality,
+                                       timings=timings)
+        print_timing_summary(timings)
+        return encode_output(output, output_audio, out_sr)
 
     except Exception as e:
         print(f"  处理失败: {e}")
-        # 清理
-        if os.path.exists(temp_dir):
-            for seg_path in processed_segments:
-                if os.path.exists(seg_path):
-                    os.unlink(seg_path)
-            os.rmdir(temp_dir)
         return False
 
+    finally:
+        if timings_file and timings:
+            with open(timings_file, 'w', encoding='utf-8') as f:
+                json.dump(timings, f, ensure_ascii=False, indent=2)
+
 def main():
     parser = argparse.ArgumentParser(description='RVC 长音频处理')
     parser.add_argument('input', help='输入音频文件')
     parser.add_argument('-o', '--output', required=True, help='输出音频文件')
     parser.add_argument('-m', '--model', required=True, help='RVC 模型路径')
     parser.add_argument('-p', '--pitch', type=int, default=0, help='音高调整（半音）')
+    parser.add_argument('-f', '--f0-method', default='auto', choices=('auto',) + F0_METHODS,
+                        help='F0 提取方法（默认: auto，在第一段上校准后选满足质量要求的最快方法）')
+    parser.add_argument('--f0-quality', type=float, default=DEFAULT_QUALITY,
+                        help=f'auto 模式下与 harvest 的最低帧一致率（默认: {DEFAULT_QUALITY}）')
+    parser.add_argument('--timings', help='将每段耗时写入 JSON 文件')
+    parser.add_argument('--chunk', type=float, default=DEFAULT_CHUNK, help=f'分段时长（秒，默认: {DEFAULT_CHUNK}）')
+    parser.add_argument('--overlap', type=float, default=DEFAULT_OVERLAP,
+                        help=f'分段重叠时长（秒，默认: {DEFAULT_OVERLAP}）')
+    parser.add_argument('-j', '--workers', default='auto',
+                        help='并行 worker 数（默认: auto，按核数与可用内存估算）')
+    parser.add_argument('--threads', type=int, help=f'每个 worker 的 torch 线程数（自动并行时默认: {THREADS_PER_WORKER}）')
+    parser.add_argument('--feature-cache-dir', help='F0/HuBERT 特征缓存目录（默认: ~/.cache/voice-changer/features）')
+    parser.add_argument('--no-feature-cache', action='store_true', help='禁用特征缓存')
 
     args = parser.parse_args()
 
@@ -242,8 +383,36 @@ def main():
         print(f"模型文件不存在: {model_path}")
         sys.exit(1)
 
+    if not 0 <= args.overlap < args.chunk:
+        print("❌ 错误: 重叠时长必须小于分段时长")
+        sys.exit(1)
+
+    threads = args.threads
+    if args.workers == 'auto':
+        threads = threads or THREADS_PER_WORKER
+        workers = auto_worker_count(threads)
+    else:
+        try:
+            workers = int(args.workers)
+        except ValueError:
+            workers = 0
+        if workers < 1:
+            print(f"❌ 错误: 无效的 worker 数: {args.workers}")
+            sys.exit(1)
+        # 多个 worker 时默认平分核数，避免线程超订
+        if threads is None and workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+
+    feature_cache = None
+    if not args.no_feature_cache:
+        from rvc_feature_cache import default_cache_dir
+
+        feature_cache = args.feature_cache_dir or str(default_cache_dir())
+
     print("使用 CPU 处理...")
-    success = process_long_audio(args.input, args.output, model_path, args.pitch, "cpu")
+    success = process_long_audio(args.input, args.output, model_path, args.pitch, "cpu",
+                                 args.chunk, args.overlap, workers, threads, feature_cache,
+                                 args.f0_method, args.f0_quality, args.timings)
 
     if success:
         print(f"✅ 处理完成！")
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+常驻 RVC 推理进程
+在 RVC 虚拟环境中启动一次，加载 RVC 模型、HuBERT 与 Pipeline 后，
+经 stdin/stdout 持续接收 PCM 分块并返回转换结果，
+避免每个分块都启动一个解释器、重新加载模型
+
+消息格式（小端）:
+    uint32 头长度 | JSON 头 | float32 PCM（头中 samples 个采样，单声道）
+
+请求头: {"op": "convert", "sample_rate", "samples", "f0up_key", "f0_method", "resample_sr"}
+        {"op": "calibrate", "sample_rate", "samples", "quality"}
+        {"op": "close"}
+响应头: convert   → {"ok": true, "sample_rate", "samples", "times", "f0_method"}
+        calibrate → {"ok": true, "f0_method", "report"}
+        失败      → {"ok": false, "error"}
+启动后先发送一条就绪消息: {"ok": true, "sample_rate": 模型采样率} 或加载失败信息
+
+客户端（RVCWorker）只依赖 numpy，可在未安装 torch 的 Python 中使用
+"""
+import os
+import sys
+import json
+import struct
+import argparse
+import threading
+import subprocess
+import traceback
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent.parent
+
+# RVC Pipeline 的输入采样率
+RVC_INPUT_SR = 16000
+
+# 单次请求（一个分段的转换或校准）的超时（秒），超时后结束 worker 进程
+REQUEST_TIMEOUT = 600
+
+def get_rvc_python():
+    """获取 RVC Python 解释器路径（优先使用 Python 3.10）"""
+    rvc_env_310 = SCRIPT_DIR / 'models' / 'rvc_env_310' / 'bin' / 'python3'
+    rvc_env = SCRIPT_DIR / 'models' / 'rvc_env' / 'bin' / 'python3'
+
+    if rvc_env_310.exists():
+        return str(rvc_env_310)
+    elif rvc_env.exists():
+        return str(rvc_env)
+    else:
+        return 'python3'
+
+def _read_exact(stream, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+def write_message(stream, header, audio=None):
+    """写入一条消息（头 + 可选 PCM）"""
+    if audio is not None:
+        audio = np.ascontiguousarray(audio, dtype='<f4')
+        header = dict(header, samples=len(audio))
+    data = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    stream.write(struct.pack('<I', len(data)))
+    stream.write(data)
+    if audio is not None:
+        stream.write(memoryview(audio).cast('B'))
+    stream.flush()
+
+def read_message(stream):
+    """
+    读取一条消息
+
+    Returns:
+        (header, audio)；对端关闭时返回 (None, None)，无 PCM 时 audio 为 None
+    """
+    prefix = _read_exact(stream, 4)
+    if len(prefix) < 4:
+        return None, None
+    (header_len,) = struct.unpack('<I', prefix)
+    header = json.loads(_read_exact(stream, header_len).decode('utf-8'))
+    samples = header.get('samples')
+    if not samples:
+        return header, None
+    payload = _read_exact(stream, samples * 4)
+    if len(payload) < samples * 4:
+        return None, None
+    return header, np.frombuffer(payload, dtype='<f4')
+
+def serve(model_path, device="cpu", voice_config=None, threads=None, feature_cache=None):
+    """
+    worker 主循环（在 RVC 虚拟环境中运行）
+
+    feature_cache: 特征缓存目录（F0/HuBERT，见 rvc_feature_cache.py），None 表示不缓存
+    """
+    # 原 stdout 专用于协议，RVC 的打印输出转到 stderr
+    proto_out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    proto_in = sys.stdin.buffer
+
+    try:
+        import librosa
+        import torch
+        from rvc_infer_real import RVCRuntime
+
+        # 多个 worker 并行时各自固定线程数，避免线程数超过核数互相争抢
+        if threads:
+            torch.set_num_threads(threads)
+
+        runtime = RVCRuntime(model_path, device, voice_config)
+        if feature_cache:
+            from rvc_feature_cache import FeatureCache, install_feature_cache
+
+            install_feature_cache(runtime, FeatureCache(feature_cache))
+    except Exception as e:
+        traceback.print_exc()
+        write_message(proto_out, {'ok': False, 'error': f"模型加载失败: {e}"})
+        return 1
+
+    write_message(proto_out, {'ok': True, 'sample_rate': runtime.tgt_sr})
+
+    while True:
+        header, audio = read_message(proto_in)
+        if header is None or header.get('op') == 'close':
+            return 0
+
+        try:
+            if audio is None:
+                raise ValueError("空音频分块")
+            sample_rate = header.get('sample_rate', RVC_INPUT_SR)
+            if sample_rate != RVC_INPUT_SR:
+                audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=RVC_INPUT_SR)
+            if header.get('op') == 'calibrate':
+                method, report = runtime.calibrate_f0(audio, header.get('quality'))
+                write_message(proto_out, {'ok': True, 'f0_method': method, 'report': report})
+                continue
+
+            times = [0, 0, 0]
+            audio_opt, out_sr = runtime.convert(
+                audio,
+                header.get('f0up_key'),
+                header.get('f0_method'),
+                header.get('resample_sr'),
+                times,
+            )
+            write_message(proto_out, {
+                'ok': True, 'sample_rate': out_sr, 'times': times, 'f0_method': runtime.last_f0_method,
+            }, audio_opt)
+        except Exception as e:
+            traceback.print_exc()
+            write_message(proto_out, {'ok': False, 'error': str(e)})
+
+class RVCWorker:
+    """
+    常驻 RVC worker 客户端
+
+    启动时加载一次模型，之后每次 convert() 只传输 PCM，可作为上下文管理器使用；
+    单次请求超过 timeout 秒时结束进程并报错，调用方可重新启动
+    """
+
+    def __init__(self, model_path, voice_config=None, device="cpu", python_exe=None, threads=None,
+                 feature_cache=None, timeout=REQUEST_TIMEOUT):
+        env = None
+        cmd = [
+            python_exe or get_rvc_python(),
+            str(Path(__file__).resolve()),
+            '-m', os.path.expanduser(model_path),
+            '-d', device,
+        ]
+        if voice_config:
+            cmd.extend(['--voice-config', json.dumps(voice_config, ensure_ascii=False)])
+        if feature_cache:
+            cmd.extend(['--feature-cache', str(feature_cache)])
+        if threads:
+            cmd.extend(['--threads', str(threads)])
+            # OpenMP/MKL 线程池在 torch 导入时就已创建，需经环境变量限制
+            env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+
+        # stderr 继承父进程，模型加载与推理日志直接可见
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        self.timeout = timeout
+        self.last_times = None
+        self.last_f0_method = None
+
+        header, _ = read_message(self.process.stdout)
+        if header is None or not header.get('ok'):
+            error = header.get('error') if header else f"进程退出（退出码: {self.process.wait()}）"
+            self.close()
+            raise RuntimeError(f"RVC worker 启动失败: {error}")
+        self.sample_rate = header['sample_rate']
+
+    def convert(self, audio, sample_rate, f0up_key=None, f0_method=None, resample_sr=None):
+        """
+        转换一段单声道音频
+
+        Args:
+            audio: 单声道 float32 数组
+            sample_rate: 输入采样率（worker 内部重采样到 16kHz）
+            f0up_key / f0_method: 覆盖启动时的声音配置
+            resample_sr: 输出采样率（默认模型采样率）
+
+        Returns:
+            (float32 数组, 输出采样率)
+        """
+        request = {'op': 'convert', 'sample_rate': int(sample_rate)}
+        if f0up_key is not None:
+            request['f0up_key'] = int(f0up_key)
+        if f0_method is not None:
+            request['f0_method'] = f0_method
+        if resample_sr is not None:
+            request['resample_sr'] = int(resample_sr)
+
+        header, audio_opt = self._request(request, audio)
+        self.last_times = header.get('times')
+        self.last_f0_method = header.get('f0_method')
+        if audio_opt is None:
+            audio_opt = np.zeros(0, dtype=np.float32)
+        return audio_opt, header['sample_rate']
+
+    def calibrate(self, audio, sample_rate, quality=None):
+        """
+        在音频开头校准 F0 方法（见 rvc_f0.F0Engine.calibrate），之后 f0_method='auto' 使用结果
+
+        Returns:
+            (method, report)
+        """
+        request = {'op': 'calibrate', 'sample_rate': int(sample_rate)}
+        if quality is not None:
+            request['quality'] = quality
+        header, _ = self._request(request, audio)
+        return header['f0_method'], header['report']
+
+    def _request(self, request, audio):
+        timed_out = threading.Event()
+        timer = None
+        if self.timeout:
+            def kill():
+                timed_out.set()
+                self.process.kill()
+
+            timer = threading.Timer(self.timeout, kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            try:
+                write_message(self.process.stdin, request, audio)
+            except BrokenPipeError:
+                header = audio_opt = None
+            else:
+                header, audio_opt = read_message(self.process.stdout)
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if header is None:
+            if timed_out.is_set():
+                self.process.wait()
+                raise RuntimeError(f"RVC worker 处理超时（{self.timeout} 秒）")
+            raise RuntimeError(f"RVC worker 意外退出（退出码: {self.process.wait()}）")
+        if not header.get('ok'):
+            raise RuntimeError(f"RVC 推理失败: {header.get('error')}")
+        return header, audio_opt
+
+    def close(self):
+        """通知 worker 退出并回收进程"""
+        if self.process.poll() is None:
+            try:
+                write_message(self.process.stdin, {'op': 'close'})
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻 RVC 推理进程（stdin/stdout 协议，供 RVCWorker 启动）')
+    parser.add_argument('-m', '--model', required=True, help='RVC 模型路径 (.pth)')
+    parser.add_argument('-d', '--device', default='cpu', help='运行设备（cpu/cuda/mps）')
+    parser.add_argument('--voice-config', help='声音配置（JSON，index_rate/protect 等）')
+    parser.add_argument('--threads', type=int, help='torch 计算线程数（默认: torch 自动）')
+    parser.add_argument('--feature-cache', help='F0/HuBERT 特征缓存目录（默认: 不缓存）')
+
+    args = parser.parse_args()
+
+    if sys.stdin.isatty():
+        print("❌ 错误: 该脚本通过 stdin/stdout 协议通信，请通过 RVCWorker 启动")
+        sys.exit(1)
+
+    voice_config = json.loads(args.voice_config) if args.voice_config else None
+    sys.exit(serve(args.model, args.device, voice_config, args.threads, args.feature_cache))
+
+if __name__ == '__main__':
+    main()
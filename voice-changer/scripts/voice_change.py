@@ -8,13 +8,90 @@ voice_change.py - 音频变声处理脚本
 
 import os
 import sys
-import json
 import argparse
-import subprocess
+import threading
 from pathlib import Path
 
+# 依赖探测结果的缓存时长（秒）
+DEPS_CACHE_TTL = 24 * 3600
+
+# Pedalboard 流式处理的块大小（帧），峰值内存只与此有关
+STREAM_BLOCK_FRAMES = 1 << 16
+
+# 输入读完后冲刷延迟缓冲的最多块数
+FLUSH_BLOCKS = 8
+
+# change_voice_blocks() 可逐块流式处理（内存与时长无关）的方法；RVC 需要整段音频分段并行
+STREAMING_METHODS = ('pedalboard', 'simple')
+
+# Pedalboard 预设：PitchShift 之后附加的效果，按声音名称包含的类别选择（female 需先于 male 判断）
+# 配置文件中的声音可用 "effects" 字段以同样格式自定义，替代这里的预设
+PEDALBOARD_PRESETS = {
+    # 女声效果：高通滤波去除低频，压缩动态范围，轻微提升音量
+    'female': [
+        {'type': 'HighpassFilter', 'cutoff_frequency_hz': 150},
+        {'type': 'Compressor', 'threshold_db': -20, 'ratio': 2.5},
+        {'type': 'Gain', 'gain_db': 2},
+    ],
+    # 男声效果：低通滤波去除高频
+    'male': [
+        {'type': 'LowpassFilter', 'cutoff_frequency_hz': 4000},
+        {'type': 'Compressor', 'threshold_db': -15, 'ratio': 2},
+        {'type': 'Gain', 'gain_db': 3},
+    ],
+    # 童声效果：更明亮
+    'child': [
+        {'type': 'HighpassFilter', 'cutoff_frequency_hz': 200},
+        {'type': 'Compressor', 'threshold_db': -25, 'ratio': 3},
+        {'type': 'Gain', 'gain_db': 4},
+    ],
+}
+
+# 增强版预设（RVC 后备方案），未匹配任何类别时使用 default
+ENHANCED_PRESETS = {
+    'female': [
+        {'type': 'HighpassFilter', 'cutoff_frequency_hz': 200},
+        {'type': 'Compressor', 'threshold_db': -18, 'ratio': 3},
+        {'type': 'Chorus', 'rate_hz': 1.5, 'depth': 0.3, 'wet_level': 0.2},
+        {'type': 'Gain', 'gain_db': 3},
+        {'type': 'Limiter', 'threshold_db': -0.5},
+    ],
+    'male': [
+        {'type': 'LowpassFilter', 'cutoff_frequency_hz': 3500},
+        {'type': 'Compressor', 'threshold_db': -12, 'ratio': 2.5},
+        {'type': 'Delay', 'delay_seconds': 0.01, 'wet_level': 0.1},
+        {'type': 'Gain', 'gain_db': 4},
+        {'type': 'Limiter', 'threshold_db': -0.5},
+    ],
+    'default': [
+        {'type': 'HighpassFilter', 'cutoff_frequency_hz': 150},
+        {'type': 'Compressor', 'threshold_db': -20, 'ratio': 2.5},
+        {'type': 'Reverb', 'room_size': 0.2, 'wet_level': 0.15},
+        {'type': 'Gain', 'gain_db': 3},
+        {'type': 'Limiter', 'threshold_db': -1},
+    ],
+}
+
+# 已编译的效果链（预设哈希 → Pedalboard），进程内复用
+_board_cache = {}
+_board_cache_lock = threading.Lock()
+
+# 已解析的配置文件（路径 → (mtime, 配置)）
+_config_cache = {}
+
+# 批处理识别的音频扩展名（视频见 is_video_file）
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg', '.aac', '.opus')
+
+# 批处理状态文件（位于输出目录，记录每个输出对应的输入 mtime 与声音设置）
+BATCH_STATE_FILE = '.voice_change_batch.json'
+
+# 批处理摘要的默认文件名（位于输出目录）
+BATCH_SUMMARY_FILE = 'batch_summary.json'
+
 def get_audio_duration(audio_file):
     """获取音频时长"""
+    import subprocess
+
     cmd = [
         'ffprobe',
         '-v', 'error',
@@ -27,6 +104,8 @@ def get_audio_duration(audio_file):
 
 def get_audio_sample_rate(audio_file):
     """获取音频采样率"""
+    import subprocess
+
     cmd = [
         'ffprobe',
         '-v', 'error',
@@ -38,6 +117,65 @@ def get_audio_sample_rate(audio_file):
     result = subprocess.run(cmd, capture_output=True, text=True)
     return int(result.stdout.strip())
 
+def get_media_duration(media_file):
+    """获取时长：优先由 pedalboard 读取文件头，不支持的格式再调用 ffprobe；失败返回 None"""
+    try:
+        from pedalboard.io import AudioFile
+
+        with AudioFile(media_file) as f:
+            return f.frames / f.samplerate
+    except Exception:
+        pass
+    try:
+        return get_audio_duration(media_file)
+    except (OSError, ValueError):
+        return None
+
+def _deps_cache_file():
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'voice-changer' / 'deps.json'
+
+def probe_dependencies(refresh=False):
+    """
+    探测外部命令与 Python 包是否可用，结果缓存 DEPS_CACHE_TTL 秒
+
+    只用 shutil.which 与 importlib.util.find_spec，不启动子进程、不导入包；
+    缓存按 Python 解释器与 PATH 区分，缓存中有缺失项时重新探测（刚安装的依赖立即生效）
+
+    Returns:
+        {'ffmpeg': 路径或 None, 'ffprobe': ..., 'python3': ..., 'pedalboard': bool, 'numpy': bool}
+    """
+    import json
+    import time
+    import hashlib
+
+    env_key = hashlib.sha1(f"{sys.executable}|{os.environ.get('PATH', '')}".encode('utf-8')).hexdigest()
+    cache_file = _deps_cache_file()
+    if not refresh:
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (cached.get('env') == env_key and time.time() - cached.get('time', 0) < DEPS_CACHE_TTL
+                    and all(cached['deps'].values())):
+                return cached['deps']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    import shutil
+    import importlib.util
+
+    deps = {cmd: shutil.which(cmd) for cmd in ('ffmpeg', 'ffprobe', 'python3')}
+    for module in ('pedalboard', 'numpy'):
+        deps[module] = importlib.util.find_spec(module) is not None
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'env': env_key, 'time': time.time(), 'deps': deps}, f)
+    except OSError:
+        pass
+    return deps
+
 def check_dependencies():
     """检查必要的依赖"""
     dependencies = {
@@ -46,10 +184,8 @@ def check_dependencies():
         'python3': 'Python3'
     }
 
-    missing = []
-    for cmd, name in dependencies.items():
-        if subprocess.run(['which', cmd], capture_output=True).returncode != 0:
-            missing.append(name)
+    deps = probe_dependencies()
+    missing = [name for cmd, name in dependencies.items() if not deps.get(cmd)]
 
     if missing:
         print(f"❌ 缺少依赖: {', '.join(missing)}")
@@ -59,6 +195,8 @@ def check_dependencies():
 
 def load_config(config_path=None):
     """加载配置文件"""
+    import json
+
     if config_path is None:
         script_dir = Path(__file__).parent.parent
         config_path = script_dir / 'config' / 'voice_config.json'
@@ -67,8 +205,16 @@ def load_config(config_path=None):
         print(f"❌ 配置文件不存在: {config_path}")
         sys.exit(1)
 
+    # 同一进程内多次调用（进程内接口、批处理）只在文件变化时重新解析
+    mtime = os.path.getmtime(config_path)
+    cached = _config_cache.get(str(config_path))
+    if cached and cached[0] == mtime:
+        return cached[1]
+
     with open(config_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        config = json.load(f)
+    _config_cache[str(config_path)] = (mtime, config)
+    return config
 
 def change_voice_simple(input_audio, output_audio, pitch_shift=5):
     """
@@ -80,6 +226,8 @@ def change_voice_simple(input_audio, output_audio, pitch_shift=5):
         负值：音调降低（男声效果）
         建议范围: -12 到 +12
     """
+    import subprocess
+
     print(f"🎵 使用 FFmpeg 进行音高调整...")
     print(f"   音高偏移: {pitch_shift:+d} 半音")
 
@@ -125,7 +273,159 @@ def change_voice_simple(input_audio, output_audio, pitch_shift=5):
         print(f"❌ 处理出错: {e}")
         return False
 
-def change_voice_pedalboard(input_audio, output_audio, pitch_shift=5, voice_type="female"):
+def preset_effects(voice_type, enhanced=False):
+    """按声音名称匹配预设类别，返回附加效果列表"""
+    presets = ENHANCED_PRESETS if enhanced else PEDALBOARD_PRESETS
+    for category, effects in presets.items():
+        if category in voice_type:
+            return effects
+    return presets.get('default', [])
+
+def build_pedalboard_effects(pitch_shift, voice_type="female", enhanced=False, effects=None):
+    """
+    根据声音类型创建 Pedalboard 效果链
+
+    Args:
+        enhanced: 使用增强版预设（RVC 后备方案）
+        effects: 声音配置中自定义的附加效果（[{"type": 效果名, 参数...}, ...]），替代预设
+
+    Returns:
+        效果列表（PitchShift + 附加效果）
+    """
+    import pedalboard
+
+    if effects is None:
+        effects = preset_effects(voice_type, enhanced)
+
+    chain = [pedalboard.PitchShift(semitones=pitch_shift)]
+    for spec in effects:
+        params = dict(spec)
+        name = params.pop('type', None)
+        effect_class = getattr(pedalboard, name, None) if name else None
+        if not isinstance(effect_class, type):
+            raise ValueError(f"未知的 Pedalboard 效果: {name}")
+        chain.append(effect_class(**params))
+    return chain
+
+def preset_key(pitch_shift, voice_type, enhanced=False, effects=None):
+    """效果链预设的哈希，作为编译缓存的键"""
+    import json
+    import hashlib
+
+    data = json.dumps([voice_type, pitch_shift, enhanced, effects], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def get_pedalboard(pitch_shift, voice_type="female", voice_config=None, enhanced=False):
+    """
+    取得编译好的效果链（Pedalboard 对象）
+
+    同一进程内按预设哈希缓存，批处理与常驻服务处理多个文件时只构建一次。
+    效果链带状态（流式处理跨块保留），同一对象不可在多个线程中同时使用
+    """
+    effects = (voice_config or {}).get('effects')
+    key = preset_key(pitch_shift, voice_type, enhanced, effects)
+    with _board_cache_lock:
+        board = _board_cache.get(key)
+        if board is None:
+            from pedalboard import Pedalboard
+
+            board = Pedalboard(build_pedalboard_effects(pitch_shift, voice_type, enhanced, effects))
+            _board_cache[key] = board
+    return board
+
+def compile_voice_presets(config, voices=None):
+    """
+    预先编译配置中 pedalboard 声音的效果链（批处理或常驻服务启动时调用）
+
+    Args:
+        voices: 声音名列表（默认：配置中全部声音）
+
+    Returns:
+        {voice: Pedalboard}
+    """
+    boards = {}
+    for voice in voices or config.get('voices', {}):
+        voice_config = get_voice_config(config, voice)
+        if voice_config.get('method', config.get('method', 'pedalboard')) != 'pedalboard':
+            continue
+        pitch_shift = voice_config.get('pitch_shift', 5)
+        if pitch_shift:
+            boards[voice] = get_pedalboard(pitch_shift, voice, voice_config)
+    return boards
+
+def process_file_streaming(board, input_audio, output_audio, block_frames=STREAM_BLOCK_FRAMES):
+    """
+    分块流式处理音频文件
+
+    从 AudioFile 逐块读取，经带状态的 board（reset=False）处理后逐块写出，
+    峰值内存只与块大小有关，与音频时长无关。
+    有延迟的效果（如 PitchShift）开头几块可能返回较少的采样，
+    输入读完后送入静音把缓冲中的尾部冲刷出来，输出长度与输入一致
+
+    Returns:
+        (frames, samplerate, channels)
+    """
+    return process_file_streaming_multi([board], input_audio, [output_audio], block_frames)
+
+def process_file_streaming_multi(boards, input_audio, output_audios, block_frames=STREAM_BLOCK_FRAMES):
+    """
+    一次解码、多个效果链并行处理（见 process_file_streaming）
+
+    每个输入块分发给各个 board，在线程池中同时处理并写出（编码）各自的输出；
+    pedalboard 处理与编码时释放 GIL，多个声音的总耗时接近单个声音
+
+    Returns:
+        (frames, samplerate, channels)
+    """
+    import numpy as np
+    from contextlib import ExitStack
+    from concurrent.futures import ThreadPoolExecutor
+    from pedalboard.io import AudioFile
+
+    with ExitStack() as stack:
+        f = stack.enter_context(AudioFile(input_audio))
+        samplerate = f.samplerate
+        channels = f.num_channels
+        total = f.frames
+        writers = [stack.enter_context(AudioFile(path, 'w', samplerate, channels)) for path in output_audios]
+        written = [0] * len(boards)
+        for board in boards:
+            board.reset()
+
+        def render(i, block):
+            if written[i] >= total:
+                return
+            effected = boards[i](block, samplerate, reset=False)[:, :total - written[i]]
+            writers[i].write(effected)
+            written[i] += effected.shape[1]
+
+        # 线程池最后进入、最先退出，保证写出完成后才关闭输出文件
+        pool = stack.enter_context(ThreadPoolExecutor(max_workers=len(boards))) if len(boards) > 1 else None
+
+        def render_all(block):
+            if pool is None:
+                render(0, block)
+            else:
+                list(pool.map(render, range(len(boards)), [block] * len(boards)))
+
+        while f.tell() < total:
+            block = f.read(block_frames)
+            if block.shape[1] == 0:
+                break
+            render_all(block)
+
+        # 送入静音冲刷延迟缓冲中的尾部，仍不足时补零
+        silence = np.zeros((channels, block_frames), dtype=np.float32)
+        for _ in range(FLUSH_BLOCKS):
+            if min(written) >= total:
+                break
+            render_all(silence)
+        for i, o in enumerate(writers):
+            if written[i] < total:
+                o.write(np.zeros((channels, total - written[i]), dtype=np.float32))
+    return total, samplerate, channels
+
+def change_voice_pedalboard(input_audio, output_audio, pitch_shift=5, voice_type="female", voice_config=None):
     """
     使用 pedalboard 进行高质量音高调整和音色变换
     pedalboard 是 Spotify 开发的专业音频处理库
@@ -135,6 +435,7 @@ def change_voice_pedalboard(input_audio, output_audio, pitch_shift=5, voice_type
         负值：音调降低（男声效果）
         建议范围: -12 到 +12
     voice_type: 声音类型，影响额外的音频处理效果
+    voice_config: 声音配置（可含自定义 effects）
     """
     print(f"🎛️ 使用 Pedalboard 进行音高和音色调整...")
     print(f"   音高偏移: {pitch_shift:+d} 半音")
@@ -149,59 +450,21 @@ def change_voice_pedalboard(input_audio, output_audio, pitch_shift=5, voice_type
 
     # 检查是否安装了 pedalboard
     try:
-        from pedalboard import Pedalboard, PitchShift, Reverb, Chorus, Phaser, Distortion, Compressor, HighpassFilter, LowpassFilter, Gain
-        from pedalboard.io import AudioFile
+        import pedalboard
     except ImportError:
         print("❌ 未安装 pedalboard")
         print("   请运行: pip install pedalboard")
         return False
 
     try:
-        # 根据声音类型创建不同的效果链
-        effects = [PitchShift(semitones=pitch_shift)]
-
-        # 添加额外的效果使声音更自然
-        if "female" in voice_type:
-            # 女声效果：添加轻微的混响和高通滤波
-            effects.extend([
-                HighpassFilter(cutoff_frequency_hz=150),  # 去除低频
-                Compressor(threshold_db=-20, ratio=2.5),  # 压缩动态范围
-                Gain(gain_db=2),  # 轻微提升音量
-            ])
-        elif "male" in voice_type:
-            # 男声效果：添加低通滤波
-            effects.extend([
-                LowpassFilter(cutoff_frequency_hz=4000),  # 去除高频
-                Compressor(threshold_db=-15, ratio=2),
-                Gain(gain_db=3),
-            ])
-        elif "child" in voice_type:
-            # 童声效果：更明亮
-            effects.extend([
-                HighpassFilter(cutoff_frequency_hz=200),
-                Compressor(threshold_db=-25, ratio=3),
-                Gain(gain_db=4),
-            ])
-
-        # 创建效果链
-        board = Pedalboard(effects)
-
-        # 读取输入音频
-        with AudioFile(input_audio) as f:
-            audio = f.read(f.frames)
-            samplerate = f.samplerate
-
-        print(f"   输入采样率: {samplerate} Hz")
-        print(f"   音频形状: {audio.shape}")
-        print(f"   效果链: {len(effects)} 个效果")
-
-        # 处理音频
-        print(f"   正在处理...")
-        effected = board(audio, samplerate)
+        # 取得编译好的效果链（同一进程内复用）
+        board = get_pedalboard(pitch_shift, voice_type, voice_config)
+        print(f"   效果链: {len(board)} 个效果")
 
-        # 保存输出音频
-        with AudioFile(output_audio, 'w', samplerate, effected.shape[0]) as f:
-            f.write(effected)
+        # 分块读取、处理、写出
+        print(f"   正在处理...")
+        frames, samplerate, channels = process_file_streaming(board, input_audio, output_audio)
+        print(f"   输入采样率: {samplerate} Hz，{channels} 声道，{frames / samplerate:.1f} 秒")
 
         return True
 
@@ -211,6 +474,53 @@ def change_voice_pedalboard(input_audio, output_audio, pitch_shift=5, voice_type
         traceback.print_exc()
         return False
 
+def change_voice_pedalboard_multi(input_audio, jobs):
+    """
+    一次解码渲染多个声音（A/B 对比等场景）
+
+    Args:
+        jobs: [(voice_type, output_audio, pitch_shift, voice_config), ...]
+
+    Returns:
+        {voice_type: 是否成功}
+    """
+    print(f"🎛️ 使用 Pedalboard 并行渲染 {len(jobs)} 个声音...")
+    results = {}
+    active = []
+    for voice_type, output_audio, pitch_shift, voice_config in jobs:
+        print(f"   {voice_type}: {pitch_shift:+d} 半音 → {output_audio}")
+        if pitch_shift == 0:
+            import shutil
+            shutil.copy2(input_audio, output_audio)
+            results[voice_type] = True
+        else:
+            active.append((voice_type, output_audio, pitch_shift, voice_config))
+    if not active:
+        return results
+
+    try:
+        import pedalboard
+    except ImportError:
+        print("❌ 未安装 pedalboard")
+        print("   请运行: pip install pedalboard")
+        results.update({job[0]: False for job in active})
+        return results
+
+    try:
+        boards = [get_pedalboard(pitch_shift, voice_type, voice_config)
+                  for voice_type, _, pitch_shift, voice_config in active]
+        print(f"   正在处理...")
+        frames, samplerate, channels = process_file_streaming_multi(
+            boards, input_audio, [job[1] for job in active])
+        print(f"   输入采样率: {samplerate} Hz，{channels} 声道，{frames / samplerate:.1f} 秒")
+        results.update({job[0]: True for job in active})
+    except Exception as e:
+        print(f"❌ Pedalboard 处理失败: {e}")
+        import traceback
+        traceback.print_exc()
+        results.update({job[0]: False for job in active})
+    return results
+
 def change_voice_pedalboard_enhanced(input_audio, output_audio, pitch_shift=5, voice_type="rvc"):
     """
     增强版 Pedalboard 变声 - 更多效果处理，用于 RVC 后备方案
@@ -226,55 +536,13 @@ def change_voice_pedalboard_enhanced(input_audio, output_audio, pitch_shift=5, v
         return True
 
     try:
-        from pedalboard import Pedalboard, PitchShift, Reverb, Chorus, Phaser, Distortion, Compressor, HighpassFilter, LowpassFilter, Gain, Limiter, Delay
-        from pedalboard.io import AudioFile
-
-        # 根据声音类型创建增强效果链
-        effects = [PitchShift(semitones=pitch_shift)]
-
-        if "female" in voice_type:
-            # 女声增强效果
-            effects.extend([
-                HighpassFilter(cutoff_frequency_hz=200),
-                Compressor(threshold_db=-18, ratio=3),
-                Chorus(rate_hz=1.5, depth=0.3, wet_level=0.2),
-                Gain(gain_db=3),
-                Limiter(threshold_db=-0.5),
-            ])
-        elif "male" in voice_type:
-            # 男声增强效果
-            effects.extend([
-                LowpassFilter(cutoff_frequency_hz=3500),
-                Compressor(threshold_db=-12, ratio=2.5),
-                Delay(delay_seconds=0.01, wet_level=0.1),
-                Gain(gain_db=4),
-                Limiter(threshold_db=-0.5),
-            ])
-        else:
-            # RVC 默认增强效果
-            effects.extend([
-                HighpassFilter(cutoff_frequency_hz=150),
-                Compressor(threshold_db=-20, ratio=2.5),
-                Reverb(room_size=0.2, wet_level=0.15),
-                Gain(gain_db=3),
-                Limiter(threshold_db=-1),
-            ])
-
-        board = Pedalboard(effects)
-
-        with AudioFile(input_audio) as f:
-            audio = f.read(f.frames)
-            samplerate = f.samplerate
-
-        print(f"   输入采样率: {samplerate} Hz")
-        print(f"   音频形状: {audio.shape}")
-        print(f"   效果链: {len(effects)} 个效果")
+        # 增强效果链同样编译一次后复用
+        board = get_pedalboard(pitch_shift, voice_type, enhanced=True)
+        print(f"   效果链: {len(board)} 个效果")
         print(f"   正在处理...")
 
-        effected = board(audio, samplerate)
-
-        with AudioFile(output_audio, 'w', samplerate, effected.shape[0]) as f:
-            f.write(effected)
+        frames, samplerate, channels = process_file_streaming(board, input_audio, output_audio)
+        print(f"   输入采样率: {samplerate} Hz，{channels} 声道，{frames / samplerate:.1f} 秒")
 
         return True
 
@@ -288,7 +556,7 @@ def change_voice_pedalboard_enhanced(input_audio, output_audio, pitch_shift=5, v
 def change_voice_rvc(input_audio, output_audio, voice_config):
     """
     使用 RVC 模型进行高质量变声
-    调用独立的 RVC 推理脚本（真实版）
+    解码一次后经常驻 RVC worker 分段并行转换（见 convert_rvc_audio），不再为每个文件启动推理脚本
     强制使用 RVC，不降级
     """
     print(f"🎤 使用 RVC AI 模型进行变声...")
@@ -304,168 +572,388 @@ def change_voice_rvc(input_audio, output_audio, voice_config):
         print("   请先下载 RVC 模型")
         return False
 
-    # 获取参数
     f0up_key = voice_config.get('f0up_key', 0)
-    f0_method = voice_config.get('f0_method', 'harvest')
+    index_path = voice_config.get('index_path', '')
 
     print(f"   模型: {os.path.basename(model_path)}")
     print(f"   音高调整: {f0up_key:+d} 半音")
+    if index_path:
+        print(f"   Index: {os.path.basename(index_path)}")
 
-    # 检查音频时长，长音频使用分块处理
     try:
-        duration = get_audio_duration(input_audio)
-        print(f"   音频时长: {duration:.1f} 秒")
-
-        # 超过 60 秒使用分块处理
-        if duration > 60:
-            print(f"   检测到长音频，使用分块处理...")
-            script_dir = Path(__file__).parent
-            rvc_process_script = script_dir / 'rvc_process_long.py'
-
-            if not rvc_process_script.exists():
-                print(f"❌ 分块处理脚本未找到: {rvc_process_script}")
-                return False
-
-            # 构建 RVC 虚拟环境路径
-            skill_dir = Path(__file__).parent.parent
-            rvc_env_310 = skill_dir / 'models' / 'rvc_env_310' / 'bin' / 'python3'
-            rvc_env = skill_dir / 'models' / 'rvc_env' / 'bin' / 'python3'
-
-            if rvc_env_310.exists():
-                python_exe = str(rvc_env_310)
-            elif rvc_env.exists():
-                python_exe = str(rvc_env)
-            else:
-                python_exe = 'python3'
-
-            cmd = [
-                python_exe,
-                str(rvc_process_script),
-                input_audio,
-                '-o', output_audio,
-                '-m', os.path.expanduser(model_path),
-                '-p', str(f0up_key)
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)
+        _ensure_script_path()
+        from rvc_worker import RVC_INPUT_SR
+        from rvc_process_long import encode_output
 
-            # 输出结果
-            if result.stdout:
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        print(f"   {line}")
+        # 直接解码为 RVC 输入采样率的单声道，worker 无需再重采样
+        audio = _decode_mono(input_audio, RVC_INPUT_SR)
+        print(f"   音频时长: {len(audio) / RVC_INPUT_SR:.1f} 秒")
 
-            if result.returncode == 0 and os.path.exists(output_audio) and os.path.getsize(output_audio) > 1000:
-                print(f"   ✅ RVC 分块处理成功！")
-                return True
-            else:
-                print(f"❌ RVC 分块处理失败")
-                if result.stderr:
-                    for line in result.stderr.strip().split('\n')[-5:]:  # 只显示最后几行
-                        if line and not line.startswith('Traceback'):
-                            print(f"   {line}")
-                return False
+        output, out_sr = convert_rvc_audio(audio, RVC_INPUT_SR, voice_config,
+                                           resample_sr=voice_config.get('resample_sr') or None)
+        if not encode_output(output, output_audio, out_sr):
+            return False
 
-    except subprocess.TimeoutExpired:
-        print("❌ 处理超时（60分钟）")
+        if os.path.exists(output_audio) and os.path.getsize(output_audio) > 1000:
+            print(f"   ✅ RVC 转换成功！")
+            return True
+        print(f"   ❌ RVC 输出文件无效")
         return False
+
     except Exception as e:
-        print(f"❌ 获取音频时长失败: {e}")
-        # 继续使用普通处理
+        print(f"❌ RVC 处理出错: {e}")
+        return False
 
-    # 普通处理（短音频或获取时长失败时）
-    # 获取 RVC 推理脚本路径（使用真实 RVC 版本）
-    script_dir = Path(__file__).parent
-    rvc_script = script_dir / 'rvc_infer_real.py'
+def _decode_mono(input_audio, sample_rate):
+    """经 ffmpeg 管道解码为指定采样率的单声道 float32 数组"""
+    import subprocess
+    import numpy as np
 
-    if not rvc_script.exists():
-        print(f"❌ RVC 推理脚本未找到: {rvc_script}")
-        return False
+    cmd = ['ffmpeg', '-v', 'error', '-i', str(input_audio), '-map', '0:a:0',
+           '-ac', '1', '-ar', str(sample_rate), '-f', 'f32le', 'pipe:1']
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"解码失败: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
 
-    # 获取其他参数
-    index_path = voice_config.get('index_path', '')
-    index_rate = voice_config.get('index_rate', 0.75)
-    filter_radius = voice_config.get('filter_radius', 3)
-    resample_sr = voice_config.get('resample_sr', 0)
-    rms_mix_rate = voice_config.get('rms_mix_rate', 0.25)
-    protect = voice_config.get('protect', 0.33)
+def _ensure_script_path():
+    """本模块可能经 importlib 从其他 skill 加载，需自行把脚本目录加入搜索路径"""
+    script_dir = str(Path(__file__).resolve().parent)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
 
-    if index_path:
-        print(f"   Index: {os.path.basename(index_path)}")
+# 决定 worker 是否可复用的配置项（音高与 F0 方法随每次请求传入）
+RVC_WORKER_KEYS = ('model_path', 'index_path', 'index_rate', 'filter_radius', 'rms_mix_rate', 'protect')
 
-    # 构建 RVC 虚拟环境路径（优先使用 Python 3.10 环境）
-    skill_dir = Path(__file__).parent.parent
-    rvc_env_310 = skill_dir / 'models' / 'rvc_env_310' / 'bin' / 'python3'
-    rvc_env = skill_dir / 'models' / 'rvc_env' / 'bin' / 'python3'
-
-    # 确定使用哪个 Python
-    if rvc_env_310.exists():
-        python_exe = str(rvc_env_310)
-        print(f"   使用 RVC 虚拟环境 (Python 3.10)")
-    elif rvc_env.exists():
-        python_exe = str(rvc_env)
-        print(f"   使用 RVC 虚拟环境")
-    else:
-        python_exe = 'python3'
-        print(f"   使用系统 Python")
+# 进程内常驻的 RVC worker，同一模型与配置只启动一次
+_rvc_workers = {}
 
-    # 构建命令
-    cmd = [
-        python_exe,
-        str(rvc_script),
-        input_audio,
-        '-o', output_audio,
-        '-m', os.path.expanduser(model_path),
-        '-p', str(f0up_key),
-        '-f', f0_method
-    ]
+def get_rvc_workers(voice_config, count=1, device="cpu", threads=None):
+    """
+    取得 count 个常驻 RVC worker（不足时并行启动并加载模型）
 
-    # 添加可选参数（先不使用 index 以减少内存）
-    # if index_path:
-    #     cmd.extend(['-i', os.path.expanduser(index_path)])
-    print(f"   注意: 暂时不使用 index 文件以节省内存")
-    if index_rate != 0.75:
-        cmd.extend(['--index-rate', "0"])  # 不使用 index
-    if filter_radius != 3:
-        cmd.extend(['--filter-radius', str(filter_radius)])
-    if resample_sr != 0:
-        cmd.extend(['--resample-sr', str(resample_sr)])
-    if rms_mix_rate != 0.25:
-        cmd.extend(['--rms-mix-rate', str(rms_mix_rate)])
-    if protect != 0.33:
-        cmd.extend(['--protect', str(protect)])
+    worker 运行在 RVC 虚拟环境中，之后的调用只经管道传输 PCM，
+    进程退出时统一关闭；已退出（如处理超时被结束）的 worker 重新启动。
+    部分 worker 启动失败时返回已就绪的 worker，全部失败才报错
+    """
+    import json
+    from concurrent.futures import ThreadPoolExecutor
 
-    try:
-        print(f"   正在处理...")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)
-
-        # 始终输出完整的结果
-        if result.stdout:
-            for line in result.stdout.strip().split('\n'):
-                print(f"   {line}")
-
-        if result.returncode == 0:
-            # 检查输出文件是否真的创建了
-            if os.path.exists(output_audio) and os.path.getsize(output_audio) > 1000:
-                print(f"   ✅ RVC 转换成功！")
-                return True
-            else:
-                print(f"   ❌ RVC 返回成功但输出文件无效")
-                return False
-        else:
-            print(f"❌ RVC 处理失败 (退出码: {result.returncode})")
-            if result.stderr:
-                for line in result.stderr.strip().split('\n'):
-                    if line and not line.startswith('Traceback') and not line.startswith('  File'):
-                        print(f"   {line}")
-            return False
+    model_path = voice_config.get('model_path')
+    if not model_path:
+        raise RuntimeError("未配置 RVC 模型路径")
 
-    except subprocess.TimeoutExpired:
-        print("❌ 处理超时（30分钟）")
-        return False
+    key = json.dumps([device] + [voice_config.get(k) for k in RVC_WORKER_KEYS])
+    workers = [w for w in _rvc_workers.get(key, []) if w.process.poll() is None]
+    _rvc_workers[key] = workers
+    missing = count - len(workers)
+    if missing <= 0:
+        return workers[:count]
+
+    _ensure_script_path()
+    from rvc_worker import RVCWorker
+    from rvc_feature_cache import default_cache_dir
+
+    worker_config = {k: voice_config[k] for k in RVC_WORKER_KEYS[1:] if k in voice_config}
+
+    def start(_):
+        try:
+            return RVCWorker(model_path, worker_config, device, threads=threads, feature_cache=default_cache_dir())
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=missing) as executor:
+        started = list(executor.map(start, range(missing)))
+    errors = [e for e in started if isinstance(e, Exception)]
+    if not any(_rvc_workers.values()):
+        import atexit
+        atexit.register(close_rvc_workers)
+    workers.extend(w for w in started if not isinstance(w, Exception))
+    if not workers:
+        raise errors[0]
+    if errors:
+        print(f"⚠️  {len(errors)} 个 RVC worker 启动失败，使用其余 {len(workers)} 个: {errors[0]}")
+    return workers
+
+def close_rvc_workers():
+    """关闭所有常驻 RVC worker"""
+    while _rvc_workers:
+        _, workers = _rvc_workers.popitem()
+        for worker in workers:
+            worker.close()
+
+def convert_rvc_audio(audio, sample_rate, voice_config, resample_sr=None):
+    """
+    经常驻 RVC worker 转换整段单声道音频
+
+    与 rvc_process_long.py 使用同一分段、并行与交叉淡化合并流程（convert_audio）：
+    超过一个分段的音频由多个 worker 并行处理，每段请求受 worker 超时限制
+
+    Returns:
+        (output, out_sr)
+    """
+    _ensure_script_path()
+    from rvc_process_long import convert_audio, split_audio, auto_worker_count, THREADS_PER_WORKER
+
+    segments = len(split_audio(len(audio), sample_rate))
+    available = auto_worker_count()
+    pool = get_rvc_workers(voice_config, max(1, min(available, segments)),
+                           threads=THREADS_PER_WORKER if available > 1 else None)
+    return convert_audio(audio, sample_rate, f0up_key=voice_config.get('f0up_key', 0),
+                         f0_method=voice_config.get('f0_method', 'auto'),
+                         f0_quality=voice_config.get('f0_quality'), resample_sr=resample_sr, pool=pool)
+
+def get_voice_config(config, voice):
+    """取得声音预设；未找到时按名称推断音高（与命令行行为一致）"""
+    if voice not in config.get('voices', {}):
+        print(f"⚠️  未找到声音配置 '{voice}'，使用默认配置")
+        return {'pitch_shift': 5 if 'female' in voice else -5}
+    return dict(config['voices'][voice])
+
+def _run_ffmpeg_pcm(cmd, audio):
+    """将 float32 PCM 经 stdin 送入 ffmpeg，从 stdout 读回 float32 PCM"""
+    import subprocess
+    import numpy as np
+
+    data = np.ascontiguousarray(audio, dtype=np.float32)
+    result = subprocess.run(cmd, input=memoryview(data).cast('B'), capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace'))
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, data.shape[1])
+
+def _pcm_input_args(sample_rate, channels):
+    return ['-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0']
+
+def change_voice_array(audio, sample_rate, voice=None, config=None, method=None, pitch=None):
+    """
+    进程内变声：输入输出均为 PCM 数组，供其他 skill 直接导入调用
+
+    调用方已持有解码后的音频时，无需先编码成文件、再启动一个 Python 进程重新解码
+
+    Args:
+        audio: (frames, channels) float32 数组
+        sample_rate: 采样率
+        voice: 声音预设名（默认：配置文件 default_voice）
+        config: 已加载的配置（默认读取 voice_config.json）
+        method: 变声方法（默认：声音预设或配置文件中的 method）
+        pitch: 音高调整（半音，覆盖配置）
+
+    Returns:
+        (frames, channels) float32 数组，失败返回 None
+    """
+    import numpy as np
+
+    if config is None:
+        config = load_config()
+    if voice is None:
+        voice = config.get('default_voice', 'female_1')
+    voice_config = get_voice_config(config, voice)
+    if method is None:
+        method = voice_config.get('method', config.get('method', 'pedalboard'))
+
+    pitch_shift = voice_config.get('f0up_key') or voice_config.get('pitch_shift', 5)
+    if pitch is not None:
+        pitch_shift = pitch
+        voice_config['f0up_key'] = pitch
+    channels = audio.shape[1]
+
+    print(f"🎙️  进程内变声: {voice}（{method}），{audio.shape[0] / sample_rate:.1f} 秒")
+
+    try:
+        if method == 'pedalboard':
+            if pitch_shift == 0:
+                return audio
+            board = get_pedalboard(pitch_shift, voice, voice_config)
+            # pedalboard 使用 (channels, frames) 布局
+            effected = board(np.ascontiguousarray(audio.T, dtype=np.float32), sample_rate)
+            return effected.T
+
+        if method == 'simple':
+            if pitch_shift == 0:
+                return audio
+            pitch_ratio = 2 ** (pitch_shift / 12.0)
+            cmd = ['ffmpeg', '-v', 'error'] + _pcm_input_args(sample_rate, channels) + [
+                '-af', f'asetrate={sample_rate}*{pitch_ratio},aresample={sample_rate},atempo={1/pitch_ratio}',
+                '-f', 'f32le', 'pipe:1'
+            ]
+            return _run_ffmpeg_pcm(cmd, audio)
+
+        if method == 'rvc':
+            if 'f0up_key' not in voice_config:
+                voice_config['f0up_key'] = pitch_shift
+            # RVC 只处理单声道；长音频分段并行，输出直接重采样回调用方采样率
+            converted, _ = convert_rvc_audio(audio.mean(axis=1), sample_rate, voice_config,
+                                             resample_sr=sample_rate)
+            result = np.zeros((audio.shape[0], channels), dtype=np.float32)
+            n = min(len(converted), len(result))
+            result[:n] = converted[:n, None]
+            return result
+
+        print(f"❌ 未知方法: {method}")
+        return None
+
+    except ImportError as e:
+        print(f"❌ 依赖未安装: {e}")
+        return None
     except Exception as e:
-        print(f"❌ RVC 处理出错: {e}")
-        return False
+        print(f"❌ 进程内变声失败: {e}")
+        return None
+
+def change_voice_blocks(blocks, sample_rate, voice=None, config=None, method=None, pitch=None):
+    """
+    流式进程内变声：逐块输入 (frames, channels) float32 数组，逐块产出变声结果
+
+    pedalboard 方法用带状态的效果链逐块处理（reset=False），内存与时长无关，
+    结束时用静音冲刷延迟缓冲，输出总长度与输入一致；
+    simple 方法经一个常驻 ffmpeg 滤镜进程边写边读（见 _iter_ffmpeg_filter）；
+    RVC 需要整段音频分段并行，只收集单声道混音交给 convert_rvc_audio()，
+    不保留多声道原始块。可流式处理的方法见 STREAMING_METHODS
+
+    Args:
+        blocks: 可迭代的 (frames, channels) float32 数组
+        其余参数同 change_voice_array()
+
+    Raises:
+        RuntimeError: 变声失败
+    """
+    import numpy as np
+
+    if config is None:
+        config = load_config()
+    if voice is None:
+        voice = config.get('default_voice', 'female_1')
+    voice_config, method, _, pitch_shift = resolve_voice(config, voice, method, pitch)
+
+    if method not in ('pedalboard', 'simple', 'rvc'):
+        raise RuntimeError(f"未知方法: {method}")
+
+    print(f"🎙️  流式变声: {voice}（{method}），音高偏移 {pitch_shift:+d} 半音")
+    if method == 'rvc':
+        yield from _rvc_blocks(blocks, sample_rate, voice_config, pitch_shift)
+        return
+    if pitch_shift == 0:
+        yield from blocks
+        return
+    if method == 'simple':
+        pitch_ratio = 2 ** (pitch_shift / 12.0)
+        yield from _iter_ffmpeg_filter(
+            blocks, sample_rate,
+            f'asetrate={sample_rate}*{pitch_ratio},aresample={sample_rate},atempo={1/pitch_ratio}'
+        )
+        return
+
+    board = get_pedalboard(pitch_shift, voice, voice_config)
+    board.reset()
+    channels = None
+    total = written = 0
+    for block in blocks:
+        channels = block.shape[1]
+        total += len(block)
+        # pedalboard 使用 (channels, frames) 布局
+        effected = board(np.ascontiguousarray(block.T, dtype=np.float32), sample_rate, reset=False).T
+        written += len(effected)
+        if len(effected):
+            yield effected
+    if channels is None:
+        return
+
+    # 送入静音冲刷延迟缓冲中的尾部，仍不足时补零
+    silence = np.zeros((channels, STREAM_BLOCK_FRAMES), dtype=np.float32)
+    for _ in range(FLUSH_BLOCKS):
+        if written >= total:
+            break
+        effected = board(silence, sample_rate, reset=False).T[:total - written]
+        written += len(effected)
+        yield effected
+    if written < total:
+        yield np.zeros((total - written, channels), dtype=np.float32)
+
+def _iter_ffmpeg_filter(blocks, sample_rate, audio_filter):
+    """
+    经一个 ffmpeg 进程流式应用音频滤镜：后台线程写入输入块，当前线程读出结果块
+
+    输入与输出并发，管道两端都不会因对方写满而阻塞，内存只占一个块
+    """
+    import itertools
+    import subprocess
+    import tempfile
+    import numpy as np
+
+    blocks = iter(blocks)
+    first = next(blocks, None)
+    if first is None:
+        return
+    channels = first.shape[1]
+    cmd = ['ffmpeg', '-v', 'error'] + _pcm_input_args(sample_rate, channels) + [
+        '-af', audio_filter, '-f', 'f32le', 'pipe:1'
+    ]
+    errors = []
+
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log)
+
+        def feed():
+            try:
+                for block in itertools.chain([first], blocks):
+                    process.stdin.write(np.ascontiguousarray(block, dtype='<f4').tobytes())
+            except BrokenPipeError:
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        frame_bytes = 4 * channels
+        finished = False
+        try:
+            while True:
+                data = process.stdout.read(STREAM_BLOCK_FRAMES * frame_bytes)
+                if not data:
+                    break
+                data = data[:len(data) - len(data) % frame_bytes]
+                yield np.frombuffer(data, dtype='<f4').reshape(-1, channels)
+            finished = True
+        finally:
+            # 调用方提前停止迭代时结束 ffmpeg，写入线程随之因管道断开退出
+            if not finished:
+                process.kill()
+            process.stdout.close()
+            feeder.join()
+            code = process.wait()
+        if errors:
+            raise errors[0]
+        if code != 0:
+            log.seek(0)
+            raise RuntimeError(f"ffmpeg 变声失败: {log.read().decode(errors='replace')}")
+
+def _rvc_blocks(blocks, sample_rate, voice_config, pitch_shift):
+    """收集单声道混音后经常驻 worker 分段并行转换，按输入长度与声道数逐块产出"""
+    import numpy as np
+
+    mono = []
+    channels = None
+    for block in blocks:
+        channels = block.shape[1]
+        mono.append(block.mean(axis=1, dtype=np.float32))
+    if channels is None:
+        return
+    mono = np.concatenate(mono)
+    if 'f0up_key' not in voice_config:
+        voice_config['f0up_key'] = pitch_shift
+    converted, _ = convert_rvc_audio(mono, sample_rate, voice_config, resample_sr=sample_rate)
+    total = len(mono)
+    del mono
+    for start in range(0, total, STREAM_BLOCK_FRAMES):
+        block = converted[start:start + STREAM_BLOCK_FRAMES]
+        frames = min(STREAM_BLOCK_FRAMES, total - start)
+        out = np.zeros((frames, channels), dtype=np.float32)
+        out[:len(block)] = block[:frames, None]
+        yield out
 
 def check_method_dependencies(method, voice_config=None):
     """
@@ -475,12 +963,10 @@ def check_method_dependencies(method, voice_config=None):
         (ok: bool, message: str) — ok=True 表示依赖满足
     """
     if method == 'pedalboard':
-        try:
-            from pedalboard import Pedalboard, PitchShift
-            from pedalboard.io import AudioFile
+        # 只查找包而不导入，导入 pedalboard 本身要数百毫秒
+        if probe_dependencies()['pedalboard']:
             return True, "pedalboard 可用"
-        except ImportError as e:
-            return False, f"pedalboard 未安装 ({e})\\n   安装: pip install pedalboard"
+        return False, "pedalboard 未安装\n   安装: pip install pedalboard"
     elif method == 'rvc':
         # 检查 RVC Python 环境
         script_dir = Path(__file__).parent
@@ -498,172 +984,517 @@ def check_method_dependencies(method, voice_config=None):
     else:
         return False, f"未知方法: {method}"
 
-def main():
-    parser = argparse.ArgumentParser(description='音频变声处理工具')
-    parser.add_argument('input_audio', help='输入音频文件路径')
-    parser.add_argument('-o', '--output', help='输出音频文件路径（默认: 输入文件名_voice_changed.mp3）')
-    parser.add_argument('-v', '--voice', default=None, help='目标声音类型（默认: 从配置文件读取）')
-    parser.add_argument('-c', '--config', help='自定义配置文件路径')
-    parser.add_argument('-m', '--method', choices=['simple', 'pedalboard', 'rvc'], default='pedalboard',
-                       help='变声方法: simple(FFmpeg), pedalboard(高质量), rvc(AI模型)')
-    parser.add_argument('-p', '--pitch', type=int, help='音高调整（半音，覆盖配置文件）')
+def voice_output_path(output_path, voice):
+    """多声音输出路径：<stem>_<voice><suffix>"""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}_{voice}{path.suffix}"))
 
-    args = parser.parse_args()
+def resolve_voice(config, voice, method=None, pitch=None):
+    """
+    确定声音的配置、处理方法与音高
 
-    # 加载配置（早期加载以获取默认声音）
-    config = load_config(args.config)
+    方法优先级: 命令行明确指定(method) > 配置文件中声音的 method > 配置文件全局 method
 
-    # 确定使用的声音（命令行 > 配置文件默认值）
-    if args.voice is None:
-        args.voice = config.get('default_voice', 'female_1')
+    Returns:
+        (voice_config, method, method_source, pitch_shift)
+    """
+    voice_config = get_voice_config(config, voice)
 
-    # 检查输入文件
-    if not os.path.exists(args.input_audio):
-        print(f"❌ 输入文件不存在: {args.input_audio}")
-        sys.exit(1)
+    # 如果命令行指定了音高，覆盖配置
+    if pitch is not None:
+        voice_config['pitch_shift'] = pitch
 
-    # 检查依赖
-    if not check_dependencies():
-        sys.exit(1)
+    if method:
+        method_source = "命令行指定"
+    else:
+        config_default_method = config.get('method', 'pedalboard')
+        method = voice_config.get('method', config_default_method)
+        method_source = "配置文件"
+
+    # 获取实际的 pitch_shift（RVC 用 f0up_key）
+    pitch_shift = voice_config.get('f0up_key') or voice_config.get('pitch_shift', 5)
+    if pitch is not None:
+        pitch_shift = pitch
+        # 更新 voice_config 以便 RVC 使用
+        voice_config['f0up_key'] = pitch
+    return voice_config, method, method_source, pitch_shift
+
+def run_voice(input_audio, output_audio, voice, voice_config, method, pitch_shift):
+    """按方法执行单个声音的变声"""
+    if method == 'simple':
+        return change_voice_simple(input_audio, output_audio, pitch_shift)
+    elif method == 'pedalboard':
+        return change_voice_pedalboard(input_audio, output_audio, pitch_shift, voice, voice_config)
+    elif method == 'rvc':
+        # 确保 f0up_key 存在
+        if 'f0up_key' not in voice_config:
+            voice_config['f0up_key'] = pitch_shift
+        return change_voice_rvc(input_audio, output_audio, voice_config)
+    return False
 
+def run_voices(input_audio, jobs):
+    """
+    执行多个声音的变声：pedalboard 声音一次解码并行渲染，其余方法依次处理
+
+    Args:
+        jobs: [(voice, output_audio, voice_config, method, pitch_shift), ...]
+
+    Returns:
+        {voice: 是否成功}
+    """
+    board_jobs = [(voice, output, pitch_shift, voice_config)
+                  for voice, output, voice_config, method, pitch_shift in jobs if method == 'pedalboard']
+    results = change_voice_pedalboard_multi(input_audio, board_jobs) if board_jobs else {}
+    for voice, output, voice_config, method, pitch_shift in jobs:
+        if method != 'pedalboard':
+            print()
+            results[voice] = run_voice(input_audio, output, voice, voice_config, method, pitch_shift)
+    return results
+
+def check_jobs_dependencies(jobs):
+    """
+    启动时预检各声音所用方法的依赖，每种方法只检查一次
+
+    pedalboard 是默认方法，缺失属于环境问题 → 报错退出；
+    RVC 等非默认方法缺失 → 仅告警，让后续处理自行降级
+    """
+    checked = set()
+    for voice, _, voice_config, method, _ in jobs:
+        # RVC 依赖与模型有关，按声音检查
+        key = (method, voice) if method == 'rvc' else method
+        if key in checked:
+            continue
+        checked.add(key)
+        dep_ok, dep_msg = check_method_dependencies(method, voice_config)
+        if not dep_ok:
+            if method == 'pedalboard':
+                print(f"❌ 依赖检查失败: {dep_msg}")
+                print("   请安装所需依赖后重试")
+                sys.exit(1)
+            else:
+                print(f"⚠️  依赖告警: {dep_msg}")
+                print("   将尝试继续处理，如失败会降级到原始音频")
+        else:
+            print(f"   ✅ 依赖检查通过" + (f"（{method}）" if len(jobs) > 1 else ""))
+
+def convert_file(input_audio, output_audio, voices, config, method=None, pitch=None, check_deps=True):
+    """
+    转换一个音频或视频文件（命令行单文件与批处理共用）
+
+    Args:
+        output_audio: 输出路径（None 时按输入文件名生成）；多个声音时再按声音加后缀
+        voices: 声音名列表
+        method: 命令行明确指定的方法（None 表示按配置）
+        pitch: 音高调整（半音，覆盖配置）
+        check_deps: 预检方法依赖（批处理已在主进程中检查）
+
+    Returns:
+        {voice: 输出路径}，失败的声音为 None
+    """
     # 确定输出文件路径
-    if args.output:
-        output_audio = args.output
-    else:
-        input_path = Path(args.input_audio)
-        output_audio = str(input_path.parent / f"{input_path.stem}_voice_changed{input_path.suffix}")
+    if output_audio is None:
+        input_path = Path(input_audio)
+        suffix = '.mp4' if is_video_file(input_audio) else input_path.suffix
+        output_audio = str(input_path.parent / f"{input_path.stem}_voice_changed{suffix}")
 
     # 检测输入是否为视频，如果是则提取音频进行处理
-    input_is_video = is_video_file(args.input_audio)
     original_video = None
-    temp_wav = None
+    temp_dir = None
 
     # 用于变声处理的实际输出路径（必须是音频格式）
     process_output = output_audio
 
-    if input_is_video:
+    if is_video_file(input_audio):
         print(f"检测到输入为视频文件，将自动处理...")
-        original_video = args.input_audio
+        original_video = input_audio
         # 创建临时 wav 文件
         import tempfile
         temp_dir = tempfile.mkdtemp(prefix='vc_')
         temp_wav = os.path.join(temp_dir, 'temp_audio.wav')
-        extract_audio_from_video(args.input_audio, temp_wav)
-        args.input_audio = temp_wav
+        extract_audio_from_video(input_audio, temp_wav)
+        input_audio = temp_wav
         # 变声处理输出到临时 wav 文件
         process_output = os.path.join(temp_dir, 'changed_audio.wav')
-        if not args.output:
-            output_audio = str(Path(original_video).with_suffix('').parent / f"{Path(original_video).stem}_voice_changed.mp4")
         print(f"输出文件: {output_audio}")
 
+    # 多个声音时每个声音单独输出
+    if len(voices) > 1:
+        outputs = {voice: voice_output_path(output_audio, voice) for voice in voices}
+        process_outputs = {voice: voice_output_path(process_output, voice) for voice in voices}
+    else:
+        outputs = {voices[0]: output_audio}
+        process_outputs = {voices[0]: process_output}
+
     print("=" * 50)
     print("🎙️  音频变声处理")
     print("=" * 50)
-    print(f"输入文件: {args.input_audio}")
-    print(f"输出文件: {output_audio}")
-    print(f"目标声音: {args.voice}")
+    print(f"输入文件: {input_audio}")
+    for voice in voices:
+        print(f"输出文件: {outputs[voice]}")
+    print(f"目标声音: {', '.join(voices)}")
+
+    print()
+
+    if pitch is not None:
+        print(f"使用命令行指定的音高: {pitch:+d} 半音")
+
+    jobs = []
+    for voice in voices:
+        voice_config, voice_method, method_source, pitch_shift = resolve_voice(config, voice, method, pitch)
+        prefix = f"[{voice}] " if len(voices) > 1 else ""
+        print(f"{prefix}处理方法: {voice_method} ({method_source})")
+        jobs.append((voice, process_outputs[voice], voice_config, voice_method, pitch_shift))
+
+    if check_deps:
+        check_jobs_dependencies(jobs)
 
-    # 获取音频时长
     try:
-        duration = get_audio_duration(args.input_audio)
-        print(f"音频时长: {duration:.2f} 秒")
-    except Exception as e:
-        print(f"⚠️  无法获取音频时长: {e}")
+        if len(jobs) == 1:
+            voice, output, voice_config, voice_method, pitch_shift = jobs[0]
+            results = {voice: run_voice(input_audio, output, voice, voice_config, voice_method, pitch_shift)}
+        else:
+            results = run_voices(input_audio, jobs)
 
-    print()
+        # 如果输入是视频，将变声后的音频合成回视频
+        if original_video:
+            for voice in voices:
+                if not results.get(voice):
+                    continue
+                print(f"\n正在合成变声后的音频与视频...")
+                # 如果输出文件已存在，先删除
+                if os.path.exists(outputs[voice]):
+                    os.remove(outputs[voice])
+                combine_audio_with_video(original_video, process_outputs[voice], outputs[voice])
+    finally:
+        # 清理临时文件
+        if temp_dir:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {voice: outputs[voice] if results.get(voice) else None for voice in voices}
+
+def collect_batch_inputs(source, output_dir):
+    """
+    收集批处理输入
 
-    # 获取声音配置
-    if args.voice not in config.get('voices', {}):
-        print(f"⚠️  未找到声音配置 '{args.voice}'，使用默认配置")
-        voice_config = {
-            'pitch_shift': 5 if 'female' in args.voice else -5
-        }
-    else:
-        voice_config = config['voices'][args.voice]
+    Args:
+        source: 目录（递归查找音频/视频，跳过输出目录）或清单文件（每行一个路径，# 开头为注释，相对路径相对清单所在目录）
 
-    # 如果命令行指定了音高，覆盖配置
-    if args.pitch is not None:
-        voice_config['pitch_shift'] = args.pitch
-        print(f"使用命令行指定的音高: {args.pitch:+d} 半音")
+    Returns:
+        [(输入路径, 输出子目录)]，目录输入保留相对目录结构，清单输入不分子目录
+    """
+    source = Path(source)
+    output_dir = Path(output_dir).resolve()
+    if source.is_dir():
+        inputs = []
+        for path in sorted(source.rglob('*')):
+            if not path.is_file() or output_dir in path.resolve().parents:
+                continue
+            if path.suffix.lower() in AUDIO_EXTENSIONS or is_video_file(path):
+                inputs.append((path, path.parent.relative_to(source)))
+        return inputs
+
+    inputs = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = Path(line).expanduser()
+            if not path.is_absolute():
+                path = source.parent / path
+            inputs.append((path, Path('.')))
+    return inputs
+
+def batch_settings_key(voice, voice_config, method, pitch_shift):
+    """声音设置的哈希：设置变化后，已有输出视为过期"""
+    import json
+    import hashlib
+
+    data = json.dumps([voice, method, pitch_shift, voice_config], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def _batch_up_to_date(input_file, output_audio, settings_key, record):
+    """输出存在、不早于输入，且记录的输入 mtime 与声音设置一致（无记录时只比较 mtime）"""
+    output = Path(output_audio)
+    if not output.exists():
+        return False
+    input_mtime = input_file.stat().st_mtime
+    if output.stat().st_mtime < input_mtime:
+        return False
+    return record is None or (record.get('settings') == settings_key and record.get('input_mtime') == input_mtime)
 
-    # 执行变声
-    # 方法优先级: 命令行明确指定(-m) > 配置文件中声音的 method > 配置文件全局 method
-    # 检查命令行是否明确指定了 -m 参数
-    has_method_arg = any(arg in ['-m', '--method'] for arg in sys.argv)
+def _write_json(path, data):
+    import json
 
-    if has_method_arg:
-        # 用户明确指定了方法，使用命令行参数
-        method = args.method
-        method_source = "命令行指定"
-    else:
-        # 用户没有指定，使用配置文件的方法
-        config_default_method = config.get('method', 'pedalboard')
-        method = voice_config.get('method', config_default_method)
-        method_source = "配置文件"
+    tmp_file = Path(f"{path}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
 
-    print(f"处理方法: {method} ({method_source})")
+def batch_worker_count(methods, requested=None):
+    """
+    批处理进程数：默认按 CPU 核数
 
-    # 启动时预检方法依赖（仅告警，不阻断流程）
-    dep_ok, dep_msg = check_method_dependencies(method, voice_config)
-    if not dep_ok:
-        if method == 'pedalboard':
-            # pedalboard 是默认方法，缺失属于环境问题 → 报错退出
-            print(f"❌ 依赖检查失败: {dep_msg}")
-            print("   请安装所需依赖后重试")
-            sys.exit(1)
+    RVC 长音频已在常驻 worker 池内多进程并行，含 RVC 声音时默认只用 1 个进程，避免超额占用
+    """
+    if requested:
+        return requested
+    if 'rvc' in methods:
+        return 1
+    return os.cpu_count() or 1
+
+def _batch_init(config_path, voices):
+    """批处理 worker 初始化：预先编译声音效果链，之后每个文件无需再构建"""
+    try:
+        compile_voice_presets(load_config(config_path), voices)
+    except Exception:
+        # 编译失败在处理文件时会再次出现并记入该文件的日志
+        pass
+
+def _batch_convert(task):
+    """批处理 worker：转换一个文件，返回摘要条目（处理日志捕获后只在失败时附带）"""
+    import io
+    import time
+    import contextlib
+
+    input_file, output_audio, voices, config_path, method, pitch = task
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        try:
+            outputs = convert_file(input_file, output_audio, voices, load_config(config_path), method, pitch,
+                                   check_deps=False)
+        except Exception as e:
+            print(f"❌ {e}")
+            outputs = {voice: None for voice in voices}
+    elapsed = time.perf_counter() - start
+
+    duration = get_media_duration(input_file)
+    failed = [voice for voice, output in outputs.items() if output is None]
+    entry = {
+        'input': input_file,
+        'outputs': outputs,
+        'status': 'failed' if failed else 'ok',
+        'duration': duration,
+        'elapsed': round(elapsed, 3),
+        'rtf': round(elapsed / duration, 4) if duration else None,
+    }
+    if failed:
+        entry['log'] = log.getvalue()[-4000:]
+    return entry
+
+def run_batch(source, voices, config, config_path=None, output_dir=None, method=None, pitch=None,
+              workers=None, force=False, summary_path=None):
+    """
+    批处理目录或清单中的全部文件
+
+    依赖只在主进程中检查一次；文件按大小从大到小提交到进程池，
+    空闲进程从共享队列领取下一个文件，减少尾部等待。
+    已是最新的输出（见 _batch_up_to_date）跳过，force=True 时全部重新处理
+
+    Returns:
+        摘要（同时写出 JSON）: {'files': [{'input', 'outputs', 'status', 'duration', 'elapsed', 'rtf'}, ...], ...}
+    """
+    import json
+    import time
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    source = Path(source)
+    if output_dir is None:
+        output_dir = (source if source.is_dir() else source.parent) / 'voice_changed'
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 50)
+    print("🎙️  批量变声处理")
+    print("=" * 50)
+    print(f"输入: {source}")
+    print(f"输出目录: {output_dir}")
+    print(f"目标声音: {', '.join(voices)}")
+
+    jobs = []
+    settings = {}
+    for voice in voices:
+        voice_config, voice_method, method_source, pitch_shift = resolve_voice(config, voice, method, pitch)
+        print(f"[{voice}] 处理方法: {voice_method} ({method_source})")
+        jobs.append((voice, None, voice_config, voice_method, pitch_shift))
+        settings[voice] = batch_settings_key(voice, voice_config, voice_method, pitch_shift)
+    check_jobs_dependencies(jobs)
+
+    state_file = output_dir / BATCH_STATE_FILE
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+
+    entries = []
+    tasks = []
+    for input_file, rel_dir in collect_batch_inputs(source, output_dir):
+        if not input_file.exists():
+            entries.append({'input': str(input_file), 'status': 'failed', 'log': '输入文件不存在'})
+            continue
+        suffix = '.mp4' if is_video_file(input_file) else input_file.suffix
+        output_audio = str(output_dir / rel_dir / f"{input_file.stem}_voice_changed{suffix}")
+        if len(voices) > 1:
+            outputs = {voice: voice_output_path(output_audio, voice) for voice in voices}
         else:
-            # RVC 等非默认方法缺失 → 仅告警，让后续处理自行降级
-            print(f"⚠️  依赖告警: {dep_msg}")
-            print("   将尝试继续处理，如失败会降级到原始音频")
-    else:
-        print(f"   ✅ 依赖检查通过")
+            outputs = {voices[0]: output_audio}
+
+        if not force and all(
+            _batch_up_to_date(input_file, output, settings[voice],
+                              state.get(str(Path(output).relative_to(output_dir))))
+            for voice, output in outputs.items()
+        ):
+            entries.append({'input': str(input_file), 'outputs': outputs, 'status': 'skipped'})
+            continue
+
+        Path(output_audio).parent.mkdir(parents=True, exist_ok=True)
+        tasks.append((input_file.stat().st_size,
+                      (str(input_file), output_audio, voices, config_path, method, pitch)))
+
+    # 大文件先处理，避免最后只剩一个长文件在跑
+    tasks = [task for _, task in sorted(tasks, key=lambda t: t[0], reverse=True)]
+    workers = min(batch_worker_count({job[3] for job in jobs}, workers), max(len(tasks), 1))
+    print(f"\n共 {len(entries) + len(tasks)} 个文件：待处理 {len(tasks)}，跳过 {len(entries)}，{workers} 个进程")
+    print()
 
-    # 获取实际的 pitch_shift（RVC 用 f0up_key）
-    pitch_shift = voice_config.get('f0up_key') or voice_config.get('pitch_shift', 5)
-    if args.pitch is not None:
-        pitch_shift = args.pitch
-        # 更新 voice_config 以便 RVC 使用
-        voice_config['f0up_key'] = args.pitch
+    start = time.perf_counter()
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_batch_init,
+                                 initargs=(config_path, voices)) as pool:
+            futures = [pool.submit(_batch_convert, task) for task in tasks]
+            for i, future in enumerate(as_completed(futures), 1):
+                entry = future.result()
+                entries.append(entry)
+                name = Path(entry['input']).name
+                if entry['status'] == 'ok':
+                    rtf = f"RTF {entry['rtf']:.3f}" if entry['rtf'] is not None else "RTF -"
+                    print(f"[{i}/{len(tasks)}] ✅ {name}  {entry['elapsed']:.1f} 秒  {rtf}")
+                else:
+                    print(f"[{i}/{len(tasks)}] ❌ {name}")
+
+                input_mtime = Path(entry['input']).stat().st_mtime
+                for voice, output in entry['outputs'].items():
+                    if output:
+                        state[str(Path(output).relative_to(output_dir))] = {
+                            'input': entry['input'],
+                            'input_mtime': input_mtime,
+                            'settings': settings[voice],
+                        }
+                # 每完成一个文件就保存状态，中断后重新运行可跳过已完成的文件
+                _write_json(state_file, state)
+    elapsed = time.perf_counter() - start
+
+    converted = [e for e in entries if e['status'] == 'ok']
+    audio_seconds = sum(e['duration'] or 0 for e in converted)
+    summary = {
+        'source': str(source),
+        'output_dir': str(output_dir),
+        'voices': voices,
+        'workers': workers,
+        'elapsed': round(elapsed, 3),
+        'total': len(entries),
+        'converted': len(converted),
+        'skipped': sum(e['status'] == 'skipped' for e in entries),
+        'failed': sum(e['status'] == 'failed' for e in entries),
+        # 整体 RTF：墙钟时间 / 已转换音频总时长
+        'rtf': round(elapsed / audio_seconds, 4) if audio_seconds else None,
+        'files': entries,
+    }
+    summary_path = Path(summary_path) if summary_path else output_dir / BATCH_SUMMARY_FILE
+    _write_json(summary_path, summary)
 
-    success = False
-    if method == 'simple':
-        success = change_voice_simple(args.input_audio, process_output, pitch_shift)
-    elif method == 'pedalboard':
-        success = change_voice_pedalboard(args.input_audio, process_output, pitch_shift, args.voice)
-    elif method == 'rvc':
-        # 确保 f0up_key 存在
-        if 'f0up_key' not in voice_config:
-            voice_config['f0up_key'] = pitch_shift
-        success = change_voice_rvc(args.input_audio, process_output, voice_config)
+    print()
+    print("=" * 50)
+    print(f"{'✅' if not summary['failed'] else '⚠️ '} 批量处理完成：转换 {summary['converted']}，"
+          f"跳过 {summary['skipped']}，失败 {summary['failed']}，耗时 {elapsed:.1f} 秒"
+          + (f"，整体 RTF {summary['rtf']:.3f}" if summary['rtf'] is not None else ""))
+    print(f"摘要: {summary_path}")
+    print("=" * 50)
+    return summary
 
-    if success:
-        # 如果输入是视频，将变声后的音频合成回视频
-        if input_is_video and original_video:
-            print(f"\n正在合成变声后的音频与视频...")
-            final_output = output_audio
-            # 如果输出文件已存在，先删除
-            if os.path.exists(final_output):
-                os.remove(final_output)
-            combine_audio_with_video(original_video, process_output, final_output)
-            output_audio = final_output
-            # 清理临时文件
-            if temp_wav and os.path.exists(temp_wav):
-                os.remove(temp_wav)
-                import shutil
-                shutil.rmtree(os.path.dirname(temp_wav))
+def main():
+    parser = argparse.ArgumentParser(description='音频变声处理工具')
+    parser.add_argument('input_audio', nargs='?', help='输入音频文件路径（--batch 时为目录或清单文件）')
+    parser.add_argument('-o', '--output', help='输出音频文件路径（默认: 输入文件名_voice_changed.mp3；'
+                                               '多个声音时为 输出文件名_<声音>.扩展名；--batch 时为输出目录）')
+    parser.add_argument('-v', '--voice', default=None,
+                        help='目标声音类型，多个用逗号分隔，如 female_1,male_deep（默认: 从配置文件读取）')
+    parser.add_argument('-c', '--config', help='自定义配置文件路径')
+    parser.add_argument('-m', '--method', choices=['simple', 'pedalboard', 'rvc'], default='pedalboard',
+                       help='变声方法: simple(FFmpeg), pedalboard(高质量), rvc(AI模型)')
+    parser.add_argument('-p', '--pitch', type=int, help='音高调整（半音，覆盖配置文件）')
+    parser.add_argument('--check-deps', action='store_true', help='重新探测依赖并显示结果')
+    parser.add_argument('--batch', action='store_true',
+                        help='批处理: 输入为目录（递归）或清单文件（每行一个路径），输出目录默认为 <输入目录>/voice_changed')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='批处理进程数（默认: CPU 核数；含 RVC 声音时为 1）')
+    parser.add_argument('--force', action='store_true', help='批处理时重新处理已是最新的输出')
+    parser.add_argument('--summary', help=f'批处理 JSON 摘要路径（默认: 输出目录/{BATCH_SUMMARY_FILE}）')
+
+    args = parser.parse_args()
+
+    if args.check_deps:
+        deps = probe_dependencies(refresh=True)
+        for name, found in deps.items():
+            print(f"{'✅' if found else '❌'} {name}" + (f": {found}" if isinstance(found, str) else ""))
+        ok, message = check_method_dependencies('rvc')
+        print(f"{'✅' if ok else '⚠️ '} {message}")
+        sys.exit(0 if check_dependencies() else 1)
+
+    if not args.input_audio:
+        parser.error("缺少输入音频文件")
+
+    # 加载配置（早期加载以获取默认声音）
+    config = load_config(args.config)
+
+    # 确定使用的声音（命令行 > 配置文件默认值）
+    if args.voice is None:
+        args.voice = config.get('default_voice', 'female_1')
+    voices = list(dict.fromkeys(v.strip() for v in args.voice.split(',') if v.strip()))
+    if not voices:
+        parser.error("未指定目标声音")
+
+    # 检查输入文件
+    if not os.path.exists(args.input_audio):
+        print(f"❌ 输入文件不存在: {args.input_audio}")
+        sys.exit(1)
+
+    # 检查依赖
+    if not check_dependencies():
+        sys.exit(1)
 
+    # 方法优先级: 命令行明确指定(-m) > 配置文件中声音的 method > 配置文件全局 method
+    # 检查命令行是否明确指定了 -m 参数
+    has_method_arg = any(arg in ['-m', '--method'] for arg in sys.argv)
+    method = args.method if has_method_arg else None
+
+    if args.batch:
+        summary = run_batch(args.input_audio, voices, config, args.config, args.output, method, args.pitch,
+                            args.workers, args.force, args.summary)
+        sys.exit(1 if summary['failed'] else 0)
+
+    outputs = convert_file(args.input_audio, args.output, voices, config, method, args.pitch)
+
+    failed = [voice for voice, output in outputs.items() if output is None]
+    if len(failed) < len(voices):
         print()
         print("=" * 50)
         print("✅ 变声处理完成！")
-        print(f"输出文件: {output_audio}")
-
-        # 显示文件大小
-        output_size = os.path.getsize(output_audio) / (1024 * 1024)
-        print(f"文件大小: {output_size:.2f} MB")
+        for voice, output in outputs.items():
+            if output is None:
+                continue
+            # 显示文件大小
+            output_size = os.path.getsize(output) / (1024 * 1024)
+            print(f"输出文件: {output}")
+            print(f"文件大小: {output_size:.2f} MB")
         print("=" * 50)
-    else:
+
+    if failed:
         print()
-        print("❌ 变声处理失败")
+        print(f"❌ 变声处理失败" + (f": {', '.join(failed)}" if len(voices) > 1 else ""))
         sys.exit(1)
 
 def is_video_file(file_path):
@@ -673,6 +1504,8 @@ def is_video_file(file_path):
 
 def extract_audio_from_video(video_file, audio_file):
     """从视频中提取音频"""
+    import subprocess
+
     print(f"   从视频中提取音频...")
     cmd = [
         'ffmpeg', '-y', '-i', video_file,
@@ -686,6 +1519,8 @@ def extract_audio_from_video(video_file, audio_file):
 
 def combine_audio_with_video(video_file, audio_file, output_video_file):
     """将音频合成回视频"""
+    import subprocess
+
     print(f"   将音频合成回视频...")
     cmd = [
         'ffmpeg', '-y', '-i', video_file, '-i', audio_file,
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("rvc_f0", SCRIPTS / "rvc_f0.py")
+assert SPEC and SPEC.loader
+f0 = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(f0)
+
+
+class F0AgreementTests(unittest.TestCase):
+    def test_identical_tracks_agree(self):
+        track = np.array([0, 0, 220, 221, 230, 0], dtype=np.float64)
+        self.assertEqual(f0.f0_agreement(track, track), 1.0)
+
+    def test_voicing_and_pitch_differences(self):
+        reference = np.array([0, 200, 200, 200], dtype=np.float64)
+        # 第 1 帧浊音判断不同；第 3 帧相差 20 音分（一致）；第 4 帧相差一个全音（不一致）
+        track = np.array([150, 200, 200 * 2 ** (20 / 1200), 200 * 2 ** (200 / 1200)])
+        self.assertAlmostEqual(f0.f0_agreement(track, reference), 0.5)
+
+    def test_uses_common_length(self):
+        self.assertEqual(f0.f0_agreement(np.full(10, 100.0), np.full(4, 100.0)), 1.0)
+        self.assertEqual(f0.f0_agreement(np.zeros(0), np.zeros(3)), 0.0)
+
+
+class QuantizeF0Tests(unittest.TestCase):
+    def test_range_and_order(self):
+        track = np.array([0, f0.F0_MIN, 100, 200, 400, f0.F0_MAX, 5000], dtype=np.float64)
+        coarse, original = f0.quantize_f0(track.copy())
+        self.assertEqual(coarse.dtype, np.int32)
+        self.assertEqual(coarse[0], 1)
+        self.assertEqual(coarse[1], 1)
+        self.assertEqual(coarse[5], 255)
+        self.assertEqual(coarse[6], 255)
+        self.assertTrue(np.all(np.diff(coarse[1:]) >= 0))
+        np.testing.assert_array_equal(original, track)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("rvc_feature_cache", SCRIPTS / "rvc_feature_cache.py")
+assert SPEC and SPEC.loader
+fc = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(fc)
+
+
+class FeatureKeyTests(unittest.TestCase):
+    def test_key_depends_on_content_params_and_dtype(self):
+        data = np.arange(16, dtype=np.float32)
+        key = fc.feature_key("f0", data, "harvest", 3)
+        self.assertTrue(key.startswith("f0-"))
+        self.assertEqual(key, fc.feature_key("f0", data.copy(), "harvest", 3))
+        self.assertNotEqual(key, fc.feature_key("f0", data, "harvest", 2))
+        self.assertNotEqual(key, fc.feature_key("hubert", data, "harvest", 3))
+        self.assertNotEqual(key, fc.feature_key("f0", data.astype(np.float64), "harvest", 3))
+        changed = data.copy()
+        changed[5] += 1
+        self.assertNotEqual(key, fc.feature_key("f0", changed, "harvest", 3))
+
+
+class FeatureCacheTests(unittest.TestCase):
+    def test_put_get_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = fc.FeatureCache(tmp)
+            self.assertIsNone(cache.get("missing"))
+            cache.put("a", f0=np.arange(5.0), coarse=np.ones(5, dtype=np.int32))
+            entry = cache.get("a")
+            np.testing.assert_array_equal(entry["f0"], np.arange(5.0))
+            self.assertEqual(entry["coarse"].dtype, np.int32)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = fc.FeatureCache(tmp)
+            rng = np.random.default_rng(0)
+            for key in ("a", "b", "c"):
+                cache.put(key, feats=rng.standard_normal(2000))
+            for mtime, key in enumerate(("a", "b", "c")):
+                os.utime(cache._path(key), (1000 + mtime, 1000 + mtime))
+            # 读取会刷新最近使用时间，a 变为最新
+            cache.get("a")
+
+            cache.max_bytes = sum(cache._path(key).stat().st_size for key in ("a", "c"))
+            cache.evict()
+            self.assertFalse(cache._path("b").exists())
+            self.assertTrue(cache._path("a").exists())
+            self.assertTrue(cache._path("c").exists())
+
+    def test_newest_entry_is_kept_even_if_over_limit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = fc.FeatureCache(tmp, max_mb=0)
+            cache.put("a", feats=np.zeros(10))
+            cache.put("b", feats=np.ones(10))
+            self.assertEqual([p.name for p in Path(tmp).glob("*.npz")], ["b.npz"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("rvc_process_long", SCRIPTS / "rvc_process_long.py")
+assert SPEC and SPEC.loader
+rpl = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(rpl)
+
+import rvc_worker  # noqa: E402  iter_converted_segments 在调用时从该模块取 RVCWorker
+
+
+class SplitAudioTests(unittest.TestCase):
+    def test_segments_overlap_and_cover_audio(self):
+        segments = rpl.split_audio(95 * 100, 100, chunk_duration=30, overlap=0.5)
+        self.assertEqual(segments[0], (0, 3000))
+        self.assertEqual(segments[-1][1], 9500)
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            self.assertEqual(end - start, 50)
+
+    def test_short_audio_is_one_segment(self):
+        self.assertEqual(rpl.split_audio(500, 100, chunk_duration=30), [(0, 500)])
+        self.assertEqual(rpl.split_audio(0, 100), [])
+
+
+class MergeSegmentTests(unittest.TestCase):
+    def test_identical_segments_stay_flat_across_seam(self):
+        output = np.zeros(3000, dtype=np.float32)
+        segment = np.full(2000, 0.5, dtype=np.float32)
+        window = rpl.crossfade_window(1000)
+        rpl.merge_segment(output, segment, 0)
+        rpl.merge_segment(output, segment, 1000, window)
+        np.testing.assert_allclose(output, 0.5, atol=1e-6)
+
+    def test_segments_past_output_end_are_clipped(self):
+        output = np.zeros(150, dtype=np.float32)
+        rpl.merge_segment(output, np.ones(100, dtype=np.float32), 0)
+        rpl.merge_segment(output, np.ones(100, dtype=np.float32), 90, rpl.crossfade_window(10))
+        rpl.merge_segment(output, np.ones(100, dtype=np.float32), 200, rpl.crossfade_window(10))
+        np.testing.assert_allclose(output, 1.0, atol=1e-6)
+
+    def test_window_amplitudes_sum_to_one(self):
+        fade_in, fade_out = rpl.crossfade_window(257)
+        np.testing.assert_allclose(fade_in + fade_out, 1.0, atol=1e-6)
+        self.assertLess(fade_in[0], 0.01)
+        self.assertGreater(fade_in[-1], 0.99)
+
+
+class FakeWorker:
+    """按顺序决定是否启动失败的假 worker，convert 原样返回"""
+
+    starts = []
+    calibrations = 0
+
+    def __init__(self, *args, **kwargs):
+        if FakeWorker.starts.pop(0):
+            raise RuntimeError("模型加载失败")
+        self.last_times = (0, 0, 0)
+        self.last_f0_method = None
+
+    def calibrate(self, audio, sample_rate, quality=None):
+        FakeWorker.calibrations += 1
+        raise RuntimeError("校准失败")
+
+    def convert(self, audio, sample_rate, f0up_key, f0_method, resample_sr=None):
+        self.last_f0_method = f0_method
+        return audio * 2, sample_rate
+
+    def close(self):
+        self.closed = True
+
+
+class IterConvertedSegmentsTests(unittest.TestCase):
+    def setUp(self):
+        self.original = rvc_worker.RVCWorker
+        rvc_worker.RVCWorker = FakeWorker
+        FakeWorker.calibrations = 0
+        self.audio = np.arange(100, dtype=np.float32)
+        self.segments = [(i, i + 10) for i in range(0, 100, 10)]
+
+    def tearDown(self):
+        rvc_worker.RVCWorker = self.original
+
+    def convert(self, workers, f0_method="harvest"):
+        return list(rpl.iter_converted_segments(self.audio, 16000, self.segments, "model.pth",
+                                                workers=workers, f0_method=f0_method))
+
+    def test_surviving_workers_drain_queue(self):
+        FakeWorker.starts = [True, False, True]
+        results = self.convert(3)
+        self.assertEqual([r[0] for r in results], list(range(10)))
+        np.testing.assert_array_equal(results[3][1], self.audio[30:40] * 2)
+
+    def test_fails_when_no_worker_starts(self):
+        FakeWorker.starts = [True, True]
+        with self.assertRaises(RuntimeError):
+            self.convert(2)
+
+    def test_failed_calibration_falls_back_to_harvest_once(self):
+        FakeWorker.starts = [False, False, False]
+        results = self.convert(3, f0_method="auto")
+        self.assertEqual(FakeWorker.calibrations, 1)
+        self.assertEqual({r[3]["f0_method"] for r in results}, {"harvest"})
+
+
+class ConvertAudioTests(unittest.TestCase):
+    def test_pool_workers_are_reused_and_merged_seamlessly(self):
+        FakeWorker.starts = [False, False]
+        pool = [FakeWorker(), FakeWorker()]
+        audio = np.full(95 * 100, 0.25, dtype=np.float32)
+        output, out_sr = rpl.convert_audio(audio, 100, pool=pool)
+        self.assertEqual(out_sr, 100)
+        np.testing.assert_allclose(output, 0.5, atol=1e-6)
+        self.assertFalse(any(getattr(worker, "closed", False) for worker in pool))
+
+    def test_empty_audio(self):
+        output, out_sr = rpl.convert_audio(np.zeros(0, dtype=np.float32), 100, resample_sr=200)
+        self.assertEqual((len(output), out_sr), (0, 200))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("rvc_worker", SCRIPTS / "rvc_worker.py")
+assert SPEC and SPEC.loader
+worker = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(worker)
+
+
+class MessageTests(unittest.TestCase):
+    def test_round_trip_with_audio(self):
+        stream = io.BytesIO()
+        audio = np.linspace(-1, 1, 1000, dtype=np.float64)
+        worker.write_message(stream, {"op": "convert", "f0_method": "harvest"}, audio)
+        worker.write_message(stream, {"op": "close"})
+        stream.seek(0)
+
+        header, data = worker.read_message(stream)
+        self.assertEqual(header["op"], "convert")
+        self.assertEqual(header["samples"], 1000)
+        self.assertEqual(data.dtype, np.dtype("<f4"))
+        np.testing.assert_array_equal(data, audio.astype(np.float32))
+
+        header, data = worker.read_message(stream)
+        self.assertEqual(header, {"op": "close"})
+        self.assertIsNone(data)
+        self.assertEqual(worker.read_message(stream), (None, None))
+
+    def test_non_ascii_header(self):
+        stream = io.BytesIO()
+        worker.write_message(stream, {"ok": False, "error": "模型加载失败"})
+        stream.seek(0)
+        self.assertEqual(worker.read_message(stream)[0]["error"], "模型加载失败")
+
+    def test_truncated_payload_is_treated_as_closed(self):
+        stream = io.BytesIO()
+        worker.write_message(stream, {"op": "convert"}, np.zeros(100, dtype=np.float32))
+        data = stream.getvalue()[:-4]
+        self.assertEqual(worker.read_message(io.BytesIO(data)), (None, None))
+
+
+# 发送就绪消息后不再响应的假 worker
+HANGING_WORKER = '''
+import sys, time
+sys.path.insert(0, {scripts!r})
+from rvc_worker import write_message
+write_message(sys.stdout.buffer, {{"ok": True, "sample_rate": 40000}})
+time.sleep(60)
+'''
+
+
+class TimeoutTests(unittest.TestCase):
+    def test_hung_request_kills_worker(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            python_exe = os.path.join(tmp, "python3")
+            with open(python_exe, "w") as f:
+                f.write(f"#!{sys.executable}\n" + HANGING_WORKER.format(scripts=str(SCRIPTS)))
+            os.chmod(python_exe, 0o755)
+
+            rvc = worker.RVCWorker("model.pth", python_exe=python_exe, timeout=0.5)
+            with self.assertRaisesRegex(RuntimeError, "超时"):
+                rvc.convert(np.zeros(100, dtype=np.float32), 16000)
+            self.assertIsNotNone(rvc.process.poll())
+            rvc.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+SPEC = importlib.util.spec_from_file_location("voice_change", SCRIPTS / "voice_change.py")
+assert SPEC and SPEC.loader
+vc = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(vc)
+
+
+class BatchInputTests(unittest.TestCase):
+    def test_directory_keeps_layout_and_skips_output_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "sub").mkdir()
+            (root / "out").mkdir()
+            for name in ("a.mp3", "sub/b.WAV", "sub/c.mp4", "notes.txt", "out/a_female_1.mp3"):
+                (root / name).write_bytes(b"")
+            found = vc.collect_batch_inputs(root, root / "out")
+            self.assertEqual(
+                [(p.relative_to(root).as_posix(), rel.as_posix()) for p, rel in found],
+                [("a.mp3", "."), ("sub/b.WAV", "sub"), ("sub/c.mp4", "sub")],
+            )
+
+    def test_list_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            listing = root / "list.txt"
+            listing.write_text(f"# 注释\n\nx.mp3\n{root / 'abs.wav'}\n", encoding="utf-8")
+            found = vc.collect_batch_inputs(listing, root / "out")
+            self.assertEqual(found, [(root / "x.mp3", Path(".")), (root / "abs.wav", Path("."))])
+
+
+class BatchUpToDateTests(unittest.TestCase):
+    def test_output_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "in.mp3"
+            output = Path(tmp) / "out.mp3"
+            source.write_bytes(b"x")
+            os.utime(source, (1000, 1000))
+            key = vc.batch_settings_key("female_1", {"pitch_shift": 5}, "pedalboard", 5)
+            self.assertFalse(vc._batch_up_to_date(source, output, key, None))
+
+            output.write_bytes(b"y")
+            os.utime(output, (2000, 2000))
+            record = {"settings": key, "input_mtime": 1000}
+            self.assertTrue(vc._batch_up_to_date(source, output, key, None))
+            self.assertTrue(vc._batch_up_to_date(source, output, key, record))
+            # 声音设置变化
+            other = vc.batch_settings_key("female_1", {"pitch_shift": 6}, "pedalboard", 6)
+            self.assertFalse(vc._batch_up_to_date(source, output, other, record))
+            # 输入被替换为更早的文件
+            os.utime(source, (500, 500))
+            self.assertFalse(vc._batch_up_to_date(source, output, key, record))
+            # 输入比输出新
+            os.utime(source, (3000, 3000))
+            self.assertFalse(vc._batch_up_to_date(source, output, key, None))
+
+
+class DelayBoard:
+    """模拟带延迟的效果链：前 latency 帧先缓存，之后原样输出"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.pending = None
+
+    def reset(self):
+        self.pending = None
+
+    def __call__(self, audio, sample_rate, reset=True):
+        pending = audio if self.pending is None else np.concatenate([self.pending, audio], axis=1)
+        n = max(0, pending.shape[1] - self.latency)
+        self.pending = pending[:, n:]
+        return pending[:, :n]
+
+
+class ChangeVoiceBlocksTests(unittest.TestCase):
+    def setUp(self):
+        self.config = {"voices": {"robot": {"method": "pedalboard", "pitch_shift": 3}}}
+        self.key = vc.preset_key(3, "robot", False, None)
+        vc._board_cache[self.key] = DelayBoard(3000)
+        rng = np.random.default_rng(0)
+        self.blocks = [rng.standard_normal((n, 2)).astype(np.float32) for n in (1000, 4096, 7)]
+
+    def tearDown(self):
+        vc._board_cache.pop(self.key, None)
+
+    def test_output_length_is_preserved(self):
+        out = list(vc.change_voice_blocks(iter(self.blocks), 44100, "robot", self.config))
+        joined = np.concatenate(out)
+        self.assertEqual(joined.shape, (5103, 2))
+        # 延迟缓冲中的尾部经静音冲刷后全部输出
+        np.testing.assert_array_equal(joined, np.concatenate(self.blocks))
+
+    def test_zero_pitch_passes_blocks_through(self):
+        out = list(vc.change_voice_blocks(iter(self.blocks), 44100, "robot", self.config, pitch=0))
+        self.assertEqual(len(out), len(self.blocks))
+        for a, b in zip(out, self.blocks):
+            self.assertIs(a, b)
+
+    def test_unknown_method_raises(self):
+        with self.assertRaises(RuntimeError):
+            list(vc.change_voice_blocks(iter(self.blocks), 44100, "robot", self.config, method="vocoder"))
+
+    def test_rvc_converts_mono_mix_and_keeps_layout(self):
+        calls = []
+
+        def fake_convert(audio, sample_rate, voice_config, resample_sr=None):
+            calls.append((len(audio), sample_rate, resample_sr, voice_config["f0up_key"]))
+            return audio[:-10] * 2, resample_sr
+
+        original = vc.convert_rvc_audio
+        vc.convert_rvc_audio = fake_convert
+        try:
+            out = list(vc.change_voice_blocks(iter(self.blocks), 44100, "robot", self.config, method="rvc"))
+        finally:
+            vc.convert_rvc_audio = original
+        self.assertEqual(calls, [(5103, 44100, 44100, 3)])
+        joined = np.concatenate(out)
+        self.assertEqual(joined.shape, (5103, 2))
+        expected = np.concatenate(self.blocks).mean(axis=1)[:-10] * 2
+        np.testing.assert_allclose(joined[:-10, 1], expected, rtol=1e-6)
+        np.testing.assert_array_equal(joined[-10:], 0)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "需要 ffmpeg")
+    def test_simple_streams_through_ffmpeg(self):
+        blocks = [np.zeros((44100, 2), dtype=np.float32) for _ in range(3)]
+        out = list(vc.change_voice_blocks(iter(blocks), 44100, "robot", self.config, method="simple"))
+        self.assertAlmostEqual(sum(len(b) for b in out) / 44100, 3, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()